@@ -0,0 +1,86 @@
+"""Benchmark resolving inputs against wide parent transactions.
+
+Compares the per input scan of every response and every output against a
+(tx_hash, tx_index) index built once per response. Run from the repo root:
+
+    python benchmarks/bench_output_index.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tx_simulation import build_resolved_output, index_outputs, resolve_output  # noqa: E402
+
+CRED = '65e4642f35a14b7a97e5c97542b664b4a3912b9ffba95d2b872a61fc'
+
+
+def synthetic_response(n_txs: int, n_outputs: int) -> list[dict]:
+    # wide parent transactions, like dex batches, with lovelace only outputs
+    txs = []
+    for i in range(n_txs):
+        tx_hash = f'{i:064x}'
+        outputs = [{
+            'tx_hash': tx_hash,
+            'tx_index': j,
+            'value': str(1_000_000 + j),
+            'asset_list': [],
+            'stake_addr': None,
+            'inline_datum': None,
+            'payment_addr': {'cred': CRED},
+            'reference_script': None,
+        } for j in range(n_outputs)]
+        txs.append({'tx_hash': tx_hash, 'outputs': outputs})
+    return txs
+
+
+def synthetic_inputs(n_txs: int, n_outputs: int, n_inputs: int) -> list[tuple[str, int]]:
+    # distinct random outputs drawn from the parents
+    rng = random.Random(n_txs * n_outputs + n_inputs)
+    utxos = rng.sample(range(n_txs * n_outputs), n_inputs)
+    return [(f'{utxo // n_outputs:064x}', utxo % n_outputs) for utxo in utxos]
+
+
+def scan(inputs: list[tuple[str, int]], txs: list[dict]) -> list[dict]:
+    # the per input scan of the response, then of the matching tx outputs
+    outputs = []
+    for tx_hash, tx_index in inputs:
+        for tx in txs:
+            if tx['tx_hash'] != tx_hash:
+                continue
+            outputs.append(build_resolved_output(tx_hash, tx_index, tx, False))
+            break
+    return outputs
+
+
+def indexed(inputs: list[tuple[str, int]], txs: list[dict]) -> list[dict]:
+    index = index_outputs(txs)
+    return [resolve_output(index[txin], False) for txin in inputs]
+
+
+def best_of(func, *args, repeat: int = 5) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    print(f"{'txs':>5} {'outputs':>8} {'inputs':>7} {'scan ms':>10} {'index ms':>10} {'speedup':>8}")
+    # (parent txs, outputs per parent, inputs)
+    for n_txs, n_outputs, n_inputs in [(2, 100, 10), (5, 1000, 200), (10, 2000, 200), (20, 5000, 1000), (50, 2000, 2000)]:
+        txs = synthetic_response(n_txs, n_outputs)
+        inputs = synthetic_inputs(n_txs, n_outputs, n_inputs)
+        assert scan(inputs, txs) == indexed(inputs, txs)
+
+        scan_time = best_of(scan, inputs, txs)
+        index_time = best_of(indexed, inputs, txs)
+        print(f"{n_txs:>5} {n_outputs:>8} {n_inputs:>7} {scan_time * 1e3:>10.2f} {index_time * 1e3:>10.2f} {scan_time / index_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
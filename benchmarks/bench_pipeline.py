@@ -0,0 +1,228 @@
+"""Benchmark the from_cbor pipeline offline over the example contract txs.
+
+Koios is served from recorded responses in benchmarks/recorded and aiken is
+replaced with benchmarks/stub_aiken.sh, so the numbers are the overhead of the
+library itself. Each stage of from_cbor is timed with a StageTimer, along with the
+end to end throughput and the peak python memory of a single simulation.
+
+Record the Koios responses once, with network access:
+
+    python benchmarks/bench_pipeline.py --record
+
+Run the benchmark and save the results, then compare a later run against them:
+
+    python benchmarks/bench_pipeline.py --output before.json
+    python benchmarks/bench_pipeline.py --compare before.json
+
+Fixtures without a recording are served a synthetic response built from the
+tx inputs, which is reported as the koios source of that fixture.
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import cbor2
+import requests_mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import tx_simulation  # noqa: E402
+
+FIXTURES = os.path.join(ROOT, 'example-contracts', 'scripts', 'cbor')
+CONTRACTS = os.path.join(ROOT, 'example-contracts', 'contracts')
+RECORDED = os.path.join(ROOT, 'benchmarks', 'recorded')
+STUB_AIKEN = os.path.join(ROOT, 'benchmarks', 'stub_aiken.sh')
+
+# the stages of from_cbor in pipeline order
+STAGES = ('decode', 'resolve_inputs', 'koios_query', 'build_resolved_output', 'cbor_encode', 'aiken')
+
+
+def load_fixtures(names: list[str] | None) -> dict[str, str]:
+    fixtures = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURES, '*.cbor'))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        if names and name not in names:
+            continue
+        with open(path, 'r') as file:
+            fixtures[name] = file.readline().strip()
+    return fixtures
+
+
+def record(fixtures: dict[str, str], network: bool) -> None:
+    os.makedirs(RECORDED, exist_ok=True)
+    for name, tx_cbor in fixtures.items():
+        tx_hashes = list(dict.fromkeys(txin[0] for txin in tx_simulation.resolve_inputs(tx_cbor)))
+        response = tx_simulation.query_tx_with_koios(tx_hashes, network)
+        with open(os.path.join(RECORDED, name + '.json'), 'w') as file:
+            json.dump(response, file)
+        print(f"recorded {name}: {len(response)} txs")
+
+
+def synthetic_response(tx_cbor: str) -> list[dict]:
+    # reference inputs carry one of the example scripts, the rest are wallet outputs
+    with open(os.path.join(CONTRACTS, 'always_true_contract.plutus'), 'r') as file:
+        script = cbor2.loads(bytes.fromhex(json.load(file)['cborHex'])).hex()
+    body = tx_simulation.tx_draft_to_resolved_cbor(tx_cbor)[0]
+    references = {(utxo[0].hex(), int(utxo[1])) for utxo in body.get(18, [])}
+
+    txs = {}
+    for txin in tx_simulation.resolve_inputs(tx_cbor):
+        output = {
+            'tx_hash': txin[0],
+            'tx_index': txin[1],
+            'value': '25000000',
+            'asset_list': [{'policy_id': '698a6ea0ca99f315034072af31eaac6ec11fe8558d3f48e9775aab9d', 'asset_name': '74445249', 'quantity': '1000000'}],
+            'stake_addr': 'stake_test1uzl65wzu364hh0wxex94qsf5xkeaq2mnmc7xgnsnsjuqr4qruvxwu',
+            'inline_datum': None,
+            'payment_addr': {'cred': '2d5fec7bbb8abbe1fb6590db2676389dffab196d212fb2b4b9902dcc'},
+            'reference_script': {'bytes': script} if txin in references else None,
+        }
+        txs.setdefault(txin[0], {'tx_hash': txin[0], 'outputs': []})['outputs'].append(output)
+    return list(txs.values())
+
+
+def koios_response(name: str, tx_cbor: str) -> tuple[list[dict], str]:
+    path = os.path.join(RECORDED, name + '.json')
+    if os.path.exists(path):
+        with open(path, 'r') as file:
+            return json.load(file), 'recorded'
+    return synthetic_response(tx_cbor), 'synthetic'
+
+
+def run_stages(tx_cbor: str, network: bool, client: tx_simulation.KoiosClient, plutus_version: int) -> dict[str, float]:
+    # the stage timings reported by from_cbor itself
+    timer = tx_simulation.StageTimer()
+    tx_simulation.from_cbor(tx_cbor, network, aiken_path=STUB_AIKEN, plutus_version=plutus_version, client=client, timer=timer)
+    return timer.totals()
+
+
+def summarize(samples: list[float]) -> dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        'mean_ms': statistics.fmean(ordered) * 1e3,
+        'p50_ms': ordered[len(ordered) // 2] * 1e3,
+        'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1e3,
+    }
+
+
+def bench_fixture(tx_cbor: str, response: list[dict], iterations: int, network: bool, plutus_version: int) -> dict:
+    url = tx_simulation.KoiosClient.url(network, 'tx_info')
+    client = tx_simulation.KoiosClient()
+    with requests_mock.Mocker() as mock:
+        mock.post(url, json=response)
+
+        stages = {stage: [] for stage in STAGES}
+        for _ in range(iterations):
+            for stage, seconds in run_stages(tx_cbor, network, client, plutus_version).items():
+                stages[stage].append(seconds)
+
+        end_to_end = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            tx_simulation.from_cbor(tx_cbor, network, aiken_path=STUB_AIKEN, plutus_version=plutus_version, client=client)
+            end_to_end.append(time.perf_counter() - start)
+
+        # python side peak memory of one simulation
+        tracemalloc.start()
+        tx_simulation.from_cbor(tx_cbor, network, aiken_path=STUB_AIKEN, plutus_version=plutus_version, client=client)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        'stages': {stage: summarize(samples) for stage, samples in stages.items()},
+        'end_to_end': summarize(end_to_end),
+        'throughput_tx_per_s': len(end_to_end) / sum(end_to_end),
+        'peak_memory_kib': peak / 1024,
+    }
+
+
+def metadata(iterations: int) -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'iterations': iterations,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+
+def print_results(results: dict) -> None:
+    header = f"{'fixture':<14} {'source':<10}" + ''.join(f" {stage[:12]:>12}" for stage in STAGES)
+    print(header + f" {'total':>9} {'tx/s':>8} {'peak KiB':>9}")
+    for name, result in results.items():
+        row = f"{name:<14} {result['koios_source']:<10}"
+        row += ''.join(f" {result['stages'][stage]['p50_ms']:>12.3f}" for stage in STAGES)
+        row += f" {result['end_to_end']['p50_ms']:>9.3f} {result['throughput_tx_per_s']:>8.1f} {result['peak_memory_kib']:>9.1f}"
+        print(row)
+    print("stage and total columns are p50 milliseconds")
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> int:
+    # any p50 that slowed down by more than the threshold is a regression
+    regressions = 0
+    print(f"\ncompared to {baseline['meta'].get('commit')} (threshold {threshold:.0%})")
+    for name, result in results.items():
+        if name not in baseline['results']:
+            continue
+        old = baseline['results'][name]
+        pairs = [(stage, result['stages'][stage]['p50_ms'], old['stages'][stage]['p50_ms']) for stage in STAGES if stage in old['stages']]
+        pairs.append(('total', result['end_to_end']['p50_ms'], old['end_to_end']['p50_ms']))
+        for stage, new_ms, old_ms in pairs:
+            change = (new_ms - old_ms) / old_ms if old_ms > 0 else 0.0
+            if change > threshold:
+                regressions += 1
+                print(f"REGRESSION {name} {stage}: {old_ms:.3f} ms -> {new_ms:.3f} ms ({change:+.0%})")
+    if regressions == 0:
+        print("no regressions")
+    return 1 if regressions else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=50, help="runs per fixture")
+    parser.add_argument('--fixtures', nargs='*', help="fixture names, defaults to all of them")
+    parser.add_argument('--output', help="write the results as json to this path")
+    parser.add_argument('--compare', help="a previous results json to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10, help="relative slow down reported as a regression")
+    parser.add_argument('--record', action='store_true', help="record the Koios responses and exit")
+    parser.add_argument('--mainnet', action='store_true', help="use mainnet instead of preprod")
+    parser.add_argument('--plutus-version', type=int, default=2)
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    if args.record:
+        record(fixtures, args.mainnet)
+        return 0
+
+    results = {}
+    for name, tx_cbor in fixtures.items():
+        response, source = koios_response(name, tx_cbor)
+        results[name] = bench_fixture(tx_cbor, response, args.iterations, args.mainnet, args.plutus_version)
+        results[name]['koios_source'] = source
+
+    print_results(results)
+    report = {'meta': metadata(args.iterations), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r') as file:
+            return compare(results, json.load(file), args.threshold)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""Benchmark UtxoIndex lookups over a large synthetic utxo set.
+
+Builds an index of --count lovelace only outputs in a temp dir, then times
+random lookups and reports the resident memory growth of opening and reading
+the index. Run from the repo root:
+
+    python benchmarks/bench_utxo_index.py --count 1000000
+"""
+import argparse
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tx_simulation import UtxoIndex, build_utxo_index  # noqa: E402
+
+CRED = bytes.fromhex('60' + '65e4642f35a14b7a97e5c97542b664b4a3912b9ffba95d2b872a61fc')
+OUTPUTS_PER_TX = 4
+
+
+def synthetic_outputs(count: int):
+    for i in range(count):
+        yield (f'{i // OUTPUTS_PER_TX * 2654435761 % 2 ** 256:064x}', i % OUTPUTS_PER_TX), {0: CRED, 1: 1_000_000 + i}
+
+
+def max_rss_kib() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=500_000, help="utxos in the index")
+    parser.add_argument('--lookups', type=int, default=100_000, help="random lookups to time")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'utxos.idx')
+        start = time.perf_counter()
+        build_utxo_index(path, synthetic_outputs(args.count), False)
+        print(f"built {args.count} utxos in {time.perf_counter() - start:.1f} s, {os.path.getsize(path) / 2 ** 20:.1f} MiB")
+
+        rng = random.Random(0)
+        queries = [rng.randrange(args.count) for _ in range(args.lookups)]
+        queries = [(f'{i // OUTPUTS_PER_TX * 2654435761 % 2 ** 256:064x}', i % OUTPUTS_PER_TX) for i in queries]
+
+        before = max_rss_kib()
+        index = UtxoIndex(path)
+        start = time.perf_counter()
+        for tx_hash, tx_index in queries:
+            assert index.lookup(tx_hash, tx_index) is not None
+        elapsed = time.perf_counter() - start
+        index.close()
+
+        print(f"{args.lookups} lookups: {elapsed / args.lookups * 1e6:.2f} us per lookup")
+        print(f"max rss growth while reading: {max_rss_kib() - before} KiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,4 @@
+#!/bin/sh
+# A stand in for aiken that accepts the tx simulate arguments and returns
+# fixed execution units, so benchmarks measure only the library overhead.
+echo '[{"mem": 0, "cpu": 0}]'
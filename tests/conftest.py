@@ -0,0 +1,27 @@
+import stat
+import sys
+
+import pytest
+
+# a stand in for aiken that echoes what it was handed
+STUB_AIKEN = f"""#!{sys.executable}
+import json
+import sys
+
+if sys.argv[1:] == ['--version']:
+    print('aiken v0.0.0 stub')
+    sys.exit(0)
+tx, inputs, outputs = (open(path).read() for path in sys.argv[3:6])
+if tx == 'fail':
+    print('script failed', file=sys.stderr)
+    sys.exit(1)
+print(json.dumps([{{'tx': tx, 'inputs': inputs, 'outputs': outputs, 'args': sys.argv[6:]}}]))
+"""
+
+
+@pytest.fixture
+def stub_aiken(tmp_path):
+    path = tmp_path / 'aiken'
+    path.write_text(STUB_AIKEN)
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
@@ -0,0 +1,45 @@
+from tx_simulation import AddressEncoder, run_bech32
+
+CRED = '65e4642f35a14b7a97e5c97542b664b4a3912b9ffba95d2b872a61fc'
+KEY_STAKE = "stake_test1uzl65wzu364hh0wxex94qsf5xkeaq2mnmc7xgnsnsjuqr4qruvxwu"
+SCRIPT_STAKE = "stake_test17pac0wjxyvftp3yw6u0jfdg6ay6q6x0t4xuucxx5gavqzpqdw9kfm"
+MAINNET_KEY_STAKE = "stake1uxl65wzu364hh0wxex94qsf5xkeaq2mnmc7xgnsnsjuqr4qykxy2p"
+MAINNET_SCRIPT_STAKE = "stake17xl65wzu364hh0wxex94qsf5xkeaq2mnmc7xgnsnsjuqr4qd76yap"
+
+
+def test_encode_headers():
+    encoder = AddressEncoder()
+    key_stake = run_bech32(KEY_STAKE)[0]
+    script_stake = run_bech32(SCRIPT_STAKE)[0]
+    assert encoder.encode(CRED, None, False).hex() == '60' + CRED
+    assert encoder.encode(CRED, None, True, script_payment=True).hex() == '71' + CRED
+    assert encoder.encode(CRED, KEY_STAKE, True).hex() == '01' + CRED + key_stake
+    assert encoder.encode(CRED, KEY_STAKE, False, script_payment=True).hex() == '10' + CRED + key_stake
+    assert encoder.encode(bytes.fromhex(CRED), SCRIPT_STAKE, False).hex() == '20' + CRED + script_stake
+    assert encoder.encode(CRED, SCRIPT_STAKE, True, script_payment=True).hex() == '31' + CRED + script_stake
+
+
+def test_encode_mainnet_stake_type():
+    # the stake type comes from the header bit, not the testnet headers
+    encoder = AddressEncoder()
+    stake = run_bech32(MAINNET_KEY_STAKE)[0]
+    assert run_bech32(MAINNET_KEY_STAKE)[1] is False
+    assert run_bech32(MAINNET_SCRIPT_STAKE)[1] is True
+    assert encoder.encode(CRED, MAINNET_KEY_STAKE, True).hex() == '01' + CRED + stake
+    assert encoder.encode(CRED, MAINNET_KEY_STAKE, True, script_payment=True).hex() == '11' + CRED + stake
+    assert encoder.encode(CRED, MAINNET_SCRIPT_STAKE, True).hex() == '21' + CRED + stake
+
+
+def test_stake_credentials_are_cached():
+    encoder = AddressEncoder()
+    for _ in range(5):
+        encoder.encode(CRED, KEY_STAKE, False)
+    assert encoder.stats() == {'hits': 4, 'misses': 1, 'size': 1}
+
+
+def test_stake_cache_is_bounded():
+    encoder = AddressEncoder(max_entries=1)
+    encoder.encode(CRED, KEY_STAKE, False)
+    encoder.encode(CRED, SCRIPT_STAKE, False)
+    encoder.encode(CRED, KEY_STAKE, False)
+    assert encoder.stats() == {'hits': 0, 'misses': 3, 'size': 1}
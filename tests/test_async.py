@@ -0,0 +1,115 @@
+import asyncio
+import json
+import os
+import threading
+import time
+
+import cbor2
+import pytest
+
+import tx_simulation
+from tx_simulation import from_cbor_async, from_file_async, simulate_cbor_async
+
+TX_HASH = 'c9cc36ddd9447af626f2e99c99c5500256aefd5c9d9eb8e670c4f7a93c602a87'
+URL = 'https://preprod.koios.rest/api/v1/tx_info'
+CRED = '65e4642f35a14b7a97e5c97542b664b4a3912b9ffba95d2b872a61fc'
+RESPONSE = [{'tx_hash': TX_HASH, 'outputs': [{'value': '5', 'tx_hash': TX_HASH, 'tx_index': 0, 'asset_list': [], 'datum_hash': None, 'stake_addr': None, 'inline_datum': None, 'payment_addr': {'cred': CRED}, 'reference_script': None}]}]
+TX_CBOR = cbor2.dumps([{0: [[bytes.fromhex(TX_HASH), 0]], 1: [], 2: 5, 13: [], 18: []}, {}, True, None]).hex()
+
+
+def test_simulate_cbor_async(stub_aiken):
+    output = asyncio.run(simulate_cbor_async('aa', 'bb', 'cc', stub_aiken, network=True))
+    assert output == [{'tx': 'aa', 'inputs': 'bb', 'outputs': 'cc', 'args': []}]
+
+
+def test_simulate_cbor_async_failure(stub_aiken):
+    assert asyncio.run(simulate_cbor_async('fail', 'bb', 'cc', stub_aiken)) == [{}]
+
+
+def test_from_cbor_async(requests_mock, stub_aiken):
+    requests_mock.post(URL, json=RESPONSE)
+    output = asyncio.run(from_cbor_async(TX_CBOR, False, aiken_path=stub_aiken, in_memory=True))
+    assert output[0]['tx'] == TX_CBOR
+    assert cbor2.loads(bytes.fromhex(output[0]['outputs'])) == [{0: bytes.fromhex('60' + CRED), 1: 5}]
+
+
+def test_from_file_async(requests_mock, stub_aiken, tmp_path):
+    requests_mock.post(URL, json=RESPONSE)
+    draft = tmp_path / 'tx.draft'
+    draft.write_text(json.dumps({'cborHex': TX_CBOR}))
+    output = asyncio.run(from_file_async(str(draft), False, aiken_path=stub_aiken))
+    assert output[0]['tx'] == TX_CBOR
+
+    draft.write_text(json.dumps({}))
+    assert asyncio.run(from_file_async(str(draft), False, aiken_path=stub_aiken)) == [{}]
+
+
+def test_from_cbor_async_limiter(monkeypatch):
+    lock = threading.Lock()
+    in_flight = [0, 0]
+
+    def slow_resolve(*args):
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight)
+        time.sleep(0.02)
+        with lock:
+            in_flight[0] -= 1
+        return {(TX_HASH, 0): {1: 5}}
+
+    async def fake_simulate(*args, **kwargs):
+        return [{'mem': 0, 'cpu': 0}]
+    monkeypatch.setattr(tx_simulation, 'resolve_utxos', slow_resolve)
+    monkeypatch.setattr(tx_simulation, 'simulate_cbor_async', fake_simulate)
+
+    async def run():
+        limiter = asyncio.Semaphore(2)
+        return await asyncio.gather(*(from_cbor_async(TX_CBOR, False, limiter=limiter) for _ in range(8)))
+
+    assert asyncio.run(run()) == [[{'mem': 0, 'cpu': 0}]] * 8
+    assert 1 <= in_flight[1] <= 2
+
+
+def test_cancelled_simulation_kills_aiken(tmp_path):
+    pid_path = tmp_path / 'pid'
+    aiken = tmp_path / 'aiken'
+    aiken.write_text(f"#!/bin/sh\necho $$ > {pid_path}\nexec sleep 30\n")
+    aiken.chmod(0o755)
+
+    async def run():
+        await asyncio.wait_for(simulate_cbor_async('aa', 'bb', 'cc', str(aiken)), 0.3)
+    try:
+        asyncio.run(run())
+    except asyncio.TimeoutError:
+        pass
+    pid = int(pid_path.read_text())
+    try:
+        os.kill(pid, 0)
+        alive = True
+    except ProcessLookupError:
+        alive = False
+    assert alive is False
+
+
+def test_from_cbor_async_caches_and_timer(requests_mock, stub_aiken):
+    requests_mock.post(URL, json=RESPONSE)
+    result_cache = tx_simulation.SimulationResultCache()
+    timer = tx_simulation.StageTimer()
+    first = asyncio.run(from_cbor_async(TX_CBOR, False, aiken_path=stub_aiken, timer=timer, result_cache=result_cache))
+    second = asyncio.run(from_cbor_async(TX_CBOR, False, aiken_path=stub_aiken, result_cache=result_cache))
+    assert first == second
+    assert result_cache.stats()['hits'] == 1
+    assert 'aiken' in timer.totals()
+
+
+def test_async_options_are_keyword_only(requests_mock, stub_aiken, tmp_path):
+    requests_mock.post(URL, json=RESPONSE)
+    # a positional timer must not land on the provider
+    with pytest.raises(TypeError):
+        asyncio.run(from_cbor_async(TX_CBOR, False, False, stub_aiken, 3, None))
+
+    draft = tmp_path / 'tx.draft'
+    draft.write_text(json.dumps({'cborHex': 'zz'}))
+    assert tx_simulation.failure_of(asyncio.run(from_file_async(str(draft), False, aiken_path=stub_aiken))).category == 'decode'
+    draft.write_text(json.dumps({'cborHex': cbor2.dumps([{1: [], 2: 5}]).hex()}))
+    assert tx_simulation.failure_of(asyncio.run(from_file_async(str(draft), False, aiken_path=stub_aiken))).category == 'invalid_tx'
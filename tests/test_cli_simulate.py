@@ -0,0 +1,90 @@
+import io
+import json
+
+import cbor2
+
+import tx_simulation
+from tx_simulation import main, stream_simulations
+
+TX_HASH = 'c9cc36ddd9447af626f2e99c99c5500256aefd5c9d9eb8e670c4f7a93c602a87'
+URL = 'https://preprod.koios.rest/api/v1/tx_info'
+CRED = '65e4642f35a14b7a97e5c97542b664b4a3912b9ffba95d2b872a61fc'
+RESPONSE = [{'tx_hash': TX_HASH, 'outputs': [{'value': '5', 'tx_hash': TX_HASH, 'tx_index': 0, 'asset_list': [], 'datum_hash': None, 'stake_addr': None, 'inline_datum': None, 'payment_addr': {'cred': CRED}, 'reference_script': None}]}]
+TX_CBOR = cbor2.dumps([{0: [[bytes.fromhex(TX_HASH), 0]], 1: [], 2: 5, 13: [], 18: []}, {}, True, None]).hex()
+
+
+def test_stream_simulations_hex_and_drafts(requests_mock, stub_aiken, tmp_path):
+    requests_mock.post(URL, json=RESPONSE)
+    draft = tmp_path / 'tx.draft'
+    draft.write_text(json.dumps({'cborHex': TX_CBOR}))
+
+    out = io.StringIO()
+    lines = [TX_CBOR + '\n', '\n', str(draft) + '\n', 'zz\n']
+    assert stream_simulations(iter(lines), out, False, stub_aiken, max_workers=2) == 3
+
+    records = sorted((json.loads(line) for line in out.getvalue().splitlines()), key=lambda record: record['line'])
+    assert [record['line'] for record in records] == [1, 3, 4]
+    assert records[0]['result'][0]['tx'] == TX_CBOR
+    assert records[1]['result'][0]['tx'] == TX_CBOR
+    assert records[2]['result'] == [{}]
+    assert records[2]['failure']['category'] == 'decode'
+
+
+def test_stream_simulations_same_failure_for_hex_and_draft(tmp_path):
+    draft = tmp_path / 'tx.draft'
+    draft.write_text(json.dumps({'cborHex': 'zz'}))
+    out = io.StringIO()
+    assert stream_simulations(iter(['zz\n', str(draft) + '\n']), out, False, max_workers=1) == 2
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [record['failure']['category'] for record in records] == ['decode', 'decode']
+    assert not any('error' in record for record in records)
+
+
+def test_stream_simulations_bounds_read_ahead(monkeypatch):
+    read = []
+
+    def lines():
+        for i in range(20):
+            read.append(i)
+            yield 'aa'
+
+    in_flight = []
+
+    def fake_simulate(line, *args, **kwargs):
+        in_flight.append(len(read))
+        return [{'mem': 1, 'cpu': 1}]
+
+    monkeypatch.setattr(tx_simulation, 'simulate_line', fake_simulate)
+    out = io.StringIO()
+    assert stream_simulations(lines(), out, False, max_workers=1) == 20
+    assert len(out.getvalue().splitlines()) == 20
+    # at most two lines are ever read ahead of a finished simulation
+    assert all(seen - done <= 3 for done, seen in enumerate(in_flight))
+
+
+def test_main_simulate_reads_files(requests_mock, stub_aiken, tmp_path, capsys):
+    requests_mock.post(URL, json=RESPONSE)
+    source = tmp_path / 'txs.txt'
+    source.write_text(TX_CBOR + '\n' + TX_CBOR + '\n')
+    assert main(['simulate', str(source), '--aiken-path', stub_aiken, '--workers', '2']) == 0
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert sorted(record['line'] for record in records) == [1, 2]
+
+
+def test_stream_simulations_survives_any_error(requests_mock, stub_aiken, monkeypatch):
+    requests_mock.post(URL, json=RESPONSE)
+    out = io.StringIO()
+    # an int and an empty map are valid cbor but not txs
+    assert stream_simulations(iter(['00\n', 'a0\n', TX_CBOR + '\n']), out, False, stub_aiken, max_workers=2) == 3
+    records = sorted((json.loads(line) for line in out.getvalue().splitlines()), key=lambda record: record['line'])
+    assert [record['result'] == [{}] for record in records] == [True, True, False]
+    assert [record['failure']['category'] for record in records[:2]] == ['invalid_tx', 'invalid_tx']
+
+    def broken(line, *args, **kwargs):
+        raise TypeError('broken')
+    monkeypatch.setattr(tx_simulation, 'simulate_line', broken)
+    out = io.StringIO()
+    assert stream_simulations(iter(['aa', 'bb']), out, False, max_workers=1) == 2
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [record['error'] for record in records] == ['broken', 'broken']
+    assert [record['failure']['category'] for record in records] == ['error', 'error']
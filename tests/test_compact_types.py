@@ -0,0 +1,46 @@
+import cbor2
+
+from tx_simulation import ResolvedOutput, TxIn, Value, decoded_input_refs, encode_cbor
+
+POLICY = bytes.fromhex('acab' * 14)
+
+
+def test_value_equals_the_primitive_form():
+    assert Value(5) == 5
+    assert hash(Value(5)) == hash(5)
+    value = Value.from_primitive([5, {POLICY: {b'b': 1, b'a': 2, b'zero': 0}}])
+    assert value == [5, {POLICY: {b'a': 2, b'b': 1}}]
+    assert value.assets == ((POLICY, ((b'a', 2), (b'b', 1))),)
+    assert value[0] == 5
+
+
+def test_value_from_koios():
+    value = Value.from_koios('7', [{'policy_id': POLICY.hex(), 'asset_name': 'cafe', 'quantity': '3'}])
+    assert value == [7, {POLICY: {bytes.fromhex('cafe'): 3}}]
+
+
+def test_resolved_output_reads_like_a_dict():
+    tag = cbor2.CBORTag(24, b'\x00')
+    resolved = ResolvedOutput(b'\x60', Value(5), script_ref=tag)
+    assert resolved == {0: b'\x60', 1: 5, 3: tag}
+    assert resolved[1] == 5
+    assert 2 not in resolved
+    assert len(resolved) == 3
+    assert ResolvedOutput.from_dict({0: b'\x60', 1: 5, 3: tag}) == resolved
+    assert not hasattr(resolved, '__dict__')
+
+
+def test_direct_cbor_encoding():
+    resolved = {0: b'\x60', 1: [5, {POLICY: {b'a': 1}}], 2: [1, cbor2.CBORTag(24, b'\x80')]}
+    compact = ResolvedOutput.from_dict(resolved)
+    assert encode_cbor([compact]) == cbor2.dumps([resolved])
+    assert cbor2.loads(encode_cbor(compact)) == resolved
+
+
+def test_decoded_inputs_are_txins():
+    tx_id = bytes(range(32))
+    refs = decoded_input_refs([{0: [[tx_id, 1]], 13: [], 18: []}])
+    assert refs == [(tx_id, 1)]
+    assert isinstance(refs[0], TxIn)
+    assert refs[0].key == (tx_id.hex(), 1)
+    assert cbor2.dumps(refs) == cbor2.dumps([[tx_id, 1]])
@@ -0,0 +1,38 @@
+import cbor2
+
+from tx_simulation import decode_bech32, from_cbor, from_cbor_bytes, resolve_output, simulate_cbor
+
+TX_HASH = 'c9cc36ddd9447af626f2e99c99c5500256aefd5c9d9eb8e670c4f7a93c602a87'
+URL = 'https://preprod.koios.rest/api/v1/tx_info'
+CRED = '65e4642f35a14b7a97e5c97542b664b4a3912b9ffba95d2b872a61fc'
+RESPONSE = [{'tx_hash': TX_HASH, 'outputs': [{'value': '5', 'tx_hash': TX_HASH, 'tx_index': 0, 'asset_list': [], 'datum_hash': None, 'stake_addr': None, 'inline_datum': None, 'payment_addr': {'cred': CRED}, 'reference_script': None}]}]
+TX_BYTES = cbor2.dumps([{0: [[bytes.fromhex(TX_HASH), 0]], 1: [], 2: 5, 13: [], 18: []}, {}, True, None])
+
+
+def test_from_cbor_bytes_matches_from_cbor(requests_mock, stub_aiken):
+    requests_mock.post(URL, json=RESPONSE)
+    output = from_cbor_bytes(memoryview(TX_BYTES), False, aiken_path=stub_aiken)
+    assert output == from_cbor(TX_BYTES.hex(), False, aiken_path=stub_aiken)
+    assert output[0]['tx'] == TX_BYTES.hex()
+    assert cbor2.loads(bytes.fromhex(output[0]['inputs'])) == [[bytes.fromhex(TX_HASH), 0]]
+    assert cbor2.loads(bytes.fromhex(output[0]['outputs'])) == [{0: bytes.fromhex('60' + CRED), 1: 5}]
+
+
+def test_simulate_cbor_mixes_hex_and_bytes(stub_aiken):
+    output = simulate_cbor(b'\xaa', 'bb', memoryview(b'\xcc'), stub_aiken, network=True)
+    assert output == [{'tx': 'aa', 'inputs': 'bb', 'outputs': 'cc', 'args': []}]
+
+
+def test_decode_bech32():
+    key, flag = decode_bech32("stake_test17pac0wjxyvftp3yw6u0jfdg6ay6q6x0t4xuucxx5gavqzpqdw9kfm")
+    assert flag is True
+    assert key == bytes.fromhex("7b87ba462312b0c48ed71f24b51ae9340d19eba9b9cc18d447580104")
+
+
+def test_resolve_output_stake_address_bytes():
+    stake = "stake_test1uzl65wzu364hh0wxex94qsf5xkeaq2mnmc7xgnsnsjuqr4qruvxwu"
+    utxo = {'value': '5', 'asset_list': [], 'stake_addr': stake, 'inline_datum': {'bytes': 'd87980'}, 'payment_addr': {'cred': CRED}, 'reference_script': {'bytes': '4e4d01000033222220051200120011'}}
+    resolved = resolve_output(utxo, False, 2)
+    assert resolved[0] == bytes.fromhex('10' + CRED + 'bfaa385c8eab7bbdc6c98b50413435b3d02b73de3c644e1384b801d4')
+    assert resolved[2] == [1, cbor2.CBORTag(24, bytes.fromhex('d87980'))]
+    assert resolved[3] == cbor2.CBORTag(24, cbor2.dumps([2, bytes.fromhex('4e4d01000033222220051200120011')]))
@@ -0,0 +1,47 @@
+import json
+
+import cbor2
+
+from tx_simulation import failure_of, from_directory
+
+TX_HASH = 'c9cc36ddd9447af626f2e99c99c5500256aefd5c9d9eb8e670c4f7a93c602a87'
+URL = 'https://preprod.koios.rest/api/v1/tx_info'
+CRED = '65e4642f35a14b7a97e5c97542b664b4a3912b9ffba95d2b872a61fc'
+RESPONSE = [{'tx_hash': TX_HASH, 'outputs': [
+    {'value': str(5 + i), 'tx_hash': TX_HASH, 'tx_index': i, 'asset_list': [], 'datum_hash': None, 'stake_addr': None, 'inline_datum': None, 'payment_addr': {'cred': CRED}, 'reference_script': None}
+    for i in range(3)
+]}]
+
+
+def make_tx(index):
+    # every tx shares the reference input at index 2
+    return cbor2.dumps([{0: [[bytes.fromhex(TX_HASH), index]], 1: [], 2: 5 + index, 13: [], 18: [[bytes.fromhex(TX_HASH), 2]]}, {}, True, None]).hex()
+
+
+def test_from_directory_shares_one_lookup(requests_mock, stub_aiken, tmp_path):
+    requests_mock.post(URL, json=RESPONSE)
+    for i in range(2):
+        (tmp_path / f'tx{i}.draft').write_text(json.dumps({'cborHex': make_tx(i)}))
+    (tmp_path / 'broken.draft').write_text(json.dumps({}))
+    (tmp_path / 'number.draft').write_text(json.dumps({'cborHex': 123}))
+    (tmp_path / 'notes.txt').write_text('not a draft')
+
+    results = from_directory(str(tmp_path), False, aiken_path=stub_aiken)
+
+    assert requests_mock.call_count == 1
+    assert list(results) == [str(tmp_path / name) for name in ['broken.draft', 'number.draft', 'tx0.draft', 'tx1.draft']]
+    assert results[str(tmp_path / 'broken.draft')] == [{}]
+    assert failure_of(results[str(tmp_path / 'number.draft')]).category == 'invalid_draft'
+    for i in range(2):
+        result = results[str(tmp_path / f'tx{i}.draft')]
+        assert result[0]['tx'] == make_tx(i)
+        assert [output[1] for output in cbor2.loads(bytes.fromhex(result[0]['outputs']))] == [5 + i, 7]
+
+
+def test_from_directory_pattern(requests_mock, stub_aiken, tmp_path):
+    requests_mock.post(URL, json=RESPONSE)
+    (tmp_path / 'tx.signed').write_text(json.dumps({'cborHex': make_tx(0)}))
+    (tmp_path / 'tx.draft').write_text('{not json')
+
+    assert from_directory(str(tmp_path), False, aiken_path=stub_aiken) == {str(tmp_path / 'tx.draft'): [{}]}
+    assert list(from_directory(str(tmp_path), False, pattern='*.signed', aiken_path=stub_aiken)) == [str(tmp_path / 'tx.signed')]
@@ -0,0 +1,31 @@
+from tx_simulation import build_resolved_output, index_outputs, resolve_output
+
+TX_HASH = 'c9cc36ddd9447af626f2e99c99c5500256aefd5c9d9eb8e670c4f7a93c602a87'
+OTHER_HASH = '3e019ab09dca87167ab35ec8f8c89d660e00deff998ca226d07f9a2d9ab7273d'
+CRED = '65e4642f35a14b7a97e5c97542b664b4a3912b9ffba95d2b872a61fc'
+
+
+def make_output(tx_hash, tx_index):
+    return {'value': str(tx_index), 'tx_hash': tx_hash, 'tx_index': tx_index, 'asset_list': [], 'datum_hash': None, 'stake_addr': None, 'inline_datum': None, 'payment_addr': {'cred': CRED}, 'reference_script': None}
+
+
+def test_index_outputs():
+    txs = [
+        {'tx_hash': TX_HASH, 'outputs': [make_output(TX_HASH, 1), make_output(TX_HASH, 0)]},
+        {'tx_hash': OTHER_HASH, 'outputs': [make_output(OTHER_HASH, 0)]},
+    ]
+    index = index_outputs(txs)
+    assert set(index) == {(TX_HASH, 0), (TX_HASH, 1), (OTHER_HASH, 0)}
+    assert index[(TX_HASH, 1)]['value'] == '1'
+
+
+def test_index_outputs_error_response():
+    assert index_outputs({'code': '22P02', 'message': 'malformed array literal'}) == {}
+    assert index_outputs([]) == {}
+
+
+def test_resolve_output_matches_build_resolved_output():
+    outputs = {'tx_hash': TX_HASH, 'outputs': [make_output(TX_HASH, 0), make_output(TX_HASH, 7)]}
+    resolved = resolve_output(make_output(TX_HASH, 7), False)
+    assert resolved == build_resolved_output(TX_HASH, 7, outputs, False)
+    assert resolved == {0: bytes.fromhex('60' + CRED), 1: 7}
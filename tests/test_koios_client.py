@@ -0,0 +1,82 @@
+import pytest
+import requests
+
+from tx_simulation import KoiosClient, query_tx_with_koios
+
+URL = 'https://preprod.koios.rest/api/v1/tx_info'
+
+
+def make_hashes(n):
+    return [f'{i:064x}' for i in range(n)]
+
+
+def echo(request, context):
+    # answer with one tx per requested hash
+    return [{'tx_hash': tx_hash} for tx_hash in request.json()['_tx_hashes']]
+
+
+def test_koios_client_chunks_large_queries(requests_mock):
+    requests_mock.post(URL, json=echo)
+    client = KoiosClient(chunk_size=50)
+    hashes = make_hashes(120)
+
+    response = query_tx_with_koios(hashes, False, client)
+    assert requests_mock.call_count == 3
+    assert sorted(len(r.json()['_tx_hashes']) for r in requests_mock.request_history) == [20, 50, 50]
+    assert sorted(tx['tx_hash'] for tx in response) == hashes
+
+
+def test_koios_client_small_query_is_one_request(requests_mock):
+    requests_mock.post(URL, json=echo)
+    response = KoiosClient(chunk_size=50).tx_info(make_hashes(3), False)
+    assert requests_mock.call_count == 1
+    assert len(response) == 3
+
+
+def test_koios_client_uses_timeout(requests_mock):
+    requests_mock.post(URL, json=[])
+    KoiosClient(timeout=1.5).tx_info(make_hashes(1), False)
+    assert requests_mock.last_request.timeout == 1.5
+
+
+def test_koios_client_retries_rate_limits(requests_mock):
+    requests_mock.post(URL, [
+        {'status_code': 429, 'json': {}},
+        {'status_code': 503, 'json': {}},
+        {'status_code': 200, 'json': [{'tx_hash': 'acab'}]},
+    ])
+    response = KoiosClient(backoff=0).tx_info(['acab'], False)
+    assert requests_mock.call_count == 3
+    assert response == [{'tx_hash': 'acab'}]
+
+
+def test_koios_client_gives_up_after_retries(requests_mock):
+    error = {'message': 'rate limited'}
+    requests_mock.post(URL, status_code=429, json=error)
+    response = KoiosClient(retries=2, backoff=0).tx_info(['acab'], False)
+    assert requests_mock.call_count == 3
+    assert response == error
+
+
+def test_koios_client_retries_connection_errors(requests_mock):
+    requests_mock.post(URL, [
+        {'exc': requests.ConnectionError},
+        {'status_code': 200, 'json': []},
+    ])
+    assert KoiosClient(backoff=0).tx_info(['acab'], False) == []
+
+    requests_mock.post(URL, exc=requests.ConnectTimeout)
+    with pytest.raises(requests.Timeout):
+        KoiosClient(retries=1, backoff=0).tx_info(['acab'], False)
+
+
+def test_koios_client_chunk_error_is_returned(requests_mock):
+    error = {'code': '22P02', 'message': 'malformed array literal'}
+    requests_mock.post(URL, [{'json': echo}, {'json': error}])
+    response = KoiosClient(chunk_size=2, max_workers=1).tx_info(make_hashes(4), False)
+    assert response == error
+
+
+def test_koios_client_bad_chunk_size():
+    with pytest.raises(ValueError):
+        KoiosClient(chunk_size=0)
@@ -0,0 +1,88 @@
+import cbor2
+
+from tx_simulation import SimulationContext, Value, failure_of, from_cbor, preflight, simulate_many
+
+TX_HASH = 'c9cc36ddd9447af626f2e99c99c5500256aefd5c9d9eb8e670c4f7a93c602a87'
+URL = 'https://preprod.koios.rest/api/v1/tx_info'
+CRED = '65e4642f35a14b7a97e5c97542b664b4a3912b9ffba95d2b872a61fc'
+RESPONSE = [{'tx_hash': TX_HASH, 'outputs': [{'value': '5', 'tx_hash': TX_HASH, 'tx_index': 0, 'asset_list': [], 'datum_hash': None, 'stake_addr': None, 'inline_datum': None, 'payment_addr': {'cred': CRED}, 'reference_script': None}]}]
+POLICY = bytes.fromhex('acab' * 14)
+INPUTS = [(TX_HASH, 0)]
+UTXOS = {(TX_HASH, 0): {0: bytes.fromhex('60' + CRED), 1: Value(10)}}
+
+
+def body(fields=None):
+    txBody = {0: [[bytes.fromhex(TX_HASH), 0]], 1: [], 2: 10, 13: [], 18: []}
+    txBody.update(fields or {})
+    return txBody
+
+
+def test_missing_body_field():
+    txBody = body()
+    del txBody[2]
+    failure = preflight([txBody, {}, True, None], INPUTS, UTXOS)
+    assert failure.category == 'invalid_tx'
+    assert failure.deterministic is True
+
+
+def test_missing_inputs():
+    failure = preflight([body(), {}, True, None], INPUTS, {})
+    assert failure.category == 'missing_inputs'
+    assert failure.detail == INPUTS
+
+
+def test_balanced_with_mint_and_withdrawal():
+    output = [bytes.fromhex('60' + CRED), [12, {POLICY: {b'a': 3}}]]
+    data = [body({1: [output], 2: 1, 5: {b'\xe0' + bytes(28): 3}, 9: {POLICY: {b'a': 3, b'b': 0}}}), {}, True, None]
+    assert preflight(data, INPUTS, UTXOS, check_balance=True) is None
+
+
+def test_unbalanced():
+    data = [body({2: 4, 9: {POLICY: {b'a': -1}}}), {}, True, None]
+    # aiken does not check the balance so neither does preflight by default
+    assert preflight(data, INPUTS, UTXOS) is None
+    failure = preflight(data, INPUTS, UTXOS, check_balance=True)
+    assert failure.category == 'unbalanced'
+    assert failure.detail == {'lovelace': 6, 'assets': {POLICY.hex(): {'61': -1}}}
+
+
+def test_balance_skipped():
+    # certificates, proposals and failing txs are not balanced here
+    assert preflight([body({2: 4, 4: [[0, [0, bytes(28)]]]}), {}, True, None], INPUTS, UTXOS, check_balance=True) is None
+    assert preflight([body({2: 4, 20: [[]]}), {}, True, None], INPUTS, UTXOS, check_balance=True) is None
+    assert preflight([body({2: 4}), {}, False, None], INPUTS, UTXOS, check_balance=True) is None
+
+
+def test_doomed_tx_never_runs_aiken(requests_mock, tmp_path):
+    requests_mock.post(URL, json=RESPONSE)
+    # aiken is missing so only a preflight failure can come back
+    aiken = str(tmp_path / 'aiken')
+    unbalanced = cbor2.dumps([body({2: 4}), {}, True, None]).hex()
+    assert failure_of(from_cbor(unbalanced, False, aiken_path=aiken, check_balance=True)).category == 'unbalanced'
+    assert failure_of(simulate_many([unbalanced], False, aiken_path=aiken, check_balance=True)[0]).category == 'unbalanced'
+    assert failure_of(from_cbor(unbalanced, False, aiken_path=aiken)).category == 'aiken_unavailable'
+
+    balanced = cbor2.dumps([body({2: 5}), {}, True, None]).hex()
+    assert failure_of(from_cbor(balanced, False, aiken_path=aiken, check_balance=True)).category == 'aiken_unavailable'
+
+    # a body without inputs fails before any lookup
+    txBody = body()
+    del txBody[0]
+    assert failure_of(from_cbor(cbor2.dumps([txBody, {}, True, None]).hex(), False, aiken_path=aiken)).category == 'invalid_tx'
+    assert requests_mock.call_count == 4
+
+
+def test_optional_input_fields(requests_mock, stub_aiken):
+    requests_mock.post(URL, json=RESPONSE)
+    # no collateral and no reference inputs still reaches aiken
+    txBody = body({2: 5})
+    del txBody[13], txBody[18]
+    tx_cbor = cbor2.dumps([txBody, {}, True, None]).hex()
+    assert from_cbor(tx_cbor, False, aiken_path=stub_aiken)[0]['tx'] == tx_cbor
+
+
+def test_context_runs_preflight(requests_mock, stub_aiken):
+    requests_mock.post(URL, json=RESPONSE)
+    context = SimulationContext(cbor2.dumps([body({2: 5}), {}, True, None]), False, aiken_path=stub_aiken, check_balance=True)
+    assert 'tx' in context.simulate()[0]
+    assert failure_of(context.simulate(cbor2.dumps([body({2: 4}), {}, True, None]))).category == 'unbalanced'
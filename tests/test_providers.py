@@ -0,0 +1,92 @@
+import json
+
+import cbor2
+import pytest
+
+from tx_simulation import (KoiosClient, KoiosProvider, SnapshotProvider,
+                           UtxoCache, UtxoProvider, address_to_bytes,
+                           build_resolved_output, datum_from_json,
+                           resolve_output, resolve_utxos)
+
+TX_HASH = 'c9cc36ddd9447af626f2e99c99c5500256aefd5c9d9eb8e670c4f7a93c602a87'
+CRED = '65e4642f35a14b7a97e5c97542b664b4a3912b9ffba95d2b872a61fc'
+SCRIPT = '583a01000032323232322225333004323253330063370e90010008a5114a0600c6ea8004c01cc020c018dd50008a4c26cacae6955ceaab9e5742ae89'
+URL = 'https://preprod.koios.rest/api/v1/tx_info'
+
+# the same utxos as a koios output and as a cardano-cli snapshot entry
+KOIOS_OUTPUT = {'value': '2000000', 'tx_hash': TX_HASH, 'tx_index': 0, 'asset_list': [{'policy_id': 'acab', 'asset_name': 'cafe', 'quantity': '5'}], 'datum_hash': None, 'stake_addr': None, 'inline_datum': {'bytes': 'd87980'}, 'payment_addr': {'cred': CRED}, 'reference_script': {'bytes': SCRIPT}}
+SNAPSHOT = {
+    f'{TX_HASH}#0': {
+        'address': 'addr_test1wpj7gep0xks5k75huhyh2s4kvj628yftnla6jhftsu4xrlqwd9m7m',
+        'value': {'lovelace': 2000000, 'acab': {'cafe': 5}},
+        'inlineDatumRaw': 'd87980',
+        'referenceScript': {'script': {'cborHex': cbor2.dumps(bytes.fromhex(SCRIPT)).hex(), 'type': 'PlutusScriptV2'}},
+    },
+    f'{TX_HASH}#1': {
+        'address': 'addr_test1vpj7gep0xks5k75huhyh2s4kvj628yftnla6jhftsu4xrlq89emfm',
+        'value': {'lovelace': 3000000},
+        'inlineDatum': {'constructor': 0, 'fields': [{'int': 1}, {'bytes': 'acab'}, {'list': []}]},
+    },
+}
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    path = tmp_path / 'utxo.json'
+    path.write_text(json.dumps(SNAPSHOT))
+    return str(path)
+
+
+def test_provider_interface():
+    with pytest.raises(NotImplementedError):
+        UtxoProvider().resolve([(TX_HASH, 0)], False)
+
+
+def test_snapshot_matches_koios(snapshot_path):
+    snapshot = SnapshotProvider(snapshot_path).resolve([(TX_HASH, 0)], False, plutus_version=2)
+    assert snapshot[(TX_HASH, 0)] == resolve_output(KOIOS_OUTPUT, False, plutus_version=2)
+
+
+def test_snapshot_datum_json(snapshot_path):
+    resolved = SnapshotProvider(snapshot_path).resolve([(TX_HASH, 1)], False)[(TX_HASH, 1)]
+    assert resolved[0] == bytes.fromhex('60' + CRED)
+    assert resolved[1] == 3000000
+    assert cbor2.loads(resolved[2][1].value) == cbor2.CBORTag(121, [1, b'\xac\xab', []])
+
+
+def test_snapshot_missing_input(snapshot_path):
+    assert SnapshotProvider(snapshot_path).resolve([(TX_HASH, 9)], False) == {}
+
+
+def test_resolve_utxos_with_snapshot_never_calls_koios(requests_mock, snapshot_path):
+    provider = SnapshotProvider(snapshot_path)
+    cache = UtxoCache(':memory:')
+    utxos = resolve_utxos([(TX_HASH, 0), (TX_HASH, 1)], False, cache=cache, provider=provider)
+    assert set(utxos) == {(TX_HASH, 0), (TX_HASH, 1)}
+    assert requests_mock.call_count == 0
+    assert len(cache) == 2
+
+
+def test_build_resolved_output_with_provider(snapshot_path):
+    resolved = build_resolved_output(TX_HASH, 1, None, False, provider=SnapshotProvider(snapshot_path))
+    assert resolved[1] == 3000000
+
+
+def test_koios_provider(requests_mock):
+    requests_mock.post(URL, json=[{'tx_hash': TX_HASH, 'outputs': [KOIOS_OUTPUT]}])
+    utxos = KoiosProvider(KoiosClient()).resolve([(TX_HASH, 0), (TX_HASH, 1)], False)
+    assert list(utxos) == [(TX_HASH, 0)]
+
+
+def test_address_to_bytes():
+    assert address_to_bytes('addr_test1vpj7gep0xks5k75huhyh2s4kvj628yftnla6jhftsu4xrlq89emfm') == bytes.fromhex('60' + CRED)
+    with pytest.raises(ValueError):
+        address_to_bytes('addr_test1notvalid')
+
+
+def test_datum_from_json_constructors():
+    assert datum_from_json({'constructor': 7, 'fields': []}) == cbor2.CBORTag(1280, [])
+    assert datum_from_json({'constructor': 200, 'fields': []}) == cbor2.CBORTag(102, [200, []])
+    assert datum_from_json({'map': [{'k': {'int': 1}, 'v': {'bytes': ''}}]}) == {1: b''}
+    with pytest.raises(ValueError):
+        datum_from_json({'string': 'nope'})
@@ -0,0 +1,49 @@
+import pytest
+
+from tx_simulation import (KoiosClient, build_resolved_output,
+                           query_utxos_with_koios, resolve_utxos)
+
+TX_HASH = 'c9cc36ddd9447af626f2e99c99c5500256aefd5c9d9eb8e670c4f7a93c602a87'
+URL = 'https://preprod.koios.rest/api/v1/utxo_info'
+UTXO = {'tx_hash': TX_HASH, 'tx_index': 1, 'address': 'addr_test1vpj7gep0xks5k75huhyh2s4kvj628yftnla6jhftsu4xrlq89emfm', 'payment_cred': '65e4642f35a14b7a97e5c97542b664b4a3912b9ffba95d2b872a61fc', 'stake_address': None, 'value': '9639501', 'asset_list': [{'policy_id': 'acab', 'asset_name': 'cafe', 'quantity': '1'}], 'inline_datum': None, 'reference_script': None}
+
+
+@pytest.mark.parametrize("network", [True, False])
+def test_query_utxos_with_koios_request(requests_mock, network):
+    subdomain = "api" if network else "preprod"
+    requests_mock.post(f'https://{subdomain}.koios.rest/api/v1/utxo_info', json=[])
+
+    query_utxos_with_koios([(TX_HASH, 1), (TX_HASH, 0)], network)
+    request = requests_mock.last_request
+    assert request.json() == {'_utxo_refs': [f'{TX_HASH}#1', f'{TX_HASH}#0'], '_extended': True}
+    # only the fields needed to resolve an output are selected
+    assert request.qs['select'] == [','.join(KoiosClient.UTXO_FIELDS)]
+
+
+def test_query_utxos_with_koios_output_format(requests_mock):
+    requests_mock.post(URL, json=[UTXO])
+    outputs = query_utxos_with_koios([(TX_HASH, 1)], False)
+    assert outputs[0]['payment_addr']['cred'] == UTXO['payment_cred']
+    assert outputs[0]['stake_addr'] is None
+
+    # the output resolves the same way as a tx_info output
+    resolved = build_resolved_output(TX_HASH, 1, {'outputs': outputs}, False)
+    assert resolved[0] == bytes.fromhex('60' + UTXO['payment_cred'])
+    assert resolved[1] == [9639501, {bytes.fromhex('acab'): {bytes.fromhex('cafe'): 1}}]
+
+
+def test_query_utxos_with_koios_error(requests_mock):
+    error = {'code': '22P02', 'message': 'malformed array literal'}
+    requests_mock.post(URL, json=error)
+    assert query_utxos_with_koios([('acab', 0)], False) == error
+
+
+def test_resolve_utxos_with_utxo_lookup(requests_mock):
+    sibling = dict(UTXO, tx_index=0, asset_list=[], value='2000000')
+    requests_mock.post(URL, json=[UTXO, sibling])
+    client = KoiosClient(utxo_lookup=True)
+
+    utxos = resolve_utxos([(TX_HASH, 0), (TX_HASH, 1)], False, client=client)
+    assert requests_mock.call_count == 1
+    assert utxos[(TX_HASH, 0)][1] == 2000000
+    assert utxos[(TX_HASH, 1)][1][0] == 9639501
@@ -0,0 +1,39 @@
+import random
+
+from tx_simulation import TxIn, redeemer_indices
+
+TX_A = '9ac0928f338ec0c4f5ae1275fe6517881a9c842c07720097ffc4f5fb82975dc1'
+TX_B = 'a1133d386f47a72edd05d964540fe9763552685ca9ffbf07b26770766d063009'
+
+
+def test_spend_index_is_numeric():
+    x, y, z = f"{TX_A}#10", f"{TX_A}#2", f"{TX_B}#0"
+    assert redeemer_indices([x, y, z])['spend'] == {y: 0, x: 1, z: 2}
+
+
+def test_spend_accepts_pairs_and_txins():
+    pair = (TX_B, 1)
+    txin = TxIn(bytes.fromhex(TX_A), 3)
+    assert redeemer_indices([pair, txin])['spend'] == {txin: 0, pair: 1}
+
+
+def test_spend_matches_ledger_order():
+    rng = random.Random(3)
+    inputs = [(bytes(rng.getrandbits(8) for _ in range(32)).hex(), rng.randrange(200)) for _ in range(150)]
+    indices = redeemer_indices(inputs)['spend']
+    ordered = sorted(inputs, key=lambda txin: (bytes.fromhex(txin[0]), txin[1]))
+    assert [indices[txin] for txin in ordered] == list(range(150))
+
+
+def test_mint_order():
+    policies = ['ff' * 28, bytes.fromhex('00' * 28), 'ab' * 28]
+    assert redeemer_indices(mint=policies)['mint'] == {policies[1]: 0, policies[2]: 1, policies[0]: 2}
+
+
+def test_withdrawals_put_scripts_first():
+    key = 'e0' + '00' * 28
+    script = bytes.fromhex('f0' + 'ff' * 28)
+    bech32 = 'stake_test17pac0wjxyvftp3yw6u0jfdg6ay6q6x0t4xuucxx5gavqzpqdw9kfm'
+    pair = ('11' * 28, False)
+    indices = redeemer_indices(withdrawals=[key, script, bech32, pair])['withdraw']
+    assert indices == {bech32: 0, script: 1, key: 2, pair: 3}
@@ -0,0 +1,76 @@
+import hashlib
+
+import cbor2
+
+from tx_simulation import ScriptStore, resolve_output
+
+CRED = '65e4642f35a14b7a97e5c97542b664b4a3912b9ffba95d2b872a61fc'
+SCRIPT = '4e4d01000033222220051200120011'
+
+
+def script_hash(version, script):
+    return hashlib.blake2b(bytes([version]) + bytes.fromhex(script), digest_size=28).hexdigest()
+
+
+def make_utxo(reference_script):
+    return {'value': '5', 'asset_list': [], 'stake_addr': None, 'inline_datum': None, 'payment_addr': {'cred': CRED}, 'reference_script': reference_script}
+
+
+def test_version_from_type():
+    store = ScriptStore()
+    tag = store.reference({'type': 'plutusV2', 'bytes': SCRIPT})
+    assert tag == cbor2.CBORTag(24, cbor2.dumps([2, bytes.fromhex(SCRIPT)]))
+    assert store.version(script_hash(2, SCRIPT)) == 2
+
+
+def test_version_from_hash():
+    store = ScriptStore()
+    tag = store.reference({'hash': script_hash(1, SCRIPT), 'bytes': SCRIPT}, plutus_version=3)
+    assert cbor2.loads(tag.value)[0] == 1
+
+
+def test_version_falls_back_to_the_argument():
+    store = ScriptStore()
+    tag = store.reference({'bytes': SCRIPT}, plutus_version=2)
+    assert cbor2.loads(tag.value)[0] == 2
+
+
+def test_native_scripts_are_structures():
+    native = cbor2.dumps([0, bytes.fromhex(CRED)])
+    store = ScriptStore()
+    tag = store.reference({'type': 'timelock', 'bytes': native.hex()})
+    assert cbor2.loads(tag.value) == [0, [0, bytes.fromhex(CRED)]]
+
+
+def test_outputs_share_one_stored_script():
+    store = ScriptStore()
+    reference_script = {'type': 'plutusV3', 'hash': script_hash(3, SCRIPT), 'bytes': SCRIPT}
+    first = resolve_output(make_utxo(reference_script), False, scripts=store)
+    second = resolve_output(make_utxo(dict(reference_script, bytes='not decoded again')), False, scripts=store)
+    assert first[3] is second[3]
+    assert store.stats() == {'hits': 1, 'misses': 1, 'size': 1}
+
+
+def test_mixed_versions_in_one_store():
+    store = ScriptStore()
+    v2 = resolve_output(make_utxo({'type': 'plutusV2', 'bytes': SCRIPT}), False, scripts=store)
+    v3 = resolve_output(make_utxo({'type': 'plutusV3', 'bytes': SCRIPT}), False, scripts=store)
+    assert cbor2.loads(v2[3].value)[0] == 2
+    assert cbor2.loads(v3[3].value)[0] == 3
+    assert store.stats()['size'] == 2
+
+
+def test_store_is_bounded():
+    store = ScriptStore(max_entries=1)
+    store.add(bytes.fromhex(SCRIPT), 2)
+    store.add(bytes.fromhex(SCRIPT), 3)
+    assert store.version(script_hash(2, SCRIPT)) is None
+    assert store.version(script_hash(3, SCRIPT)) == 3
+
+
+def test_reference_survives_eviction():
+    # a store too small to keep the script still returns it
+    store = ScriptStore(max_entries=0)
+    tag = store.reference({'type': 'plutusV2', 'bytes': SCRIPT})
+    assert cbor2.loads(tag.value) == [2, bytes.fromhex(SCRIPT)]
+    assert store.stats() == {'hits': 0, 'misses': 1, 'size': 0}
@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+from tx_simulation import handoff_files, simulate_cbor
+
+
+@pytest.fixture
+def temp_dir(tmp_path, monkeypatch):
+    # watch the temp dir for leaked files
+    directory = tmp_path / 'tmp'
+    directory.mkdir()
+    monkeypatch.setattr('tempfile.tempdir', str(directory))
+    return directory
+
+
+@pytest.mark.parametrize("in_memory", [True, False])
+def test_simulate_cbor_hands_off_cbor(stub_aiken, temp_dir, in_memory):
+    output = simulate_cbor('aa', 'bb', 'cc', stub_aiken, in_memory=in_memory)
+    assert output == [{'tx': 'aa', 'inputs': 'bb', 'outputs': 'cc', 'args': ['--zero-time', '1655769600000', '--zero-slot', '86400']}]
+    assert list(temp_dir.iterdir()) == []
+
+
+def test_simulate_cbor_mainnet_has_no_zero_time(stub_aiken, temp_dir):
+    output = simulate_cbor('aa', 'bb', 'cc', stub_aiken, network=True)
+    assert output[0]['args'] == []
+
+
+@pytest.mark.parametrize("in_memory", [True, False])
+def test_simulate_cbor_failure_removes_files(stub_aiken, temp_dir, in_memory):
+    assert simulate_cbor('fail', 'bb', 'cc', stub_aiken, in_memory=in_memory) == [{}]
+    assert list(temp_dir.iterdir()) == []
+
+
+def test_handoff_files_in_memory_stays_out_of_temp_dir(temp_dir):
+    with handoff_files(['aa', 'bb'], in_memory=True) as (paths, fds):
+        assert [open(path).read() for path in paths] == ['aa', 'bb']
+        assert list(temp_dir.iterdir()) == []
+    # the memfd files are gone once their fds are closed
+    for fd in fds:
+        with pytest.raises(OSError):
+            os.fstat(fd)
+
+
+def test_handoff_files_removed_on_error(temp_dir):
+    with pytest.raises(RuntimeError):
+        with handoff_files(['aa'], in_memory=False) as (paths, fds):
+            assert os.path.exists(paths[0])
+            raise RuntimeError
+    assert list(temp_dir.iterdir()) == []
@@ -0,0 +1,31 @@
+import time
+
+import tx_simulation
+from tx_simulation import simulate_cbor_many
+
+
+def test_simulate_cbor_many_empty():
+    assert simulate_cbor_many([]) == []
+
+
+def test_simulate_cbor_many_keeps_input_order(monkeypatch):
+    def fake_simulate(tx_cbor, input_cbor, output_cbor, *args, **kwargs):
+        # later txs finish first
+        time.sleep(0.05 / (int(tx_cbor) + 1))
+        return [{'mem': int(tx_cbor), 'cpu': 0}]
+    monkeypatch.setattr(tx_simulation, 'simulate_cbor', fake_simulate)
+
+    simulations = [(str(i), '', '') for i in range(8)]
+    results = simulate_cbor_many(simulations, max_workers=4)
+    assert results == [[{'mem': i, 'cpu': 0}] for i in range(8)]
+
+
+def test_simulate_cbor_many_failure_is_isolated(monkeypatch):
+    def fake_simulate(tx_cbor, input_cbor, output_cbor, *args, **kwargs):
+        if tx_cbor == 'bad':
+            raise FileNotFoundError('aiken')
+        return [{'mem': 1, 'cpu': 1}]
+    monkeypatch.setattr(tx_simulation, 'simulate_cbor', fake_simulate)
+
+    results = simulate_cbor_many([('good', '', ''), ('bad', '', ''), ('good', '', '')], max_workers=2)
+    assert results == [[{'mem': 1, 'cpu': 1}], [{}], [{'mem': 1, 'cpu': 1}]]
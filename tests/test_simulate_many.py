@@ -0,0 +1,87 @@
+import cbor2
+
+import tx_simulation
+from tx_simulation import failure_of, simulate_many
+
+SHARED_HASH = 'c9cc36ddd9447af626f2e99c99c5500256aefd5c9d9eb8e670c4f7a93c602a87'
+OTHER_HASH = '3e019ab09dca87167ab35ec8f8c89d660e00deff998ca226d07f9a2d9ab7273d'
+URL = 'https://preprod.koios.rest/api/v1/tx_info'
+
+
+def make_output(tx_hash, tx_index, lovelace):
+    return {'value': str(lovelace), 'tx_hash': tx_hash, 'tx_index': tx_index, 'asset_list': [], 'datum_hash': None, 'stake_addr': None, 'inline_datum': None, 'payment_addr': {'cred': '65e4642f35a14b7a97e5c97542b664b4a3912b9ffba95d2b872a61fc'}, 'reference_script': None}
+
+
+RESPONSE = [
+    {'tx_hash': SHARED_HASH, 'outputs': [make_output(SHARED_HASH, 0, 1), make_output(SHARED_HASH, 1, 2)]},
+    {'tx_hash': OTHER_HASH, 'outputs': [make_output(OTHER_HASH, 0, 3)]},
+]
+
+
+def make_tx(spend, collateral, fee):
+    body = {
+        0: [[bytes.fromhex(h), i] for h, i in spend],
+        1: [],
+        2: fee,
+        13: [[bytes.fromhex(h), i] for h, i in collateral],
+        18: [],
+    }
+    return cbor2.dumps([body, {}, True, None]).hex()
+
+
+def test_simulate_many_queries_koios_once(requests_mock, monkeypatch):
+    requests_mock.post(URL, json=RESPONSE)
+
+    def fake_simulate(tx_cbor, input_cbor, output_cbor, *args, **kwargs):
+        # the cbor stays raw bytes until it is handed to aiken
+        assert all(isinstance(part, bytes) for part in (tx_cbor, input_cbor, output_cbor))
+        # report the lovelace of each resolved output
+        return [{'mem': output[1], 'cpu': 0} for output in cbor2.loads(output_cbor)]
+    monkeypatch.setattr(tx_simulation, 'simulate_cbor', fake_simulate)
+
+    txs = [
+        make_tx([(SHARED_HASH, 0)], [(SHARED_HASH, 1)], 1),
+        make_tx([(OTHER_HASH, 0)], [(SHARED_HASH, 1)], 3),
+    ]
+    results = simulate_many(txs, False)
+
+    assert requests_mock.call_count == 1
+    assert sorted(requests_mock.last_request.json()['_tx_hashes']) == sorted([SHARED_HASH, OTHER_HASH])
+    assert results == [
+        [{'mem': 1, 'cpu': 0}, {'mem': 2, 'cpu': 0}],
+        [{'mem': 3, 'cpu': 0}, {'mem': 2, 'cpu': 0}],
+    ]
+
+
+def test_simulate_many_bad_tx_fails_alone(requests_mock, monkeypatch):
+    requests_mock.post(URL, json=RESPONSE)
+    monkeypatch.setattr(tx_simulation, 'simulate_cbor', lambda *args, **kwargs: [{'mem': 1, 'cpu': 1}])
+    bad_tx = '84A3008182582074686973206973206120737472696E6720696E73696465207468652063626F720001800200A0F5F6'
+    results = simulate_many([bad_tx, make_tx([(SHARED_HASH, 0)], [], 1)], False)
+    assert results == [[{}], [{'mem': 1, 'cpu': 1}]]
+
+
+def test_simulate_many_non_list_tx_fails_alone(requests_mock, monkeypatch):
+    requests_mock.post(URL, json=RESPONSE)
+    monkeypatch.setattr(tx_simulation, 'simulate_cbor', lambda *args, **kwargs: [{'mem': 1, 'cpu': 1}])
+    # an int, an empty map and a tx whose body is a list
+    bad_txs = ['00', 'a0', cbor2.dumps([[], {}, True, None]).hex()]
+    results = simulate_many(bad_txs + [make_tx([(SHARED_HASH, 0)], [], 1)], False)
+    assert results == [[{}], [{}], [{}], [{'mem': 1, 'cpu': 1}]]
+
+
+def test_simulate_many_none_fails_alone(requests_mock, monkeypatch):
+    requests_mock.post(URL, json=RESPONSE)
+    monkeypatch.setattr(tx_simulation, 'simulate_cbor', lambda *args, **kwargs: [{'mem': 1, 'cpu': 1}])
+    # truncated cbor is a decode failure too
+    results = simulate_many([None, '', '82', make_tx([(SHARED_HASH, 0)], [], 1)], False)
+    assert [failure_of(result).category for result in results[:3]] == ['decode'] * 3
+    assert results[3] == [{'mem': 1, 'cpu': 1}]
+
+
+def test_simulate_many_bytes_match_hex(requests_mock, stub_aiken):
+    requests_mock.post(URL, json=RESPONSE)
+    tx_cbor = make_tx([(SHARED_HASH, 0)], [(SHARED_HASH, 1)], 1)
+    hex_result, bytes_result = simulate_many([tx_cbor, bytes.fromhex(tx_cbor)], False, aiken_path=stub_aiken)
+    assert hex_result == bytes_result
+    assert hex_result[0]['tx'] == tx_cbor
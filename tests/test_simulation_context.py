@@ -0,0 +1,51 @@
+import cbor2
+import pytest
+
+from tx_simulation import SimulationContext, failure_of
+
+TX_HASH = 'c9cc36ddd9447af626f2e99c99c5500256aefd5c9d9eb8e670c4f7a93c602a87'
+URL = 'https://preprod.koios.rest/api/v1/tx_info'
+CRED = '65e4642f35a14b7a97e5c97542b664b4a3912b9ffba95d2b872a61fc'
+RESPONSE = [{'tx_hash': TX_HASH, 'outputs': [
+    {'value': str(5 + i), 'tx_hash': TX_HASH, 'tx_index': i, 'asset_list': [], 'datum_hash': None, 'stake_addr': None, 'inline_datum': None, 'payment_addr': {'cred': CRED}, 'reference_script': None}
+    for i in range(2)
+]}]
+
+
+def tx(inputs, fee=0):
+    return cbor2.dumps([{0: [[bytes.fromhex(TX_HASH), i] for i in inputs], 1: [], 2: fee, 13: [], 18: []}, {}, True, None])
+
+
+def test_variants_reuse_the_resolution(requests_mock, stub_aiken):
+    requests_mock.post(URL, json=RESPONSE)
+    context = SimulationContext(tx([0, 1]).hex(), False, aiken_path=stub_aiken)
+
+    first = context.simulate()
+    variant = context.simulate(tx([0, 1], fee=200))
+    assert requests_mock.call_count == 1
+    assert first[0]['tx'] == tx([0, 1]).hex()
+    assert variant[0]['tx'] == tx([0, 1], fee=200).hex()
+    assert variant[0]['outputs'] == first[0]['outputs']
+
+
+def test_variant_in_another_order(requests_mock, stub_aiken):
+    requests_mock.post(URL, json=RESPONSE)
+    context = SimulationContext(tx([0, 1]), False, aiken_path=stub_aiken)
+
+    output = context.simulate(tx([1, 0]).hex())
+    assert cbor2.loads(bytes.fromhex(output[0]['inputs'])) == [[bytes.fromhex(TX_HASH), 1], [bytes.fromhex(TX_HASH), 0]]
+    assert [out[1] for out in cbor2.loads(bytes.fromhex(output[0]['outputs']))] == [6, 5]
+
+
+def test_variant_with_other_utxos(requests_mock, stub_aiken):
+    requests_mock.post(URL, json=RESPONSE)
+    context = SimulationContext(tx([0, 1]), False, aiken_path=stub_aiken)
+    with pytest.raises(ValueError):
+        context.simulate(tx([0]))
+
+
+def test_missing_inputs_fail_every_variant(requests_mock, stub_aiken):
+    requests_mock.post(URL, json=[])
+    context = SimulationContext(tx([0, 1]), False, aiken_path=stub_aiken)
+    assert failure_of(context.simulate()).category == 'missing_inputs'
+    assert failure_of(context.simulate(tx([1, 0]))).category == 'missing_inputs'
@@ -0,0 +1,109 @@
+import asyncio
+import json
+import time
+
+import cbor2
+import pytest
+import requests
+
+from tx_simulation import (FailureCache, KoiosClient, SimulationFailure, failure_of, from_cbor, from_file,
+                           simulate_cbor, simulate_cbor_async, simulate_many)
+
+TX_HASH = 'c9cc36ddd9447af626f2e99c99c5500256aefd5c9d9eb8e670c4f7a93c602a87'
+URL = 'https://preprod.koios.rest/api/v1/tx_info'
+TX_CBOR = cbor2.dumps([{0: [[bytes.fromhex(TX_HASH), 0]], 1: [], 2: 5, 13: [], 18: []}, {}, True, None]).hex()
+
+
+def test_failure_equals_the_old_result():
+    failure = SimulationFailure('simulation', 'boom', 1)
+    assert [failure] == [{}]
+    assert json.dumps([failure]) == '[{}]'
+    assert failure.deterministic is True
+    assert SimulationFailure('aiken_unavailable').deterministic is False
+    assert failure_of([failure]) is failure
+    assert failure_of([{'mem': 1, 'cpu': 1}]) is None
+
+
+def test_simulate_cbor_failure_carries_stderr(stub_aiken):
+    failure = failure_of(simulate_cbor('fail', 'bb', 'cc', stub_aiken))
+    assert failure.category == 'simulation'
+    assert failure.stderr.strip() == 'script failed'
+    assert failure.returncode == 1
+
+
+def test_simulate_cbor_async_failure_carries_stderr(stub_aiken):
+    failure = failure_of(asyncio.run(simulate_cbor_async('fail', 'bb', 'cc', stub_aiken)))
+    assert failure.category == 'simulation'
+    assert failure.stderr.strip() == 'script failed'
+
+
+def test_missing_aiken(tmp_path):
+    failure = failure_of(simulate_cbor('aa', 'bb', 'cc', str(tmp_path / 'aiken')))
+    assert failure.category == 'aiken_unavailable'
+
+
+def test_missing_inputs(requests_mock, tmp_path):
+    requests_mock.post(URL, json=[])
+    aiken = tmp_path / 'aiken'
+    aiken.write_text('#!/bin/sh\nexit 1\n')
+    aiken.chmod(0o755)
+    failure = failure_of(from_cbor(TX_CBOR, False, aiken_path=str(aiken)))
+    assert failure.category == 'missing_inputs'
+    assert failure.detail == [(TX_HASH, 0)]
+
+
+def test_invalid_draft_and_decode(tmp_path, stub_aiken):
+    draft = tmp_path / 'tx.draft'
+    draft.write_text(json.dumps({}))
+    assert failure_of(from_file(str(draft), False)).category == 'invalid_draft'
+    bad_tx = cbor2.dumps([{0: []}, {}, True, None]).hex()
+    assert failure_of(simulate_many([bad_tx], False, aiken_path=stub_aiken)[0]).category == 'invalid_tx'
+    assert failure_of(simulate_many(['zz'], False, aiken_path=stub_aiken)[0]).category == 'decode'
+
+
+def test_koios_outage_is_not_a_tx_failure(requests_mock, tmp_path, stub_aiken):
+    draft = tmp_path / 'tx.draft'
+    draft.write_text(json.dumps({'cborHex': TX_CBOR}))
+    client = KoiosClient(retries=0)
+    # a gateway error page is not json
+    requests_mock.post(URL, status_code=502, text='<html>bad gateway</html>')
+    with pytest.raises(requests.RequestException):
+        from_file(str(draft), False, aiken_path=stub_aiken, client=client)
+    # neither is a response of the wrong shape the fault of the tx
+    requests_mock.post(URL, json=[{'tx_hash': TX_HASH}])
+    with pytest.raises(KeyError):
+        from_file(str(draft), False, aiken_path=stub_aiken, client=client)
+
+    draft.write_text(json.dumps({'cborHex': 'zz'}))
+    assert failure_of(from_file(str(draft), False, aiken_path=stub_aiken, client=client)).category == 'decode'
+    draft.write_text(json.dumps({'cborHex': cbor2.dumps([{0: [[]], 1: [], 2: 5}]).hex()}))
+    assert failure_of(from_file(str(draft), False, aiken_path=stub_aiken, client=client)).category == 'invalid_tx'
+
+
+def test_killed_aiken_is_not_deterministic():
+    failure = SimulationFailure('simulation', '', -9)
+    assert failure.deterministic is False
+    failure_cache = FailureCache()
+    failure_cache.put('key', failure)
+    assert failure_cache.get('key') is None
+
+
+def test_failure_cache_skips_aiken(stub_aiken):
+    cache = FailureCache(ttl=60)
+    first = simulate_cbor('fail', 'bb', 'cc', stub_aiken, failure_cache=cache)
+    # a broken aiken of the same version can only be answered from the cache
+    with open(stub_aiken, 'w') as file:
+        file.write('#!/bin/sh\n[ "$1" = --version ] && echo "aiken v0.0.0 stub" && exit 0\nexit 2\n')
+    assert simulate_cbor('fail', 'bb', 'cc', stub_aiken, failure_cache=cache) == first
+    assert failure_of(simulate_cbor('fail', 'bb', 'cd', stub_aiken, failure_cache=cache)).returncode == 2
+    assert cache.stats()['hits'] == 1
+
+
+def test_failure_cache_expires():
+    cache = FailureCache(ttl=0.01)
+    cache.put('a', SimulationFailure('simulation'))
+    cache.put('b', SimulationFailure('aiken_unavailable'))
+    assert cache.get('a') is not None
+    assert cache.get('b') is None
+    time.sleep(0.02)
+    assert cache.get('a') is None
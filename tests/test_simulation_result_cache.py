@@ -0,0 +1,97 @@
+import pytest
+
+from tx_simulation import SimulationResultCache, aiken_version, simulate_cbor
+
+
+def test_key_matches_hex_and_bytes():
+    key = SimulationResultCache.key('aa', 'bb', 'cc', 'v1', [])
+    assert key == SimulationResultCache.key(b'\xaa', b'\xbb', memoryview(b'\xcc'), 'v1', [])
+    assert key != SimulationResultCache.key('aa', 'bb', 'cc', 'v2', [])
+    assert key != SimulationResultCache.key('aa', 'bb', 'cc', 'v1', ['--zero-slot', '86400'])
+    assert key != SimulationResultCache.key('aabb', '', 'cc', 'v1', [])
+
+
+def test_memory_tier_is_bounded():
+    cache = SimulationResultCache(max_memory=1)
+    cache.put('a', [{'mem': 1, 'cpu': 1}])
+    cache.put('b', [{'mem': 2, 'cpu': 2}])
+    assert cache.get('a') is None
+    assert cache.get('b') == [{'mem': 2, 'cpu': 2}]
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'memory': 1, 'disk': 0}
+
+
+def test_disk_tier_persists(tmp_path):
+    path = str(tmp_path / 'results.db')
+    cache = SimulationResultCache(path, max_memory=1, max_entries=2)
+    cache.put('a', [{'mem': 1, 'cpu': 1}])
+    cache.put('b', [{'mem': 2, 'cpu': 2}])
+    # a is no longer in memory but still on disk
+    assert cache.get('a') == [{'mem': 1, 'cpu': 1}]
+    cache.put('c', [{'mem': 3, 'cpu': 3}])
+    cache.close()
+
+    reopened = SimulationResultCache(path)
+    assert reopened.get('b') is None
+    assert reopened.get('a') == [{'mem': 1, 'cpu': 1}]
+    assert reopened.stats()['disk'] == 2
+
+
+def test_cached_result_is_a_copy():
+    cache = SimulationResultCache()
+    result = [{'mem': 1, 'cpu': 1}]
+    cache.put('a', result)
+    result[0]['mem'] = 5
+    cache.get('a')[0]['mem'] = 6
+    assert cache.get('a') == [{'mem': 1, 'cpu': 1}]
+
+
+def test_invalid_sizes():
+    with pytest.raises(ValueError):
+        SimulationResultCache(max_memory=0)
+
+
+def test_simulate_cbor_skips_aiken_on_a_hit(stub_aiken):
+    cache = SimulationResultCache()
+    first = simulate_cbor('aa', 'bb', 'cc', stub_aiken, result_cache=cache)
+    assert aiken_version(stub_aiken) == 'aiken v0.0.0 stub'
+
+    # a broken aiken of the same version can only be answered from the cache
+    with open(stub_aiken, 'w') as file:
+        file.write('#!/bin/sh\n[ "$1" = --version ] && echo "aiken v0.0.0 stub" && exit 0\nexit 1\n')
+    assert simulate_cbor(b'\xaa', b'\xbb', b'\xcc', stub_aiken, result_cache=cache) == first
+    assert simulate_cbor('aa', 'bb', 'cd', stub_aiken, result_cache=cache) == [{}]
+    assert cache.stats()['hits'] == 1
+
+
+def test_failures_are_not_cached(stub_aiken):
+    cache = SimulationResultCache()
+    assert simulate_cbor('fail', 'bb', 'cc', stub_aiken, result_cache=cache) == [{}]
+    assert cache.stats()['memory'] == 0
+
+
+def test_aiken_version_follows_the_binary(tmp_path):
+    aiken = tmp_path / 'aiken'
+    # a missing aiken is asked again once it exists
+    assert aiken_version(str(aiken)) is None
+    aiken.write_text('#!/bin/sh\necho "aiken v1"\n')
+    aiken.chmod(0o755)
+    assert aiken_version(str(aiken)) == 'aiken v1'
+    # an upgrade in place changes the version and so the cache keys
+    aiken.write_text('#!/bin/sh\necho "aiken v1.1"\n')
+    assert aiken_version(str(aiken)) == 'aiken v1.1'
+
+
+def test_disk_hits_are_written_in_batches(tmp_path):
+    path = str(tmp_path / 'results.db')
+    cache = SimulationResultCache(path, max_memory=1, max_entries=2, flush_every=10)
+    cache.put('a', [{'mem': 1, 'cpu': 1}])
+    cache.put('b', [{'mem': 2, 'cpu': 2}])
+    # a is only on disk, the hit is kept in memory until close
+    assert cache.get('a') == [{'mem': 1, 'cpu': 1}]
+    assert len(cache._touched) == 1
+    cache.close()
+
+    cache = SimulationResultCache(path, max_memory=1, max_entries=2)
+    cache.put('c', [{'mem': 3, 'cpu': 3}])
+    assert cache.get('b') is None
+    assert cache.get('a') == [{'mem': 1, 'cpu': 1}]
@@ -0,0 +1,59 @@
+import json
+
+import cbor2
+
+from tx_simulation import StageTimer, from_cbor, from_file
+
+TX_HASH = 'c9cc36ddd9447af626f2e99c99c5500256aefd5c9d9eb8e670c4f7a93c602a87'
+URL = 'https://preprod.koios.rest/api/v1/tx_info'
+RESPONSE = [{'tx_hash': TX_HASH, 'outputs': [{'value': '5', 'tx_hash': TX_HASH, 'tx_index': 0, 'asset_list': [], 'datum_hash': None, 'stake_addr': None, 'inline_datum': None, 'payment_addr': {'cred': '65e4642f35a14b7a97e5c97542b664b4a3912b9ffba95d2b872a61fc'}, 'reference_script': None}]}]
+TX_CBOR = cbor2.dumps([{0: [[bytes.fromhex(TX_HASH), 0]], 1: [], 2: 5, 13: [], 18: []}, {}, True, None]).hex()
+STAGES = ['decode', 'resolve_inputs', 'cbor_encode', 'koios_query', 'build_resolved_output', 'cbor_encode', 'aiken']
+
+
+def test_stage_timer_records():
+    streamed = []
+    timer = StageTimer(callback=streamed.append, tx='acab')
+    with timer.stage('decode'):
+        pass
+    with timer.stage('decode'):
+        pass
+    assert [record['stage'] for record in timer.records] == ['decode', 'decode']
+    assert streamed == timer.records
+    assert timer.records[0]['tx'] == 'acab'
+    assert timer.records[0]['seconds'] >= 0
+    assert list(timer.totals()) == ['decode']
+
+
+def test_stage_timer_records_failed_stage():
+    timer = StageTimer()
+    try:
+        with timer.stage('aiken'):
+            raise RuntimeError
+    except RuntimeError:
+        pass
+    assert timer.records[0]['stage'] == 'aiken'
+
+
+def test_stage_timer_to_json():
+    timer = StageTimer()
+    with timer.stage('decode'):
+        pass
+    lines = timer.to_json().splitlines()
+    assert json.loads(lines[0])['stage'] == 'decode'
+
+
+def test_from_cbor_stages(requests_mock, stub_aiken):
+    requests_mock.post(URL, json=RESPONSE)
+    timer = StageTimer()
+    from_cbor(TX_CBOR, False, aiken_path=stub_aiken, timer=timer)
+    assert [record['stage'] for record in timer.records] == STAGES
+
+
+def test_from_file_stages(requests_mock, stub_aiken, tmp_path):
+    requests_mock.post(URL, json=RESPONSE)
+    draft = tmp_path / 'tx.draft'
+    draft.write_text(json.dumps({'cborHex': TX_CBOR}))
+    timer = StageTimer()
+    from_file(str(draft), False, aiken_path=stub_aiken, timer=timer)
+    assert set(timer.totals()) == set(STAGES)
@@ -0,0 +1,92 @@
+import pytest
+
+from tx_simulation import UtxoCache, build_resolved_output, resolve_utxos
+
+TX_HASH = 'c9cc36ddd9447af626f2e99c99c5500256aefd5c9d9eb8e670c4f7a93c602a87'
+RESPONSE = [{'tx_hash': TX_HASH, 'outputs': [{'value': '9639501', 'tx_hash': TX_HASH, 'tx_index': 1, 'asset_list': [], 'datum_hash': None, 'stake_addr': None, 'inline_datum': None, 'payment_addr': {'cred': '65e4642f35a14b7a97e5c97542b664b4a3912b9ffba95d2b872a61fc'}, 'reference_script': None}, {'value': '40000000', 'tx_hash': TX_HASH, 'tx_index': 0, 'asset_list': [{'policy_id': 'acab', 'asset_name': 'cafe', 'quantity': '1'}], 'datum_hash': None, 'stake_addr': None, 'inline_datum': None, 'payment_addr': {'cred': '99fc1a514a232b29a18db7635e6650b8cf65b65da83491532cb928dd'}, 'reference_script': None}]}]
+URL = 'https://preprod.koios.rest/api/v1/tx_info'
+
+
+def test_cache_miss_then_hit():
+    cache = UtxoCache(':memory:')
+    assert cache.get(TX_HASH, 0, False) is None
+    cache.put(TX_HASH, 0, False, {0: b'\x60', 1: 10})
+    assert cache.get(TX_HASH, 0, False) == {0: b'\x60', 1: 10}
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'size': 1}
+
+
+def test_cache_is_network_specific():
+    cache = UtxoCache(':memory:')
+    cache.put(TX_HASH, 0, False, {0: b'\x60', 1: 10})
+    assert cache.get(TX_HASH, 0, True) is None
+
+
+def test_cache_evicts_least_recently_used():
+    cache = UtxoCache(':memory:', max_entries=2)
+    cache.put(TX_HASH, 0, False, {1: 0})
+    cache.put(TX_HASH, 1, False, {1: 1})
+    # touch the first output so the second is the oldest
+    cache.get(TX_HASH, 0, False)
+    cache.put(TX_HASH, 2, False, {1: 2})
+    assert len(cache) == 2
+    assert cache.get(TX_HASH, 1, False) is None
+    assert cache.get(TX_HASH, 0, False) == {1: 0}
+
+
+def test_cache_replace_keeps_size():
+    cache = UtxoCache(':memory:', max_entries=2)
+    cache.put(TX_HASH, 0, False, {1: 0})
+    cache.put(TX_HASH, 0, False, {1: 1})
+    assert len(cache) == 1
+    assert cache.get(TX_HASH, 0, False) == {1: 1}
+
+
+def test_cache_persists_on_disk(tmp_path):
+    path = str(tmp_path / 'utxos.db')
+    cache = UtxoCache(path)
+    cache.put(TX_HASH, 0, False, {1: 0})
+    cache.close()
+    assert UtxoCache(path).get(TX_HASH, 0, False) == {1: 0}
+
+
+def test_cache_bad_size():
+    with pytest.raises(ValueError):
+        UtxoCache(':memory:', max_entries=0)
+
+
+def test_build_resolved_output_uses_cache():
+    cache = UtxoCache(':memory:')
+    resolved = build_resolved_output(TX_HASH, 1, RESPONSE[0], False, cache=cache)
+    assert cache.get(TX_HASH, 1, False) == resolved
+    # a cached output is returned without looking at the outputs
+    assert build_resolved_output(TX_HASH, 1, {'outputs': []}, False, cache=cache) == resolved
+
+
+def test_resolve_utxos_skips_koios_on_hit(requests_mock):
+    requests_mock.post(URL, json=RESPONSE)
+    cache = UtxoCache(':memory:')
+    inputs = [(TX_HASH, 1), (TX_HASH, 0)]
+
+    first = resolve_utxos(inputs, False, cache=cache)
+    assert requests_mock.call_count == 1
+    assert set(first) == set(inputs)
+
+    second = resolve_utxos(inputs, False, cache=cache)
+    assert requests_mock.call_count == 1
+    assert second == first
+
+
+def test_cache_batches_use_times(tmp_path):
+    path = str(tmp_path / 'utxos.db')
+    cache = UtxoCache(path, flush_every=10)
+    cache.put(TX_HASH, 0, False, {1: 0})
+    cache.put(TX_HASH, 1, False, {1: 1})
+    # the hit is only written on close
+    cache.get(TX_HASH, 0, False)
+    assert len(cache._touched) == 1
+    cache.close()
+
+    cache = UtxoCache(path, max_entries=2)
+    cache.put(TX_HASH, 2, False, {1: 2})
+    assert cache.get(TX_HASH, 1, False) is None
+    assert cache.get(TX_HASH, 0, False) == {1: 0}
@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from tx_simulation import (UtxoIndex, UtxoIndexProvider, build_utxo_index,
+                           from_cbor, iter_dump_outputs, main, resolve_output)
+
+CRED = '65e4642f35a14b7a97e5c97542b664b4a3912b9ffba95d2b872a61fc'
+
+
+def make_output(tx_hash, tx_index):
+    return {'value': str(tx_index + 1), 'tx_hash': tx_hash, 'tx_index': tx_index, 'asset_list': [], 'datum_hash': None, 'stake_addr': None, 'inline_datum': None, 'payment_addr': {'cred': CRED}, 'reference_script': None}
+
+
+def make_outputs(n_txs, n_outputs):
+    # unsorted on purpose, with indexes past 9 so string sorting would be wrong
+    return [
+        ((f'{i * 7919 % n_txs:064x}', j), resolve_output(make_output(f'{i * 7919 % n_txs:064x}', j), False))
+        for i in range(n_txs) for j in reversed(range(n_outputs))
+    ]
+
+
+def test_utxo_index_lookup(tmp_path):
+    path = str(tmp_path / 'utxos.idx')
+    outputs = make_outputs(50, 12)
+    assert build_utxo_index(path, outputs, False) == 600
+
+    index = UtxoIndex(path)
+    assert len(index) == 600
+    provider = UtxoIndexProvider(path)
+    utxos = provider.resolve([utxo for utxo, _ in outputs], False)
+    assert utxos == dict(outputs)
+
+
+def test_utxo_index_missing(tmp_path):
+    path = str(tmp_path / 'utxos.idx')
+    build_utxo_index(path, make_outputs(3, 2), False)
+    index = UtxoIndex(path)
+    assert index.lookup(f'{0:064x}', 2) is None
+    assert index.lookup(f'{9:064x}', 0) is None
+    assert (f'{0:064x}', 1) in index
+
+
+def test_utxo_index_empty(tmp_path):
+    path = str(tmp_path / 'utxos.idx')
+    build_utxo_index(path, [], False)
+    assert UtxoIndex(path).lookup(f'{0:064x}', 0) is None
+
+
+def test_utxo_index_last_output_wins(tmp_path):
+    path = str(tmp_path / 'utxos.idx')
+    utxo = (f'{0:064x}', 0)
+    build_utxo_index(path, [(utxo, {1: 1}), (utxo, {1: 2})], False)
+    assert UtxoIndexProvider(path).resolve([utxo], False) == {utxo: {1: 2}}
+
+
+def test_utxo_index_network(tmp_path):
+    path = str(tmp_path / 'utxos.idx')
+    build_utxo_index(path, [], True)
+    with pytest.raises(ValueError):
+        UtxoIndexProvider(path).resolve([], False)
+
+
+def test_utxo_index_bad_file(tmp_path):
+    path = tmp_path / 'utxos.idx'
+    path.write_bytes(bytes(64))
+    with pytest.raises(ValueError):
+        UtxoIndex(str(path))
+
+
+def test_iter_dump_outputs(tmp_path):
+    tx_hash = f'{1:064x}'
+    tx_info = tmp_path / 'tx_info.json'
+    tx_info.write_text(json.dumps([{'tx_hash': tx_hash, 'outputs': [make_output(tx_hash, 0)]}]))
+    utxo_info = tmp_path / 'utxo_info.json'
+    utxo_info.write_text(json.dumps([{'tx_hash': tx_hash, 'tx_index': 0, 'payment_cred': CRED, 'stake_address': None, 'value': '1', 'asset_list': [], 'inline_datum': None, 'reference_script': None}]))
+    cli = tmp_path / 'utxo.json'
+    cli.write_text(json.dumps({f'{tx_hash}#0': {'address': 'addr_test1vpj7gep0xks5k75huhyh2s4kvj628yftnla6jhftsu4xrlq89emfm', 'value': {'lovelace': 1}}}))
+
+    expected = [((tx_hash, 0), {0: bytes.fromhex('60' + CRED), 1: 1})]
+    for path in (tx_info, utxo_info, cli):
+        assert list(iter_dump_outputs(str(path), False)) == expected
+
+
+def test_build_index_command(tmp_path, capsys, stub_aiken, requests_mock):
+    tx_hash = f'{1:064x}'
+    dump = tmp_path / 'tx_info.json'
+    dump.write_text(json.dumps([{'tx_hash': tx_hash, 'outputs': [make_output(tx_hash, 0), make_output(tx_hash, 1)]}]))
+    path = str(tmp_path / 'utxos.idx')
+
+    assert main(['build-index', path, str(dump)]) == 0
+    assert 'indexed 2 utxos' in capsys.readouterr().out
+
+    # a full simulation resolves from the index alone
+    tx_cbor = '84a50081825820000000000000000000000000000000000000000000000000000000000000000101018002020d801280a0f5f6'
+    output = from_cbor(tx_cbor, False, aiken_path=stub_aiken, provider=UtxoIndexProvider(path))
+    assert output[0]['tx'] == tx_cbor
+    assert requests_mock.call_count == 0
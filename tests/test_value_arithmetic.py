@@ -0,0 +1,59 @@
+import random
+
+from tx_simulation import Value, resolve_value_from_input_output
+
+POLICY = 'acab' * 14
+OTHER = 'cafe' * 14
+
+
+def asset(policy, name, quantity):
+    return {'policy_id': policy, 'asset_name': name, 'quantity': str(quantity)}
+
+
+def test_add_and_sub():
+    left = Value.from_koios('10', [asset(POLICY, '01', 5), asset(OTHER, '02', 1)])
+    right = Value.from_koios('3', [asset(POLICY, '01', 2), asset(POLICY, 'aa', 7)])
+    total = left + right
+    assert total == [13, {bytes.fromhex(POLICY): {bytes.fromhex('01'): 7, bytes.fromhex('aa'): 7}, bytes.fromhex(OTHER): {bytes.fromhex('02'): 1}}]
+    assert total - right == left
+    assert left - left == 0
+    assert (left - left).is_zero()
+    assert left + 5 == [15, left.multiasset()]
+    assert 5 + left == left + 5
+    assert -left + left == 0
+
+
+def test_sub_prunes_zero_quantities():
+    left = Value.from_koios('10', [asset(POLICY, '01', 5), asset(POLICY, '02', 1)])
+    right = Value.from_koios('0', [asset(POLICY, '02', 1)])
+    assert (left - right).multiasset() == {bytes.fromhex(POLICY): {bytes.fromhex('01'): 5}}
+
+
+def test_canonical_order():
+    value = Value.from_koios('1', [asset(OTHER, 'ffff', 1), asset(POLICY, 'bb', 1), asset(POLICY, '0000', 1), asset(POLICY, 'aa', 1)])
+    names = list(value.multiasset()[bytes.fromhex(POLICY)])
+    assert names == [bytes.fromhex('aa'), bytes.fromhex('bb'), bytes.fromhex('0000')]
+    assert list(value.multiasset()) == [bytes.fromhex(POLICY), bytes.fromhex(OTHER)]
+
+
+def test_sum_matches_pairwise_addition():
+    rng = random.Random(7)
+    values = []
+    for _ in range(50):
+        assets = [asset(rng.choice([POLICY, OTHER]), rng.choice(['01', '02', 'aabb']), rng.randint(-3, 3)) for _ in range(3)]
+        values.append(Value.from_koios(rng.randint(0, 100), assets))
+    total = Value(0)
+    for value in values:
+        total = total + value
+    assert Value.sum(values) == total
+    assert sum(values) == total
+
+
+def test_from_asset_lists():
+    lists = [[asset(POLICY, '01', 5)], [asset(POLICY, '01', -5), asset(OTHER, '02', 1)], []]
+    assert Value.from_asset_lists(7, lists) == [7, {bytes.fromhex(OTHER): {bytes.fromhex('02'): 1}}]
+    assert Value.from_asset_lists(7, lists[:2]) == Value.sum(Value.from_koios(0, assets) for assets in lists) + 7
+
+
+def test_resolve_value_keeps_netted_form():
+    assert resolve_value_from_input_output(10, [asset(POLICY, '01', 1), asset(POLICY, '01', -1)]) == [10, {}]
@@ -1,10 +1,29 @@
+import asyncio
+import argparse
+import binascii
+import glob
+import hashlib
 import json
+import mmap
 import os
+import random
+import shutil
+import sqlite3
+import struct
 import subprocess
+import sys
 import tempfile
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager, nullcontext
+from typing import NamedTuple
 
 import cbor2
 import requests
+from requests.adapters import HTTPAdapter
 from bech32 import bech32_decode, convertbits
 
 
@@ -17,23 +36,39 @@ def run_bech32(key: str) -> str:
     Returns:
         str: The decoded raw hash.
     """
+    try:
+        raw, contract_flag = decode_bech32(key)
+    except TypeError:
+        raise TypeError(
+            "non-standard format in run_bech32() arg at position 1")
+    return raw.hex(), contract_flag
+
+
+def decode_bech32(key: str) -> tuple[bytes, bool]:
+    """The bytes version of run_bech32, the raw hash is returned without a hex conversion.
+
+    Args:
+        key (str): The key to decode.
+
+    Returns:
+        tuple[bytes, bool]: The decoded raw hash and if the key is a script.
+    """
     try:
         # Bech32 decode
         _, data5 = bech32_decode(key)
 
         # Convert 5-bit array back to 8-bit
-        data8 = convertbits(data5, 5, 8, False)
-
-        hex_string = ''.join(format(x, '02x') for x in data8)
-
-        # remove the network tag
-        if hex_string[:2] in ["e0", "00", "60", "10"]:
-            return hex_string[2:], False
-        else:
-            return hex_string[2:], True
+        data8 = bytes(convertbits(data5, 5, 8, False))
     except TypeError:
         raise TypeError(
-            "non-standard format in run_bech32() arg at position 1")
+            "non-standard format in decode_bech32() arg at position 1")
+
+    # the high nibble of the header is the address type, the low nibble the network
+    header = data8[0]
+    if header >> 4 <= 0x3:
+        # a base address is flagged by its stake part
+        return data8[1:], bool(header & 0x20)
+    return data8[1:], bool(header & 0x10)
 
 
 def to_bytes(s: str) -> bytes:
@@ -74,39 +109,811 @@ def tx_draft_to_resolved_cbor(draft: str) -> list[any]:
             "non-hexadecimal number found in fromhex() arg at position 1")
 
 
-def query_tx_with_koios(hashes: list[str], network: bool) -> list[dict]:
+class StageTimer:
+    """Records the wall time of each stage of a simulation.
+
+    Pass a timer to from_cbor or from_file to collect one record per stage,
+    either read afterwards from records or streamed to a callback as each
+    stage finishes. The stages are decode, resolve_inputs, koios_query,
+    build_resolved_output, cbor_encode and aiken.
+    """
+
+    def __init__(self, callback=None, **fields):
+        """
+        Args:
+            callback (callable, optional): Called with each record as it is made. Defaults to None.
+            **fields: Extra fields added to every record, like a tx id.
+        """
+        self.callback = callback
+        self.fields = fields
+        self.records = []
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the body of the with block as a stage.
+
+        Args:
+            name (str): The stage name.
+        """
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record = {
+                'stage': name,
+                'seconds': time.perf_counter() - start,
+                'started_at': started_at,
+                **self.fields
+            }
+            self.records.append(record)
+            if self.callback is not None:
+                self.callback(record)
+
+    def totals(self) -> dict[str, float]:
+        """Return the total seconds spent in each stage.
+
+        Returns:
+            dict[str, float]: The seconds keyed by stage, in the order the stages ran.
+        """
+        totals = {}
+        for record in self.records:
+            totals[record['stage']] = totals.get(record['stage'], 0.0) + record['seconds']
+        return totals
+
+    def to_json(self) -> str:
+        """Return the records as json lines.
+
+        Returns:
+            str: One json record per line.
+        """
+        return ''.join(json.dumps(record) + '\n' for record in self.records)
+
+
+def timed(timer: StageTimer | None, name: str):
+    """Return a stage context for the timer, or a no op context without one.
+
+    Args:
+        timer (StageTimer | None): The timer.
+        name (str): The stage name.
+    """
+    return nullcontext() if timer is None else timer.stage(name)
+
+
+class TokenBucket:
+    """A thread safe token bucket. Tokens refill at rate per second up to burst and
+    each acquire takes one, waiting for it when the bucket is empty.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Args:
+            rate (float): The tokens added per second.
+            burst (int, optional): The most tokens the bucket holds. Defaults to 1.
+        """
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate and burst must be positive")
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Take a token, blocking until one is available."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_for = (1 - self._tokens) / self.rate
+            time.sleep(wait_for)
+
+
+class KoiosClient:
+    """A Koios client that keeps its connections alive between queries.
+
+    Hash lists are split into chunks of at most chunk_size hashes which are
+    fetched concurrently. Rate limited (429) and server error (5xx) responses
+    and connection failures are retried with jittered exponential backoff.
+    """
+
+    # retried response status codes
+    RETRY_STATUS = (429, 500, 502, 503, 504)
+
+    # the utxo fields that build_resolved_output reads
+    UTXO_FIELDS = (
+        'tx_hash', 'tx_index', 'address', 'payment_cred', 'stake_address',
+        'value', 'asset_list', 'inline_datum', 'reference_script'
+    )
+
+    def __init__(self, chunk_size: int = 50, max_workers: int = 4, timeout: float | tuple[float, float] = (5.0, 30.0), retries: int = 5, backoff: float = 0.5, max_backoff: float = 30.0, utxo_lookup: bool = False, limiter: TokenBucket | None = None):
+        """
+        Args:
+            chunk_size (int, optional): The maximum number of hashes per request. Defaults to 50.
+            max_workers (int, optional): The number of chunks fetched concurrently. Defaults to 4.
+            timeout (float | tuple[float, float], optional): The requests connect and read timeout. Defaults to (5.0, 30.0).
+            retries (int, optional): The number of retries after the first attempt. Defaults to 5.
+            backoff (float, optional): The base backoff in seconds. Defaults to 0.5.
+            max_backoff (float, optional): The largest backoff in seconds. Defaults to 30.0.
+            utxo_lookup (bool, optional): Resolve inputs with utxo_info instead of tx_info. Defaults to False.
+            limiter (TokenBucket, optional): Every request, retries included, takes a token first. Defaults to None.
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive")
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.utxo_lookup = utxo_lookup
+        self.limiter = limiter
+
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_maxsize=max_workers))
+        self.session.headers.update({
+            'accept': 'application/json',
+            'content-type': 'application/json',
+        })
+
+    @staticmethod
+    def url(network: bool, endpoint: str) -> str:
+        """Return the Koios url of an endpoint.
+
+        Args:
+            network (bool): The network flag, mainnet (True) or preprod (False).
+            endpoint (str): The endpoint name, like tx_info.
+
+        Returns:
+            str: The endpoint url.
+        """
+        # mainnet and preprod only
+        subdomain = "api" if network is True else "preprod"
+        return 'https://' + subdomain + '.koios.rest/api/v1/' + endpoint
+
+    def _delay(self, attempt: int, response: requests.Response | None) -> float:
+        # respect the server when it says how long to wait
+        if response is not None:
+            try:
+                return min(float(response.headers['Retry-After']), self.max_backoff)
+            except (KeyError, ValueError):
+                pass
+        # full jitter spreads out clients that were limited together
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def post(self, url: str, json_data: dict) -> list[dict] | dict:
+        """Post to Koios, retrying rate limits, server errors and connection failures.
+
+        Args:
+            url (str): The endpoint url.
+            json_data (dict): The json body.
+
+        Returns:
+            list[dict] | dict: The decoded json response.
+        """
+        for attempt in range(self.retries + 1):
+            if self.limiter is not None:
+                self.limiter.acquire()
+            try:
+                response = self.session.post(url=url, json=json_data, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                time.sleep(self._delay(attempt, None))
+                continue
+
+            if response.status_code in self.RETRY_STATUS and attempt < self.retries:
+                time.sleep(self._delay(attempt, response))
+                continue
+            return response.json()
+
+    def chunks(self, items: list) -> list[list]:
+        """Split a list into chunks of at most chunk_size items.
+
+        Args:
+            items (list): The list to split.
+
+        Returns:
+            list[list]: The chunks, a single chunk when the list is small.
+        """
+        if len(items) <= self.chunk_size:
+            return [items]
+        return [items[i:i + self.chunk_size] for i in range(0, len(items), self.chunk_size)]
+
+    def post_chunked(self, url: str, key: str, items: list, json_data: dict) -> list[dict] | dict:
+        """Post a list in chunks concurrently and join the responses.
+
+        Args:
+            url (str): The endpoint url.
+            key (str): The body key that holds the list.
+            items (list): The list to chunk.
+            json_data (dict): The rest of the json body.
+
+        Returns:
+            list[dict] | dict: The joined responses or the first error response.
+        """
+        chunks = self.chunks(items)
+        if len(chunks) == 1:
+            return self.post(url, {key: items, **json_data})
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            responses = list(executor.map(lambda chunk: self.post(url, {key: chunk, **json_data}), chunks))
+
+        joined = []
+        for response in responses:
+            # an error response is not a list so return it as is
+            if not isinstance(response, list):
+                return response
+            joined += response
+        return joined
+
+    def tx_info(self, hashes: list[str], network: bool) -> list[dict]:
+        """Query the transaction information from a list of transaction hashes.
+
+        Args:
+            hashes (list): The list of tx hashes.
+            network (bool): The network flag, mainnet (True) or preprod (False).
+
+        Returns:
+            list: A list of transaction information.
+        """
+        json_data = {
+            '_inputs': True,
+            "_metadata": True,
+            "_assets": True,
+            "_withdrawals": True,
+            "_certs": True,
+            "_scripts": True,
+            "_bytecode": True
+        }
+        return self.post_chunked(self.url(network, 'tx_info'), '_tx_hashes', hashes, json_data)
+
+    def utxo_info(self, utxos: list[tuple[str, int]], network: bool) -> list[dict]:
+        """Query only the referenced utxos and only the fields needed to resolve them.
+
+        Args:
+            utxos (list[tuple[str, int]]): The utxo inputs.
+            network (bool): The network flag, mainnet (True) or preprod (False).
+
+        Returns:
+            list: A list of utxo information.
+        """
+        # the select keeps the response down to the fields that get used
+        url = self.url(network, 'utxo_info') + '?select=' + ','.join(self.UTXO_FIELDS)
+        refs = [f"{txin[0]}#{txin[1]}" for txin in utxos]
+        return self.post_chunked(url, '_utxo_refs', refs, {'_extended': True})
+
+
+class KoiosScheduler(KoiosClient):
+    """A KoiosClient to share between concurrent callers.
+
+    Identical lookups already in flight are coalesced into one, lookups made
+    within window seconds of each other are merged into a single request, and
+    every request is paced by a token bucket.
+    """
+
+    def __init__(self, window: float = 0.005, rate: float | None = 10.0, burst: int = 10, **kwargs):
+        """
+        Args:
+            window (float, optional): How long a batch waits for more lookups, in seconds. Defaults to 0.005.
+            rate (float, optional): The requests per second, None turns the limiter off. Defaults to 10.0.
+            burst (int, optional): The requests allowed at once before pacing. Defaults to 10.
+            **kwargs: The KoiosClient arguments.
+        """
+        if rate is not None:
+            kwargs.setdefault('limiter', TokenBucket(rate, burst))
+        super().__init__(**kwargs)
+        self.window = window
+        self._lock = threading.Lock()
+        # (endpoint, network, item) -> the future of its lookup
+        self._inflight = {}
+        # (endpoint, network) -> the items waiting for the next request
+        self._batches = {}
+
+    def _flush(self, endpoint: str, network: bool, batch: dict, fetch, key_of) -> None:
+        failure = None
+        try:
+            response = fetch(list(batch), network)
+        except Exception as error:
+            # every caller waiting on the batch sees the failure
+            failure = error
+        else:
+            if isinstance(response, list):
+                index = {key_of(entry): entry for entry in response}
+                results = {item: (True, index.get(item)) for item in batch}
+            else:
+                # an error response goes back to everyone in the batch
+                results = {item: (False, response) for item in batch}
+
+        with self._lock:
+            for item in batch:
+                del self._inflight[(endpoint, network, item)]
+        for item, future in batch.items():
+            if failure is not None:
+                future.set_exception(failure)
+            else:
+                future.set_result(results[item])
+
+    def _gather(self, endpoint: str, items: list, network: bool, fetch, key_of) -> list[dict] | dict:
+        items = list(dict.fromkeys(items))
+        futures = {}
+        leader = False
+        with self._lock:
+            for item in items:
+                future = self._inflight.get((endpoint, network, item))
+                if future is None:
+                    future = Future()
+                    self._inflight[(endpoint, network, item)] = future
+                    batch = self._batches.get((endpoint, network))
+                    if batch is None:
+                        # the caller that opens a batch sends it
+                        batch = self._batches[(endpoint, network)] = {}
+                        leader = True
+                    batch[item] = future
+                futures[item] = future
+
+        if leader is True:
+            time.sleep(self.window)
+            with self._lock:
+                batch = self._batches.pop((endpoint, network))
+            self._flush(endpoint, network, batch, fetch, key_of)
+
+        entries = []
+        for item in items:
+            ok, value = futures[item].result()
+            if ok is False:
+                return value
+            if value is not None:
+                entries.append(value)
+        return entries
+
+    def tx_info(self, hashes: list[str], network: bool) -> list[dict]:
+        return self._gather('tx_info', hashes, network, super().tx_info, lambda tx: tx['tx_hash'])
+
+    def utxo_info(self, utxos: list[tuple[str, int]], network: bool) -> list[dict]:
+        utxos = [(txin[0], int(txin[1])) for txin in utxos]
+        return self._gather('utxo_info', utxos, network, super().utxo_info, lambda utxo: (utxo['tx_hash'], utxo['tx_index']))
+
+
+# the client shared by queries that do not bring their own
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def default_koios_client() -> KoiosClient:
+    """Return the shared Koios client, creating it on first use.
+
+    Returns:
+        KoiosClient: The shared client.
+    """
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = KoiosClient()
+        return _default_client
+
+
+def query_tx_with_koios(hashes: list[str], network: bool, client: KoiosClient | None = None) -> list[dict]:
     """Uses Koios to query the transaction information from a list of
     transaction hashes. The return order may not match the input order.
 
     Args:
         hashes (list): The list of tx hashes.
         network (bool): The network flag, mainnet (True) or preprod (False).
+        client (KoiosClient, optional): The Koios client. Defaults to the shared client.
 
     Returns:
         list: A list of transaction information.
     """
-    # mainnet and preprod only
-    subdomain = "api" if network is True else "preprod"
-
-    json_data = {
-        '_tx_hashes': hashes,
-        '_inputs': True,
-        "_metadata": True,
-        "_assets": True,
-        "_withdrawals": True,
-        "_certs": True,
-        "_scripts": True,
-        "_bytecode": True
-    }
+    if client is None:
+        client = default_koios_client()
+    # return the tx information for a list of transactions, (the inputs)
+    return client.tx_info(hashes, network)
 
-    headers = {
-        'accept': 'application/json',
-        'content-type': 'application/json',
-    }
 
-    url = 'https://' + subdomain + '.koios.rest/api/v1/tx_info'
-    # return the tx information for a list of transactions, (the inputs)
-    return requests.post(url=url, headers=headers, json=json_data).json()
+def query_utxos_with_koios(utxos: list[tuple[str, int]], network: bool, client: KoiosClient | None = None) -> list[dict]:
+    """Uses Koios to query the outputs of a list of utxo inputs. Only the referenced
+    outputs are returned, in the output format of query_tx_with_koios. The return
+    order may not match the input order.
+
+    Args:
+        utxos (list[tuple[str, int]]): The utxo inputs.
+        network (bool): The network flag, mainnet (True) or preprod (False).
+        client (KoiosClient, optional): The Koios client. Defaults to the shared client.
+
+    Returns:
+        list: A list of transaction outputs.
+    """
+    if client is None:
+        client = default_koios_client()
+    response = client.utxo_info(utxos, network)
+    # an error response is passed along as is
+    if not isinstance(response, list):
+        return response
+
+    # utxo_info names a few fields differently than the tx_info outputs
+    return [{
+        'tx_hash': utxo['tx_hash'],
+        'tx_index': utxo['tx_index'],
+        'payment_addr': {'bech32': utxo.get('address'), 'cred': utxo['payment_cred']},
+        'stake_addr': utxo.get('stake_address'),
+        'value': utxo['value'],
+        'asset_list': utxo.get('asset_list') or [],
+        'inline_datum': utxo.get('inline_datum'),
+        'reference_script': utxo.get('reference_script'),
+    } for utxo in response]
+
+
+class TxIn(NamedTuple):
+    """A utxo input as raw bytes, it encodes to cbor as the [tx_id, index] array."""
+
+    tx_id: bytes
+    index: int
+
+    @property
+    def key(self) -> tuple[str, int]:
+        """The (tx_hash, tx_index) form used by the providers and caches."""
+        return self.tx_id.hex(), self.index
+
+
+class Value:
+    """A compact output value, the lovelace and the multiasset as sorted tuples.
+
+    It equals the int or [lovelace, {policy: {name: quantity}}] form that
+    resolve_value_from_input_output returns. Values add and subtract with a
+    linear merge of the sorted assets, dropping zero quantities as they meet,
+    and the assets are always in canonical cbor order.
+    """
+
+    __slots__ = ('coin', 'assets')
+
+    def __init__(self, coin: int, assets: tuple = ()):
+        """
+        Args:
+            coin (int): The lovelace.
+            assets (tuple, optional): ((policy, ((name, quantity), ...)), ...) in canonical order. Defaults to ().
+        """
+        self.coin = coin
+        self.assets = assets
+
+    @staticmethod
+    def order(key: bytes) -> tuple[int, bytes]:
+        # canonical cbor orders map keys by length then bytes
+        return len(key), key
+
+    @classmethod
+    def from_totals(cls, coin: int, totals: dict) -> 'Value':
+        # one sort of the accumulated {policy: {name: quantity}} totals
+        assets = []
+        for policy in sorted(totals, key=cls.order):
+            names = totals[policy]
+            names = tuple((name, names[name]) for name in sorted(names, key=cls.order) if names[name] != 0)
+            if len(names) > 0:
+                assets.append((policy, names))
+        return cls(coin, tuple(assets))
+
+    @classmethod
+    def from_asset_lists(cls, lovelace: int | str, asset_lists: list[list[dict]]) -> 'Value':
+        """Sum many Koios asset lists into one value in a single pass.
+
+        Args:
+            lovelace (int | str): The lovelace.
+            asset_lists (list[list[dict]]): The Koios asset lists, like the asset_list of many utxos.
+
+        Returns:
+            Value: The total value.
+        """
+        totals = {}
+        # an asset has the form
+        # {"policy_id": "acab", "asset_name": "cafe", "quantity": 1}
+        for assets in asset_lists:
+            for asset in assets:
+                names = totals.setdefault(to_bytes(asset['policy_id']), {})
+                name = to_bytes(asset['asset_name'])
+                names[name] = names.get(name, 0) + int(asset['quantity'])
+        return cls.from_totals(int(lovelace), totals)
+
+    @classmethod
+    def sum(cls, values: list) -> 'Value':
+        """Sum many values at once, faster than adding them one by one.
+
+        Args:
+            values (list[Value | int | list]): The values.
+
+        Returns:
+            Value: The total value.
+        """
+        coin = 0
+        totals = {}
+        for value in values:
+            value = cls.from_primitive(value)
+            coin += value.coin
+            for policy, names in value.assets:
+                total = totals.setdefault(policy, {})
+                for name, quantity in names:
+                    total[name] = total.get(name, 0) + quantity
+        return cls.from_totals(coin, totals)
+
+    @classmethod
+    def from_multiasset(cls, coin: int, multiasset: dict) -> 'Value':
+        """Build a value from a {policy: {name: quantity}} dict, dropping zero quantities.
+
+        Args:
+            coin (int): The lovelace.
+            multiasset (dict): The assets.
+
+        Returns:
+            Value: The value.
+        """
+        totals = {bytes(policy): {bytes(name): int(quantity) for name, quantity in names.items()} for policy, names in multiasset.items()}
+        return cls.from_totals(int(coin), totals)
+
+    @classmethod
+    def from_primitive(cls, value: int | list) -> 'Value':
+        """Build a value from its cbor form.
+
+        Args:
+            value (int | list): The lovelace or [lovelace, multiasset].
+
+        Returns:
+            Value: The value.
+        """
+        if isinstance(value, Value):
+            return value
+        if isinstance(value, int):
+            return cls(value)
+        return cls.from_multiasset(value[0], value[1])
+
+    @classmethod
+    def from_koios(cls, lovelace: int | str, assets: list[dict]) -> 'Value':
+        """Build a value from the Koios lovelace and asset list, see resolve_value_from_input_output.
+
+        Args:
+            lovelace (int | str): The lovelace.
+            assets (list[dict]): The Koios asset list.
+
+        Returns:
+            Value: The value.
+        """
+        return cls.from_asset_lists(lovelace, [assets])
+
+    def multiasset(self) -> dict:
+        """The assets as a {policy: {name: quantity}} dict in canonical order.
+
+        Returns:
+            dict: The multiasset.
+        """
+        return {policy: dict(names) for policy, names in self.assets}
+
+    def to_primitive(self) -> int | list:
+        """The cbor form of the value.
+
+        Returns:
+            int | list: The lovelace or [lovelace, multiasset].
+        """
+        if len(self.assets) == 0:
+            return self.coin
+        return [self.coin, self.multiasset()]
+
+    @classmethod
+    def merge(cls, left: tuple, right: tuple, sign: int = 1) -> tuple:
+        """Merge two sorted asset tuples, adding or subtracting the right side.
+        Quantities that sum to zero are dropped as they meet.
+
+        Args:
+            left (tuple): The sorted ((key, item), ...) pairs.
+            right (tuple): The sorted ((key, item), ...) pairs.
+            sign (int, optional): 1 to add the right side, -1 to subtract it. Defaults to 1.
+
+        Returns:
+            tuple: The merged pairs, still sorted.
+        """
+        merged = []
+        i = j = 0
+        while i < len(left) and j < len(right):
+            left_key, right_key = cls.order(left[i][0]), cls.order(right[j][0])
+            if left_key < right_key:
+                merged.append(left[i])
+                i += 1
+            elif right_key < left_key:
+                merged.append(cls.scaled(right[j], sign))
+                j += 1
+            else:
+                item = cls.combine(left[i][1], right[j][1], sign)
+                if item:
+                    merged.append((left[i][0], item))
+                i += 1
+                j += 1
+        merged.extend(left[i:])
+        merged.extend(cls.scaled(pair, sign) for pair in right[j:])
+        return tuple(merged)
+
+    @classmethod
+    def combine(cls, left: int | tuple, right: int | tuple, sign: int) -> int | tuple:
+        # a quantity under a name or the names under a policy
+        if isinstance(left, int):
+            return left + sign * right
+        return cls.merge(left, right, sign)
+
+    @classmethod
+    def scaled(cls, pair: tuple, sign: int) -> tuple:
+        if sign == 1:
+            return pair
+        key, item = pair
+        if isinstance(item, int):
+            return key, -item
+        return key, tuple(cls.scaled(name, sign) for name in item)
+
+    def __add__(self, other) -> 'Value':
+        if not isinstance(other, (Value, int, list)):
+            return NotImplemented
+        other = Value.from_primitive(other)
+        return Value(self.coin + other.coin, self.merge(self.assets, other.assets))
+
+    __radd__ = __add__
+
+    def __sub__(self, other) -> 'Value':
+        if not isinstance(other, (Value, int, list)):
+            return NotImplemented
+        other = Value.from_primitive(other)
+        return Value(self.coin - other.coin, self.merge(self.assets, other.assets, -1))
+
+    def __rsub__(self, other) -> 'Value':
+        if not isinstance(other, (Value, int, list)):
+            return NotImplemented
+        return Value.from_primitive(other) - self
+
+    def __neg__(self) -> 'Value':
+        return Value(-self.coin, tuple(self.scaled(pair, -1) for pair in self.assets))
+
+    def is_zero(self) -> bool:
+        """If the value holds no lovelace and no assets.
+
+        Returns:
+            bool: True for the zero value.
+        """
+        return self.coin == 0 and len(self.assets) == 0
+
+    def __getitem__(self, index: int):
+        # reads like the [lovelace, multiasset] list
+        return self.to_primitive()[index]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Value):
+            return self.coin == other.coin and self.assets == other.assets
+        if isinstance(other, (int, list)):
+            return self.to_primitive() == other
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        # a lovelace only value hashes like the int it equals
+        return hash(self.coin) if len(self.assets) == 0 else hash((self.coin, self.assets))
+
+    def __repr__(self) -> str:
+        return f"Value({self.to_primitive()!r})"
+
+
+class ResolvedOutput(Mapping):
+    """A compact resolved output. It reads like the {0: address, 1: value, 2: datum,
+    3: script_ref} dict it replaces, without a hash table per output.
+    """
+
+    __slots__ = ('address', 'value', 'datum', 'script_ref')
+
+    def __init__(self, address: bytes | None, value: Value | None, datum: list | None = None, script_ref: cbor2.CBORTag | None = None):
+        """
+        A field set to None is left out, like a missing key of the dict.
+
+        Args:
+            address (bytes): The address bytes.
+            value (Value): The value.
+            datum (list, optional): The [0, hash] or [1, inline datum] option. Defaults to None.
+            script_ref (cbor2.CBORTag, optional): The reference script. Defaults to None.
+        """
+        self.address = address
+        self.value = value
+        self.datum = datum
+        self.script_ref = script_ref
+
+    @classmethod
+    def from_dict(cls, resolved: dict) -> 'ResolvedOutput':
+        """Build from the int keyed dict form.
+
+        Args:
+            resolved (dict): The resolved output dict.
+
+        Returns:
+            ResolvedOutput: The resolved output.
+        """
+        if isinstance(resolved, ResolvedOutput):
+            return resolved
+        value = resolved.get(1)
+        return cls(resolved.get(0), Value.from_primitive(value) if value is not None else None, resolved.get(2), resolved.get(3))
+
+    def to_dict(self) -> dict:
+        """The int keyed dict form, as it is encoded to cbor.
+
+        Returns:
+            dict: The resolved output dict.
+        """
+        resolved = {key: getattr(self, self.__slots__[key]) for key in self}
+        if 1 in resolved:
+            resolved[1] = self.value.to_primitive()
+        return resolved
+
+    def __getitem__(self, key: int):
+        if not isinstance(key, int) or not 0 <= key < 4:
+            raise KeyError(key)
+        item = getattr(self, self.__slots__[key])
+        if item is None:
+            raise KeyError(key)
+        return item
+
+    def __iter__(self):
+        return (key for key in range(4) if getattr(self, self.__slots__[key]) is not None)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"ResolvedOutput({self.to_dict()!r})"
+
+
+def cbor_default(encoder: cbor2.CBOREncoder, value: any) -> None:
+    """The cbor2 default hook for the compact types.
+
+    Args:
+        encoder (cbor2.CBOREncoder): The encoder.
+        value (any): The value cbor2 could not encode.
+    """
+    if isinstance(value, ResolvedOutput):
+        encoder.encode(value.to_dict())
+    elif isinstance(value, Value):
+        encoder.encode(value.to_primitive())
+    else:
+        raise cbor2.CBOREncodeTypeError(f"cannot serialize type {type(value).__name__}")
+
+
+def encode_cbor(data: any) -> bytes:
+    """cbor2.dumps with the compact types encoded directly.
+
+    Args:
+        data (any): The data to encode.
+
+    Returns:
+        bytes: The cbor.
+    """
+    return cbor2.dumps(data, default=cbor_default)
+
+
+def decode_tx(tx_cbor: str | bytes | memoryview) -> tuple[bytes | memoryview, list]:
+    """Decode a tx given as hex or as raw bytes.
+
+    Args:
+        tx_cbor (str | bytes | memoryview): The transaction cbor.
+
+    Raises:
+        ValueError: The tx is not valid hex or cbor.
+        TypeError: The tx is neither hex nor bytes.
+
+    Returns:
+        tuple[bytes | memoryview, list]: The raw transaction cbor and the decoded transaction.
+    """
+    if isinstance(tx_cbor, str):
+        tx_bytes = to_bytes(tx_cbor)
+    elif isinstance(tx_cbor, (bytes, bytearray, memoryview)):
+        tx_bytes = tx_cbor
+    else:
+        raise TypeError(f"the tx must be hex or bytes, not {type(tx_cbor).__name__}")
+    try:
+        return tx_bytes, cbor2.loads(tx_bytes)
+    except cbor2.CBORDecodeError as error:
+        # truncated cbor is an EOFError rather than a ValueError
+        raise ValueError(str(error)) from error
 
 
 def resolve_inputs(tx_cbor: str) -> tuple[list[tuple[str, int]], list[dict]]:
@@ -124,17 +931,47 @@ def resolve_inputs(tx_cbor: str) -> tuple[list[tuple[str, int]], list[dict]]:
     """
     # resolve the data from the cbor
     data = tx_draft_to_resolved_cbor(tx_cbor)
+    return resolve_decoded_inputs(data)
+
+
+def resolve_decoded_inputs(data: list) -> list[tuple[str, int]]:
+    """Resolves the inputs of an already decoded tx, see resolve_inputs.
+
+    Args:
+        data (list): The decoded transaction.
+
+    Raises:
+        KeyError: The inputs, collateral, and reference inputs must exist inside the tx.
+
+    Returns:
+        list[tuple[str, int]]: The utxo inputs.
+    """
+    return [(txid.hex(), idx) for txid, idx in decoded_input_refs(data)]
+
+
+def decoded_input_refs(data: list) -> list[TxIn]:
+    """The bytes version of resolve_decoded_inputs, the tx ids are kept as raw bytes.
+
+    Args:
+        data (list): The decoded transaction.
 
+    Raises:
+        KeyError: The inputs, collateral, and reference inputs must exist inside the tx.
+
+    Returns:
+        list[TxIn]: The utxo inputs.
+    """
     try:
         # we just need the body here
         txBody = data[0]
 
         # all the types of inputs; tx inputs, collateral, and reference
-        inputs = list(txBody[0]) + list(txBody[13]) + list(txBody[18])
+        inputs = list(txBody[0]) + list(txBody.get(13, [])) + list(txBody.get(18, []))
 
         # convert into list of tuples
-        inputs = [(utxo[0].hex(), int(utxo[1])) for utxo in inputs]
-    except KeyError:
+        inputs = [TxIn(bytes(utxo[0]), int(utxo[1])) for utxo in inputs]
+    except (KeyError, TypeError, IndexError, AttributeError):
+        # a tx or body of the wrong shape is missing them too
         raise KeyError("required tx body elements are missing")
 
     return inputs
@@ -155,48 +992,827 @@ def resolve_value_from_input_output(lovelace: int, assets: list[dict]) -> int |
     """
     # its just an int when its lovelace only
     if len(assets) == 0:
-        value = int(lovelace)
-    else:
-        # build out the token dictionary
-        tokens = {}
+        return int(lovelace)
 
-        # an asset has the form
-        # {"policy_id": "acab", "asset_name": "cafe", "quantity": 1}
-        for asset in assets:
-            pid = to_bytes(asset['policy_id'])
-            tkn = to_bytes(asset['asset_name'])
-            amt = int(asset['quantity'])
-            # initialize the dict
-            if pid not in tokens:
-                tokens[pid] = {}
-
-            # its already a dict
-            if tkn in tokens[pid]:
-                # add to the value
-                tokens[pid][tkn] += amt
+    # tokens with a net amount of zero are removed while merging
+    return [int(lovelace), Value.from_asset_lists(0, [assets]).multiasset()]
+
+
+class UtxoCache:
+    """A persistent SQLite cache of resolved outputs keyed by (tx_hash, tx_index).
+
+    A confirmed UTxO never changes so an entry is never invalidated, it is only
+    evicted, least recently used first, once the cache holds more than
+    max_entries outputs. The network and plutus version are part of the key
+    since both change the resolved output.
+
+    A hit is a read only. The new use times are kept in memory and written in
+    one transaction on the next put, or once flush_every hits are pending.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100_000, flush_every: int = 256):
+        """
+        Args:
+            path (str): The SQLite database file, ':memory:' keeps it in memory.
+            max_entries (int, optional): The maximum number of cached outputs. Defaults to 100_000.
+            flush_every (int, optional): The number of pending use times that forces a write. Defaults to 256.
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be positive")
+        self.path = path
+        self.max_entries = max_entries
+        self.flush_every = flush_every
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._touched = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # a commit does not wait for a disk sync
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS resolved_outputs ("
+            "tx_hash TEXT NOT NULL, "
+            "tx_index INTEGER NOT NULL, "
+            "network INTEGER NOT NULL, "
+            "plutus_version INTEGER NOT NULL, "
+            "output BLOB NOT NULL, "
+            "last_used INTEGER NOT NULL, "
+            "PRIMARY KEY (tx_hash, tx_index, network, plutus_version))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS resolved_outputs_last_used ON resolved_outputs (last_used)")
+        self._conn.commit()
+        self._size, self._clock = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(MAX(last_used), 0) FROM resolved_outputs").fetchone()
+
+    def _tick(self) -> int:
+        # a monotonic use counter keeps the eviction order exact
+        self._clock += 1
+        return self._clock
+
+    def get(self, tx_hash: str, tx_index: int, network: bool, plutus_version: int = 3) -> dict | None:
+        """Return the cached resolved output or None on a miss.
+
+        Args:
+            tx_hash (str): The transaction hash of the utxo.
+            tx_index (int): The output index of the utxo.
+            network (bool): The network flag, mainnet (True) or preprod (False).
+            plutus_version (int, optional): The plutus version of reference scripts. Defaults to 3.
+
+        Returns:
+            dict | None: The resolved output if it is cached.
+        """
+        key = (tx_hash, int(tx_index), int(network), plutus_version)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT output FROM resolved_outputs "
+                "WHERE tx_hash = ? AND tx_index = ? AND network = ? AND plutus_version = ?",
+                key
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touched[key] = self._tick()
+            if len(self._touched) >= self.flush_every:
+                self._flush()
+                self._conn.commit()
+        return ResolvedOutput.from_dict(cbor2.loads(row[0]))
+
+    def _flush(self) -> None:
+        # write the pending use times, the caller holds the lock and commits
+        if len(self._touched) == 0:
+            return
+        self._conn.executemany(
+            "UPDATE resolved_outputs SET last_used = ? "
+            "WHERE tx_hash = ? AND tx_index = ? AND network = ? AND plutus_version = ?",
+            [(last_used,) + key for key, last_used in self._touched.items()]
+        )
+        self._touched.clear()
+
+    def flush(self) -> None:
+        """Write the pending use times of cache hits."""
+        with self._lock:
+            self._flush()
+            self._conn.commit()
+
+    def put(self, tx_hash: str, tx_index: int, network: bool, resolved: dict, plutus_version: int = 3) -> None:
+        """Store a resolved output, evicting the least recently used outputs when full.
+
+        Args:
+            tx_hash (str): The transaction hash of the utxo.
+            tx_index (int): The output index of the utxo.
+            network (bool): The network flag, mainnet (True) or preprod (False).
+            resolved (dict): The resolved output from build_resolved_output.
+            plutus_version (int, optional): The plutus version of reference scripts. Defaults to 3.
+        """
+        key = (tx_hash, int(tx_index), int(network), plutus_version)
+        with self._lock:
+            # the eviction order needs every use time
+            self._flush()
+            exists = self._conn.execute(
+                "SELECT 1 FROM resolved_outputs "
+                "WHERE tx_hash = ? AND tx_index = ? AND network = ? AND plutus_version = ?",
+                key
+            ).fetchone() is not None
+            self._conn.execute(
+                "INSERT OR REPLACE INTO resolved_outputs "
+                "(tx_hash, tx_index, network, plutus_version, output, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                key + (encode_cbor(resolved), self._tick())
+            )
+            # a replaced output does not change the size
+            if exists is False:
+                self._size += 1
+            if self._size > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM resolved_outputs WHERE rowid IN ("
+                    "SELECT rowid FROM resolved_outputs ORDER BY last_used LIMIT ?)",
+                    (self._size - self.max_entries,)
+                )
+                self._size = self.max_entries
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """Return the hit and miss counters and the number of cached outputs.
+
+        Returns:
+            dict: The cache statistics.
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self)}
+
+    def clear(self) -> None:
+        """Remove every cached output and reset the counters."""
+        with self._lock:
+            self._touched.clear()
+            self._conn.execute("DELETE FROM resolved_outputs")
+            self._conn.commit()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def close(self) -> None:
+        """Write the pending use times and close the underlying database connection."""
+        with self._lock:
+            self._flush()
+            self._conn.commit()
+            self._conn.close()
+
+    def __len__(self) -> int:
+        return self._size
+
+
+def index_outputs(txs: list[dict]) -> dict[tuple[str, int], dict]:
+    """Index every output of a Koios tx_info response by its utxo.
+
+    Args:
+        txs (list[dict]): The transaction information from query_tx_with_koios.
+
+    Returns:
+        dict[tuple[str, int], dict]: The outputs keyed by (tx_hash, tx_index).
+    """
+    # an error response has no outputs
+    if not isinstance(txs, list):
+        return {}
+    return {(utxo['tx_hash'], utxo['tx_index']): utxo for tx in txs for utxo in tx['outputs']}
+
+
+class AddressEncoder:
+    """Builds address bytes from a payment credential and an optional stake address.
+
+    Decoded stake credentials are kept in a bounded LRU since many outputs share a
+    handful of stake keys, and the header byte comes from a precomputed table.
+    """
+
+    # (script payment, stake type, network) -> header byte, the stake type is
+    # None without a stake part, False for a key and True for a script
+    HEADERS = {
+        (script_payment, stake_type, network): (kind << 4) | (1 if network else 0)
+        for (script_payment, stake_type), kind in {
+            (False, False): 0b0000,
+            (True, False): 0b0001,
+            (False, True): 0b0010,
+            (True, True): 0b0011,
+            (False, None): 0b0110,
+            (True, None): 0b0111,
+        }.items()
+        for network in (False, True)
+    }
+
+    def __init__(self, max_entries: int = 4096):
+        """
+        Args:
+            max_entries (int, optional): The most stake credentials kept. Defaults to 4096.
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._stake = OrderedDict()
+        self._lock = threading.Lock()
+
+    def stake_credential(self, stake_addr: str) -> tuple[bytes, bool]:
+        """Decode a stake address, see decode_bech32. Results are cached.
+
+        Args:
+            stake_addr (str): The bech32 stake address.
+
+        Returns:
+            tuple[bytes, bool]: The stake credential and if it is a script.
+        """
+        with self._lock:
+            cached = self._stake.get(stake_addr)
+            if cached is not None:
+                self._stake.move_to_end(stake_addr)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        decoded = decode_bech32(stake_addr)
+        with self._lock:
+            self._stake[stake_addr] = decoded
+            while len(self._stake) > self.max_entries:
+                self._stake.popitem(last=False)
+        return decoded
+
+    def encode(self, payment_cred: str | bytes, stake_addr: str | None, network: bool, script_payment: bool = False) -> bytes:
+        """Build the address bytes, header included.
+
+        Args:
+            payment_cred (str | bytes): The payment credential, as hex or raw bytes.
+            stake_addr (str | None): The bech32 stake address, if any.
+            network (bool): The network flag, mainnet (True) or preprod (False).
+            script_payment (bool, optional): The payment credential is a script. Defaults to False.
+
+        Returns:
+            bytes: The address bytes.
+        """
+        if isinstance(payment_cred, str):
+            payment_cred = to_bytes(payment_cred)
+        if stake_addr is None:
+            return bytes((self.HEADERS[script_payment, None, network is True],)) + payment_cred
+        stake_key, contract_flag = self.stake_credential(stake_addr)
+        return bytes((self.HEADERS[script_payment, contract_flag, network is True],)) + payment_cred + stake_key
+
+    def stats(self) -> dict:
+        """The hit and miss counts of the stake credential cache.
+
+        Returns:
+            dict: The hits, misses and current size.
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._stake)}
+
+
+_default_encoder = AddressEncoder()
+
+
+def default_address_encoder() -> AddressEncoder:
+    """Return the shared address encoder used by resolve_output.
+
+    Returns:
+        AddressEncoder: The shared encoder.
+    """
+    return _default_encoder
+
+
+class ScriptStore:
+    """A content addressed store of reference scripts keyed by script hash.
+
+    Each script is decoded and wrapped into its reference script form once, with
+    its own language version, and every output carrying it shares that entry.
+    The version comes from the Koios script type, or else from matching the Koios
+    script hash against the hash of the bytes under each language tag.
+    """
+
+    # Koios script types to script ref language tags
+    LANGUAGES = {'timelock': 0, 'multisig': 0, 'plutusV1': 1, 'plutusV2': 2, 'plutusV3': 3}
+
+    def __init__(self, max_entries: int = 1024):
+        """
+        Args:
+            max_entries (int, optional): The most scripts kept, least recently used go first. Defaults to 1024.
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._scripts = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def script_hash(version: int, script: bytes) -> str:
+        """The ledger hash of a script, blake2b-224 of the language tag and the script.
+
+        Args:
+            version (int): The language tag, 0 for native scripts.
+            script (bytes): The script bytes, the cbor of a native script.
+
+        Returns:
+            str: The hex script hash.
+        """
+        return hashlib.blake2b(bytes((version,)) + script, digest_size=28).hexdigest()
+
+    def detect_version(self, script: bytes, reference_script: dict, plutus_version: int = 3) -> int:
+        """Find the language version of a Koios reference script.
+
+        Args:
+            script (bytes): The script bytes.
+            reference_script (dict): The Koios reference script.
+            plutus_version (int, optional): The version when nothing else tells. Defaults to 3.
+
+        Returns:
+            int: The language tag.
+        """
+        version = self.LANGUAGES.get(reference_script.get('type'))
+        if version is not None:
+            return version
+        script_hash = reference_script.get('hash')
+        if script_hash is not None:
+            for version in (3, 2, 1, 0):
+                if self.script_hash(version, script) == script_hash:
+                    return version
+        return plutus_version
+
+    def get(self, script_hash: str) -> cbor2.CBORTag | None:
+        """Return the stored reference script or None.
+
+        Args:
+            script_hash (str): The script hash.
+
+        Returns:
+            cbor2.CBORTag | None: The reference script, ready for a resolved output.
+        """
+        with self._lock:
+            entry = self._scripts.get(script_hash)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._scripts.move_to_end(script_hash)
+            self.hits += 1
+            return entry[1]
+
+    def add(self, script: bytes, version: int) -> cbor2.CBORTag:
+        """Store a script under its hash. A script that is already stored keeps its entry.
+
+        Args:
+            script (bytes): The script bytes, the cbor of a native script.
+            version (int): The language tag.
+
+        Returns:
+            cbor2.CBORTag: The stored reference script, ready for a resolved output.
+        """
+        script_hash = self.script_hash(version, script)
+        # a native script is a cbor structure, plutus scripts are bytes
+        body = cbor2.loads(script) if version == 0 else script
+        entry = (version, cbor2.CBORTag(24, cbor2.dumps([version, body])))
+        with self._lock:
+            # a concurrent caller may have stored it first
+            entry = self._scripts.setdefault(script_hash, entry)
+            self._scripts.move_to_end(script_hash)
+            while len(self._scripts) > self.max_entries:
+                self._scripts.popitem(last=False)
+        # the entry is returned even if it was just evicted
+        return entry[1]
+
+    def version(self, script_hash: str) -> int | None:
+        """Return the language tag of a stored script.
+
+        Args:
+            script_hash (str): The script hash.
+
+        Returns:
+            int | None: The language tag if the script is stored.
+        """
+        with self._lock:
+            entry = self._scripts.get(script_hash)
+        return entry[0] if entry is not None else None
+
+    def reference(self, reference_script: dict, plutus_version: int = 3) -> cbor2.CBORTag:
+        """Return the reference script of a Koios output, storing it on first sight.
+
+        Args:
+            reference_script (dict): The Koios reference script.
+            plutus_version (int, optional): The version when the type and hash do not tell. Defaults to 3.
+
+        Returns:
+            cbor2.CBORTag: The reference script, ready for a resolved output.
+        """
+        script_hash = reference_script.get('hash')
+        if script_hash is not None:
+            stored = self.get(script_hash)
+            if stored is not None:
+                return stored
+
+        script = to_bytes(reference_script['bytes'])
+        version = self.detect_version(script, reference_script, plutus_version)
+        if script_hash is None:
+            # without a Koios hash the store is checked by the computed one
+            stored = self.get(self.script_hash(version, script))
+            if stored is not None:
+                return stored
+        return self.add(script, version)
+
+    def stats(self) -> dict:
+        """Return the hit and miss counters and the number of stored scripts.
+
+        Returns:
+            dict: The store statistics.
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._scripts)}
+
+
+_default_scripts = ScriptStore()
+
+
+def default_script_store() -> ScriptStore:
+    """Return the shared script store used by resolve_output.
+
+    Returns:
+        ScriptStore: The shared store.
+    """
+    return _default_scripts
+
+
+def resolve_output(utxo: dict, network: bool, plutus_version: int = 3, encoder: AddressEncoder | None = None, scripts: ScriptStore | None = None) -> ResolvedOutput:
+    """
+    Build a resolved output dictionary for a single transaction output.
+
+    Args:
+        utxo (dict): The Koios transaction output.
+        network (bool): Flag indicating the network type (True for mainnet, False pre-preproduction).
+        plutus_version (int, optional): The reference script version when Koios does not give one. Defaults to 3.
+        encoder (AddressEncoder, optional): Builds the address bytes. Defaults to the shared encoder.
+        scripts (ScriptStore, optional): Holds the reference scripts. Defaults to the shared store.
+
+    Returns:
+        ResolvedOutput: The resolved output, it reads like the int keyed dict.
+    """
+    if encoder is None:
+        encoder = _default_encoder
+    if scripts is None:
+        scripts = _default_scripts
+
+    # assume that anything with a datum is a contract
+    # zero index must exist
+    # one index must exist
+    # 2 and 3 are optional
+    script_payment = utxo['inline_datum'] is not None
+    address = encoder.encode(utxo['payment_addr']['cred'], utxo['stake_addr'], network, script_payment)
+
+    datum = None
+    if script_payment is True:
+        # put the inline datum in the correct format
+        cbor_datum = to_bytes(utxo['inline_datum']['bytes'])
+        datum = [1, cbor2.CBORTag(24, cbor_datum)]
+
+    script_ref = None
+    if utxo['reference_script'] is not None:
+        # the store keeps each script once, in the correct format and with its own version
+        script_ref = scripts.reference(utxo['reference_script'], plutus_version)
+
+    # now we need the value element
+    lovelace = utxo['value']
+    assets = utxo['asset_list']
+
+    # lovelace only is int, else it has assets
+    value = Value.from_koios(lovelace, assets)
+
+    return ResolvedOutput(address, value, datum, script_ref)
+
+
+class UtxoProvider:
+    """A source of resolved outputs for utxo inputs.
+
+    Subclasses implement resolve. The providers here are KoiosProvider, which
+    queries Koios, and SnapshotProvider, which reads a local utxo snapshot.
+    """
+
+    def resolve(self, inputs: list[tuple[str, int]], network: bool, plutus_version: int = 3, timer: StageTimer | None = None) -> dict[tuple[str, int], dict]:
+        """Resolve the outputs for a list of utxo inputs.
+
+        Args:
+            inputs (list[tuple[str, int]]): The utxo inputs to resolve.
+            network (bool): The network flag, mainnet (True) or preprod (False).
+            plutus_version (int, optional): The plutus version of reference scripts. Defaults to 3.
+            timer (StageTimer, optional): Records the lookup and build stages. Defaults to None.
+
+        Returns:
+            dict[tuple[str, int], dict]: The resolved outputs keyed by input, unresolved inputs are missing.
+        """
+        raise NotImplementedError
+
+
+class KoiosProvider(UtxoProvider):
+    """Resolves outputs with Koios, either through tx_info or utxo_info."""
+
+    def __init__(self, client: KoiosClient | None = None):
+        """
+        Args:
+            client (KoiosClient, optional): The Koios client. Defaults to the shared client.
+        """
+        self.client = client
+
+    def resolve(self, inputs: list[tuple[str, int]], network: bool, plutus_version: int = 3, timer: StageTimer | None = None) -> dict[tuple[str, int], dict]:
+        client = self.client if self.client is not None else default_koios_client()
+
+        with timed(timer, 'koios_query'):
+            if client.utxo_lookup is True:
+                # fetch just the referenced outputs
+                response = query_utxos_with_koios(inputs, network, client)
+            else:
+                # resolve the input's output using koios, each hash only once
+                tx_hashes = list(dict.fromkeys(txin[0] for txin in inputs))
+                response = query_tx_with_koios(tx_hashes, network, client)
+
+        with timed(timer, 'build_resolved_output'):
+            if client.utxo_lookup is True:
+                index = {(utxo['tx_hash'], utxo['tx_index']): utxo for utxo in response} if isinstance(response, list) else {}
             else:
-                # initialize the value
-                tokens[pid][tkn] = amt
+                index = index_outputs(response)
+
+            # each input is a single lookup into the index
+            return {txin: resolve_output(index[txin], network, plutus_version) for txin in inputs if txin in index}
+
+
+def address_to_bytes(address: str) -> bytes:
+    """Decode a bech32 address into its raw bytes, header included.
 
-        # Remove tokens with a net amount of zero
-        for pid in list(tokens.keys()):  # Iterate over a copy of the keys
-            # Iterate over a copy of the keys
-            for tkn in list(tokens[pid].keys()):
+    Args:
+        address (str): The bech32 address.
 
-                # delete any token that has a zero amount
-                if tokens[pid][tkn] == 0:
-                    del tokens[pid][tkn]
+    Returns:
+        bytes: The address bytes.
+    """
+    _, data5 = bech32_decode(address)
+    if data5 is None:
+        raise ValueError("non-standard format in address_to_bytes() arg at position 1")
+    return bytes(convertbits(data5, 5, 8, False))
 
-            # If no tokens left under this pid, remove the pid entry
-            if not tokens[pid]:
-                del tokens[pid]
 
-        # the form for assets is a list
-        value = [int(lovelace), tokens]
-    return value
+def datum_from_json(data: dict) -> any:
+    """Convert plutus data in the cardano-cli detailed json schema into cbor2 objects.
 
+    Args:
+        data (dict): The plutus data json.
 
-def build_resolved_output(tx_id: str, tx_idx: int, outputs: list[dict], network: bool, plutus_version: int = 3) -> dict:
+    Returns:
+        any: The cbor2 encodable plutus data.
+    """
+    if 'constructor' in data:
+        constructor = data['constructor']
+        fields = [datum_from_json(field) for field in data['fields']]
+        # the compact constructor tags, then the general form
+        if 0 <= constructor <= 6:
+            return cbor2.CBORTag(121 + constructor, fields)
+        if 7 <= constructor <= 127:
+            return cbor2.CBORTag(1280 + constructor - 7, fields)
+        return cbor2.CBORTag(102, [constructor, fields])
+    if 'int' in data:
+        return int(data['int'])
+    if 'bytes' in data:
+        return to_bytes(data['bytes'])
+    if 'list' in data:
+        return [datum_from_json(item) for item in data['list']]
+    if 'map' in data:
+        return {datum_from_json(pair['k']): datum_from_json(pair['v']) for pair in data['map']}
+    raise ValueError("unknown plutus data in datum_from_json() arg at position 1")
+
+
+class SnapshotProvider(UtxoProvider):
+    """Resolves outputs from local utxo snapshots, the json written by
+    cardano-cli query utxo --out-file. Nothing is fetched over the network.
+    """
+
+    # the ledger language of each cardano-cli script type
+    SCRIPT_VERSIONS = {'PlutusScriptV1': 1, 'PlutusScriptV2': 2, 'PlutusScriptV3': 3}
+
+    def __init__(self, *paths: str):
+        """
+        Args:
+            *paths (str): The snapshot files, later files win on a repeated utxo.
+        """
+        self.utxos = {}
+        for path in paths:
+            with open(path, 'r') as file:
+                self.add(json.load(file))
+
+    def add(self, snapshot: dict) -> None:
+        """Add the utxos of a snapshot.
+
+        Args:
+            snapshot (dict): The snapshot json, keyed by tx_hash#tx_index.
+        """
+        for utxo, entry in snapshot.items():
+            tx_hash, tx_index = utxo.split('#')
+            self.utxos[(tx_hash, int(tx_index))] = entry
+
+    def resolve(self, inputs: list[tuple[str, int]], network: bool, plutus_version: int = 3, timer: StageTimer | None = None) -> dict[tuple[str, int], dict]:
+        with timed(timer, 'build_resolved_output'):
+            return {txin: self.resolve_entry(self.utxos[txin], plutus_version) for txin in inputs if txin in self.utxos}
+
+    def resolve_entry(self, entry: dict, plutus_version: int = 3) -> ResolvedOutput:
+        """Build a resolved output from a snapshot entry.
+
+        Args:
+            entry (dict): The cardano-cli utxo entry.
+            plutus_version (int, optional): The version used when the script type is unknown. Defaults to 3.
+
+        Returns:
+            dict: A dictionary representing the resolved output.
+        """
+        # the snapshot has the full address so no header needs to be built
+        resolved = {0: address_to_bytes(entry['address'])}
+
+        # lovelace and then policy id to asset name to amount
+        assets = [
+            {'policy_id': pid, 'asset_name': name, 'quantity': amount}
+            for pid, names in entry['value'].items() if pid != 'lovelace'
+            for name, amount in names.items()
+        ]
+        resolved[1] = resolve_value_from_input_output(entry['value'].get('lovelace', 0), assets)
+
+        if entry.get('inlineDatumRaw') is not None:
+            resolved[2] = [1, cbor2.CBORTag(24, to_bytes(entry['inlineDatumRaw']))]
+        elif entry.get('inlineDatum') is not None:
+            resolved[2] = [1, cbor2.CBORTag(24, cbor2.dumps(datum_from_json(entry['inlineDatum'])))]
+        elif entry.get('datumhash') is not None:
+            resolved[2] = [0, to_bytes(entry['datumhash'])]
+
+        reference_script = entry.get('referenceScript')
+        if reference_script is not None and 'cborHex' in reference_script['script']:
+            script = reference_script['script']
+            version = self.SCRIPT_VERSIONS.get(script.get('type'), plutus_version)
+            # the envelope wraps the script bytes in one more cbor bytestring
+            cbor_ref = cbor2.loads(to_bytes(script['cborHex']))
+            resolved[3] = cbor2.CBORTag(24, cbor2.dumps([version, cbor_ref]))
+        return ResolvedOutput.from_dict(resolved)
+
+
+class UtxoIndex:
+    """A memory mapped, sorted index of pre-encoded resolved outputs.
+
+    The file is a header, the resolved output cbor one after another, then one
+    fixed size record per utxo sorted by tx_hash || tx_index. A lookup is a
+    binary search over the records in the mapped file, so neither json nor the
+    whole set is ever loaded. Build the file with build_utxo_index.
+
+    Layout, all integers big endian:
+        header: magic (8) | network (1) | reserved (7) | count (8) | records offset (8)
+        record: tx_hash (32) | tx_index (4) | output offset (8) | output length (4)
+    """
+
+    MAGIC = b'TXSUTXO1'
+    HEADER = struct.Struct('>8sB7xQQ')
+    RECORD = struct.Struct('>32sIQI')
+    KEY_SIZE = 36
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): The index file.
+        """
+        self.path = path
+        with open(path, 'rb') as file:
+            self._mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, network, self.count, self._records = self.HEADER.unpack_from(self._mm, 0)
+        if magic != self.MAGIC:
+            raise ValueError("not a utxo index file")
+        self.network = bool(network)
+
+    def _key(self, position: int) -> bytes:
+        start = self._records + position * self.RECORD.size
+        return self._mm[start:start + self.KEY_SIZE]
+
+    def lookup(self, tx_hash: str, tx_index: int) -> bytes | None:
+        """Return the resolved output cbor of a utxo or None when it is not indexed.
+
+        Args:
+            tx_hash (str): The transaction hash of the utxo.
+            tx_index (int): The output index of the utxo.
+
+        Returns:
+            bytes | None: The resolved output cbor.
+        """
+        key = to_bytes(tx_hash) + tx_index.to_bytes(4, 'big')
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == self.count or self._key(low) != key:
+            return None
+        _, _, offset, length = self.RECORD.unpack_from(self._mm, self._records + low * self.RECORD.size)
+        return self._mm[offset:offset + length]
+
+    def close(self) -> None:
+        """Unmap the index file."""
+        self._mm.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, utxo: tuple[str, int]) -> bool:
+        return self.lookup(utxo[0], utxo[1]) is not None
+
+
+class UtxoIndexProvider(UtxoProvider):
+    """Resolves outputs from a UtxoIndex file. The outputs are encoded when the
+    index is built, so the network and plutus version are fixed by the builder.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): The index file.
+        """
+        self.index = UtxoIndex(path)
+
+    def resolve(self, inputs: list[tuple[str, int]], network: bool, plutus_version: int = 3, timer: StageTimer | None = None) -> dict[tuple[str, int], dict]:
+        if network != self.index.network:
+            raise ValueError("the utxo index was built for the other network")
+        utxos = {}
+        with timed(timer, 'build_resolved_output'):
+            for txin in inputs:
+                output = self.index.lookup(txin[0], txin[1])
+                if output is not None:
+                    utxos[txin] = ResolvedOutput.from_dict(cbor2.loads(output))
+        return utxos
+
+
+def build_utxo_index(path: str, outputs, network: bool) -> int:
+    """Write a UtxoIndex file from resolved outputs. The output cbor is streamed to
+    the file as it arrives and only the keys are kept in memory for sorting. A
+    repeated utxo keeps its last output.
+
+    Args:
+        path (str): The index file to write.
+        outputs (Iterable[tuple[tuple[str, int], dict]]): The utxos and their resolved outputs.
+        network (bool): The network flag, mainnet (True) or preprod (False).
+
+    Returns:
+        int: The number of indexed utxos.
+    """
+    keys = {}
+    with open(path, 'wb') as file:
+        file.write(bytes(UtxoIndex.HEADER.size))
+        offset = UtxoIndex.HEADER.size
+        for (tx_hash, tx_index), resolved in outputs:
+            output = encode_cbor(resolved)
+            file.write(output)
+            keys[to_bytes(tx_hash) + tx_index.to_bytes(4, 'big')] = (offset, len(output))
+            offset += len(output)
+
+        # the records follow the outputs, sorted for the binary search
+        for key in sorted(keys):
+            file.write(UtxoIndex.RECORD.pack(key[:32], int.from_bytes(key[32:], 'big'), *keys[key]))
+
+        file.seek(0)
+        file.write(UtxoIndex.HEADER.pack(UtxoIndex.MAGIC, int(network), len(keys), offset))
+    return len(keys)
+
+
+def iter_dump_outputs(path: str, network: bool, plutus_version: int = 3):
+    """Yield the resolved outputs of a Koios or cardano-cli dump file. A Koios dump is
+    a tx_info or utxo_info response and a cardano-cli dump is query utxo json.
+
+    Args:
+        path (str): The dump file.
+        network (bool): The network flag, mainnet (True) or preprod (False).
+        plutus_version (int, optional): The plutus version of reference scripts. Defaults to 3.
+
+    Yields:
+        tuple[tuple[str, int], dict]: The utxo and its resolved output.
+    """
+    with open(path, 'r') as file:
+        dump = json.load(file)
+
+    # cardano-cli query utxo is keyed by tx_hash#tx_index
+    if isinstance(dump, dict):
+        snapshot = SnapshotProvider()
+        snapshot.add(dump)
+        for utxo, entry in snapshot.utxos.items():
+            yield utxo, snapshot.resolve_entry(entry, plutus_version)
+        return
+
+    for item in dump:
+        if 'outputs' in item:
+            # a tx_info response
+            for utxo in item['outputs']:
+                yield (utxo['tx_hash'], utxo['tx_index']), resolve_output(utxo, network, plutus_version)
+        else:
+            # a utxo_info response
+            utxo = {
+                **item,
+                'payment_addr': {'cred': item['payment_cred']},
+                'stake_addr': item.get('stake_address'),
+                'asset_list': item.get('asset_list') or [],
+            }
+            yield (utxo['tx_hash'], utxo['tx_index']), resolve_output(utxo, network, plutus_version)
+
+
+def build_resolved_output(tx_id: str, tx_idx: int, outputs: list[dict] | None, network: bool, plutus_version: int = 3, cache: UtxoCache | None = None, provider: UtxoProvider | None = None) -> dict:
     """
     Build a resolved output dictionary for given transaction outputs.
 
@@ -205,151 +1821,739 @@ def build_resolved_output(tx_id: str, tx_idx: int, outputs: list[dict], network:
         tx_idx (int): The transaction id index to resolve outputs for.
         outputs (list[dict]): A list of dictionaries, each representing a transaction output.
         network (bool): Flag indicating the network type (True for mainnet, False pre-preproduction).
+        cache (UtxoCache, optional): A cache checked before and filled after resolving. Defaults to None.
+        provider (UtxoProvider, optional): Resolves the output instead of the given outputs. Defaults to None.
 
     Returns:
         Dict: A dictionary representing the resolved output.
     """
+    if cache is not None:
+        cached = cache.get(tx_id, tx_idx, network, plutus_version)
+        if cached is not None:
+            return cached
+
     resolved = {}
-    for utxo in outputs['outputs']:
-        output_tx_id = utxo['tx_hash']
-        output_tx_idx = utxo['tx_index']
-
-        # we found it
-        if (tx_id, tx_idx) == (output_tx_id, output_tx_idx):
-            # lets build out the resolved output
-
-            # assume that anything with a datum is a contract
-            # zero index must exist
-            # one index must exist
-            # 2 and 3 are optional
-            if utxo['inline_datum'] is not None:
-                # assumed to be a smart contract
-                if utxo["stake_addr"] is None:
-
-                    # no stake key
-                    network_flag = "71" if network is True else "70"
-
-                    # create public key hash
-                    pkh = network_flag + utxo['payment_addr']['cred']
-                else:
-                    stake_key, contract_flag = run_bech32(utxo["stake_addr"])
-
-                    # is it a smart contract?
-                    if contract_flag is True:
-                        # it is a contract
-                        network_flag = "31" if network is True else "30"
-                    else:
-                        # it is not a contract
-                        network_flag = "11" if network is True else "10"
-
-                    # create public key hash
-                    pkh = network_flag + utxo['payment_addr']['cred'] + stake_key
-
-                # correct format for the pkh
-                pkh = to_bytes(pkh)
-                resolved[0] = pkh
-
-                # put the inline datum in the correct format
-                cbor_datum = to_bytes(utxo['inline_datum']['bytes'])
-                resolved[2] = [1, cbor2.CBORTag(24, cbor_datum)]
-            else:
-                # no inline datum is present
-                if utxo["stake_addr"] is None:
-
-                    # no stake key
-                    network_flag = "61" if network is True else "60"
-
-                    # create public key hash
-                    pkh = network_flag + utxo['payment_addr']['cred']
-                else:
-                    stake_key, contract_flag = run_bech32(utxo["stake_addr"])
-
-                    # is it a smart contract?
-                    if contract_flag is True:
-                        # it is a contract
-                        network_flag = "21" if network is True else "20"
-                    else:
-                        # it is not a contract
-                        network_flag = "01" if network is True else "00"
-
-                    # create public key hash
-                    pkh = network_flag + utxo['payment_addr']['cred'] + stake_key
-
-                pkh = to_bytes(pkh)
-                resolved[0] = pkh
-
-            if utxo['reference_script'] is not None:
-                # assume plutus v3 reference scripts
-                cbor_ref = to_bytes(utxo['reference_script']['bytes'])
-                cbor_ref = to_bytes(cbor2.dumps([plutus_version, cbor_ref]).hex())
-
-                # put the reference script in the correct format
-                resolved[3] = cbor2.CBORTag(24, cbor_ref)
-
-            # now we need the value element
-            lovelace = utxo['value']
-            assets = utxo['asset_list']
-
-            # lovelace only is int, else it has assets
-            value = resolve_value_from_input_output(lovelace, assets)
-            resolved[1] = value
-
-            # we got all the information required for this tx id
-            break
-        # this isnt the input we are looking for so continue
+    if provider is not None:
+        # the provider does its own lookup
+        resolved = provider.resolve([(tx_id, tx_idx)], network, plutus_version).get((tx_id, tx_idx), {})
+    else:
+        for utxo in outputs['outputs']:
+            output_tx_id = utxo['tx_hash']
+            output_tx_idx = utxo['tx_index']
+
+            # we found it
+            if (tx_id, tx_idx) == (output_tx_id, output_tx_idx):
+                # lets build out the resolved output
+                resolved = resolve_output(utxo, network, plutus_version)
+                # we got all the information required for this tx id
+                break
+            # this isnt the input we are looking for so continue
+
+    if cache is not None and resolved:
+        cache.put(tx_id, tx_idx, network, resolved, plutus_version)
     return resolved
 
 
-def simulate_cbor(tx_cbor: str, input_cbor: str, output_cbor: str, aiken_path: str = 'aiken', debug: bool = False, network: bool = False) -> list[dict]:
-    # try to simulate the tx and return the results else return an empty dict
+class SimulationFailure(dict):
+    """A failed simulation. It is an empty dict so a failed result still equals [{}],
+    while the category, the aiken stderr and exit code say what went wrong.
+
+    The categories are simulation (aiken rejected the tx), missing_inputs (some
+    inputs could not be resolved), decode (the tx cbor is invalid), invalid_draft
+    (the tx draft has no cborHex), invalid_tx (a required tx body field is
+    missing), unbalanced (the tx does not preserve value), aiken_unavailable
+    (aiken could not be run), invalid_output (aiken printed something other than
+    json) and error.
+    """
+
+    # a retry gives the same answer for these
+    DETERMINISTIC = ('simulation', 'decode', 'invalid_draft', 'invalid_tx', 'unbalanced')
+
+    def __init__(self, category: str, stderr: str | None = None, returncode: int | None = None, detail: any = None):
+        """
+        Args:
+            category (str): The failure category.
+            stderr (str, optional): The aiken stderr. Defaults to None.
+            returncode (int, optional): The aiken exit code. Defaults to None.
+            detail (any, optional): More about the failure, like the missing inputs. Defaults to None.
+        """
+        super().__init__()
+        self.category = category
+        self.stderr = stderr
+        self.returncode = returncode
+        self.detail = detail
+
+    @property
+    def deterministic(self) -> bool:
+        """If running the same simulation again would fail the same way. An aiken
+        killed by a signal, like an oom kill, has a negative exit code and may pass.
+        """
+        if self.returncode is not None and self.returncode < 0:
+            return False
+        return self.category in self.DETERMINISTIC
+
+    def to_dict(self) -> dict:
+        """The failure as a plain dict, for json.
+
+        Returns:
+            dict: The category, stderr, returncode and detail.
+        """
+        return {'category': self.category, 'stderr': self.stderr, 'returncode': self.returncode, 'detail': self.detail}
+
+    def __repr__(self) -> str:
+        return f"SimulationFailure({self.category!r})"
+
+
+def failure_of(result: list[dict]) -> SimulationFailure | None:
+    """Return the failure of a simulation result, or None when it succeeded.
+
+    Args:
+        result (list[dict]): A simulation result.
+
+    Returns:
+        SimulationFailure | None: The failure if the result is one.
+    """
+    if len(result) == 1 and isinstance(result[0], SimulationFailure):
+        return result[0]
+    return None
+
+
+class FailureCache:
+    """A short lived in memory cache of deterministic failures, keyed like the
+    SimulationResultCache, so retries of a tx that aiken rejects do not run aiken
+    again until the entry expires.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 10_000):
+        """
+        Args:
+            ttl (float, optional): How long a failure is kept, in seconds. Defaults to 60.0.
+            max_entries (int, optional): The most failures kept. Defaults to 10_000.
+        """
+        if ttl <= 0 or max_entries < 1:
+            raise ValueError("ttl and max_entries must be positive")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> SimulationFailure | None:
+        """Return the cached failure or None on a miss or when it has expired.
+
+        Args:
+            key (str): The key from SimulationResultCache.key.
+
+        Returns:
+            SimulationFailure | None: The failure if it is cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, failure: SimulationFailure) -> None:
+        """Store a failure if it is deterministic, dropping the oldest when full.
+
+        Args:
+            key (str): The key from SimulationResultCache.key.
+            failure (SimulationFailure): The failure.
+        """
+        if failure.deterministic is False:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, failure)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Return the hit and miss counters and the number of cached failures.
+
+        Returns:
+            dict: The cache statistics.
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+
+_aiken_versions = {}
+
+
+def aiken_version(aiken_path: str = 'aiken') -> str | None:
+    """Return the version string of an aiken binary. It is memoized on the resolved
+    binary with its mtime and size, so an aiken upgraded in place is asked again.
+    A binary that can not be run is not memoized.
+
+    Args:
+        aiken_path (str, optional): The path to aiken. Defaults to 'aiken'.
+
+    Returns:
+        str | None: The output of aiken --version or None if it can not be run.
+    """
+    binary = shutil.which(aiken_path)
+    if binary is None:
+        return None
     try:
-        # use some temp files that get deleted later
-        with tempfile.NamedTemporaryFile(mode='w+', delete=False) as temp_tx_file:
-            temp_tx_file.write(tx_cbor)
-            temp_tx_file_path = temp_tx_file.name
-        with tempfile.NamedTemporaryFile(mode='w+', delete=False) as temp_input_file:
-            temp_input_file.write(input_cbor)
-            temp_input_file_path = temp_input_file.name
-        with tempfile.NamedTemporaryFile(mode='w+', delete=False) as temp_output_file:
-            temp_output_file.write(output_cbor)
-            temp_output_file_path = temp_output_file.name
-
-        # the default value assumes aiken to be on path
-        # or it uses the aiken path
-        func = [
-            aiken_path, 'tx', 'simulate',
-            temp_tx_file_path,
-            temp_input_file_path,
-            temp_output_file_path
-        ]
-        # this is calculated from the block after the hf
-        if network is False:
-            func += [
-                '--zero-time', '1655769600000',
-                '--zero-slot', '86400',
-            ]
-        output = subprocess.run(
-            func,
-            check=True,
-            capture_output=False if debug is True else True,
-            text=True
+        binary = os.path.realpath(binary)
+        info = os.stat(binary)
+    except OSError:
+        return None
+    key = (binary, info.st_mtime_ns, info.st_size)
+    version = _aiken_versions.get(key)
+    if version is not None:
+        return version
+    try:
+        output = subprocess.run([binary, '--version'], check=True, capture_output=True, text=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    version = _aiken_versions[key] = output.stdout.strip()
+    return version
+
+
+class SimulationResultCache:
+    """A cache of simulation results keyed by a hash of everything aiken is given.
+
+    The key covers the tx, input and output cbor, the aiken version and the slot
+    parameters, so an entry is never stale and is only evicted. Results are kept
+    in an in memory LRU in front of an optional SQLite file, both least recently
+    used first. Only successful simulations are stored.
+
+    Like the UtxoCache, a disk hit is a read only. The new use times are written
+    in one transaction on the next put, or once flush_every hits are pending.
+    """
+
+    def __init__(self, path: str | None = None, max_memory: int = 1024, max_entries: int = 100_000, flush_every: int = 256):
+        """
+        Args:
+            path (str, optional): The SQLite database file. Defaults to None, memory only.
+            max_memory (int, optional): The maximum number of results kept in memory. Defaults to 1024.
+            max_entries (int, optional): The maximum number of results kept on disk. Defaults to 100_000.
+            flush_every (int, optional): The number of pending use times that forces a write. Defaults to 256.
+        """
+        if max_memory < 1 or max_entries < 1:
+            raise ValueError("max_memory and max_entries must be positive")
+        self.path = path
+        self.max_memory = max_memory
+        self.max_entries = max_entries
+        self.flush_every = flush_every
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._touched = {}
+        self._conn = None
+        self._size = 0
+        self._clock = 0
+        if path is not None:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            # a commit does not wait for a disk sync
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS simulation_results ("
+                "key TEXT PRIMARY KEY, "
+                "result TEXT NOT NULL, "
+                "last_used INTEGER NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS simulation_results_last_used ON simulation_results (last_used)")
+            self._conn.commit()
+            self._size, self._clock = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(MAX(last_used), 0) FROM simulation_results").fetchone()
+
+    @staticmethod
+    def key(tx_cbor: str | bytes, input_cbor: str | bytes, output_cbor: str | bytes, version: str, params: list[str]) -> str:
+        """Hash the simulation inputs into a cache key. Hex and raw bytes give the same key.
+
+        Args:
+            tx_cbor (str | bytes): The transaction cbor.
+            input_cbor (str | bytes): The cbor of the inputs.
+            output_cbor (str | bytes): The cbor of the resolved outputs.
+            version (str): The aiken version.
+            params (list[str]): The extra aiken arguments, like --zero-time and --zero-slot.
+
+        Returns:
+            str: The hex sha256 key.
+        """
+        digest = hashlib.sha256()
+        for part in (tx_cbor, input_cbor, output_cbor):
+            # hashed as the hex aiken reads
+            part = part.lower().encode() if isinstance(part, str) else binascii.hexlify(part)
+            # the length prefix keeps the parts from running together
+            digest.update(len(part).to_bytes(8, 'big'))
+            digest.update(part)
+        digest.update(json.dumps([version, params]).encode())
+        return digest.hexdigest()
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    def _remember(self, key: str, result: list[dict]) -> None:
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> list[dict] | None:
+        """Return the cached result or None on a miss.
+
+        Args:
+            key (str): The key from SimulationResultCache.key.
+
+        Returns:
+            list[dict] | None: The execution units if they are cached.
+        """
+        with self._lock:
+            result = self._memory.get(key)
+            if result is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return json.loads(json.dumps(result))
+            if self._conn is not None:
+                row = self._conn.execute("SELECT result FROM simulation_results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._touched[key] = self._tick()
+                    if len(self._touched) >= self.flush_every:
+                        self._flush()
+                        self._conn.commit()
+                    self._remember(key, json.loads(row[0]))
+                    self.hits += 1
+                    return json.loads(row[0])
+            self.misses += 1
+            return None
+
+    def _flush(self) -> None:
+        # write the pending use times, the caller holds the lock and commits
+        if len(self._touched) == 0:
+            return
+        self._conn.executemany(
+            "UPDATE simulation_results SET last_used = ? WHERE key = ?",
+            [(last_used, key) for key, last_used in self._touched.items()]
         )
+        self._touched.clear()
+
+    def flush(self) -> None:
+        """Write the pending use times of disk hits."""
+        with self._lock:
+            if self._conn is not None:
+                self._flush()
+                self._conn.commit()
+
+    def put(self, key: str, result: list[dict]) -> None:
+        """Store a result in both tiers, evicting the least recently used when full.
+
+        Args:
+            key (str): The key from SimulationResultCache.key.
+            result (list[dict]): The execution units.
+        """
+        # a copy so callers changing their result do not change the cache
+        encoded = json.dumps(result)
+        with self._lock:
+            self._remember(key, json.loads(encoded))
+            if self._conn is None:
+                return
+            # the eviction order needs every use time
+            self._flush()
+            exists = self._conn.execute("SELECT 1 FROM simulation_results WHERE key = ?", (key,)).fetchone() is not None
+            self._conn.execute(
+                "INSERT OR REPLACE INTO simulation_results (key, result, last_used) VALUES (?, ?, ?)",
+                (key, encoded, self._tick())
+            )
+            if exists is False:
+                self._size += 1
+            if self._size > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM simulation_results WHERE rowid IN ("
+                    "SELECT rowid FROM simulation_results ORDER BY last_used LIMIT ?)",
+                    (self._size - self.max_entries,)
+                )
+                self._size = self.max_entries
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """Return the hit and miss counters and the number of results in each tier.
+
+        Returns:
+            dict: The cache statistics.
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'memory': len(self._memory), 'disk': self._size}
+
+    def clear(self) -> None:
+        """Remove every cached result and reset the counters."""
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM simulation_results")
+                self._conn.commit()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def close(self) -> None:
+        """Write the pending use times and close the underlying database connection."""
+        with self._lock:
+            if self._conn is not None:
+                self._flush()
+                self._conn.commit()
+                self._conn.close()
+
+
+@contextmanager
+def handoff_files(contents: list[str], in_memory: bool = False):
+    """Write each content to a file that aiken can read by path. The files are
+    always removed when the context exits, including when the simulation fails.
+
+    With in_memory the contents are kept off disk in memfd files, passed to the
+    child process as /proc/self/fd paths, or in /dev/shm when memfd is missing.
+
+    Args:
+        contents (list[str | bytes]): The file contents, raw bytes are written as hex.
+        in_memory (bool, optional): Avoid writing to the temp dir. Defaults to False.
+
+    Yields:
+        tuple[list[str], tuple[int, ...]]: The file paths and the fds the child process must inherit.
+    """
+    # aiken reads hex so raw bytes are only converted here at the boundary
+    contents = [binascii.hexlify(content) if not isinstance(content, str) else content.encode() for content in contents]
+    paths = []
+    fds = []
+    try:
+        if in_memory is True and hasattr(os, 'memfd_create') and os.path.isdir('/proc/self/fd'):
+            for content in contents:
+                fd = os.memfd_create('tx_simulation')
+                fds.append(fd)
+                with open(fd, 'wb', closefd=False) as file:
+                    file.write(content)
+                # the child inherits the same fd number so the path resolves there
+                paths.append(f'/proc/self/fd/{fd}')
+            yield paths, tuple(fds)
+        else:
+            # shared memory still keeps it off disk when memfd is not available
+            directory = '/dev/shm' if in_memory is True and os.path.isdir('/dev/shm') else None
+            for content in contents:
+                with tempfile.NamedTemporaryFile(mode='wb', delete=False, dir=directory) as temp_file:
+                    paths.append(temp_file.name)
+                    temp_file.write(content)
+            yield paths, ()
+    finally:
+        for fd in fds:
+            os.close(fd)
+        if len(fds) == 0:
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+def lookup_simulation(tx_cbor: str | bytes, input_cbor: str | bytes, output_cbor: str | bytes, aiken_path: str, debug: bool, params: list[str], result_cache: SimulationResultCache | None, failure_cache: FailureCache | None) -> tuple[str | None, list[dict] | None]:
+    """Look a simulation up in the result and failure caches.
+
+    Returns:
+        tuple[str | None, list[dict] | None]: The cache key, None when nothing is cached or the
+            aiken version is unknown, and the cached result if there is one.
+    """
+    if (result_cache is None and failure_cache is None) or debug is True:
+        return None, None
+    version = aiken_version(aiken_path)
+    # an unknown aiken version could return results from another aiken
+    if version is None:
+        return None, None
+    key = SimulationResultCache.key(tx_cbor, input_cbor, output_cbor, version, params)
+    failure = failure_cache.get(key) if failure_cache is not None else None
+    if failure is not None:
+        return key, [failure]
+    cached = result_cache.get(key) if result_cache is not None else None
+    return key, cached
+
+
+def simulate_cbor(tx_cbor: str | bytes, input_cbor: str | bytes, output_cbor: str | bytes, aiken_path: str = 'aiken', debug: bool = False, network: bool = False, *, in_memory: bool = False, result_cache: SimulationResultCache | None = None, failure_cache: FailureCache | None = None) -> list[dict]:
+    """Simulate a tx with aiken given the tx cbor and the cbor of its resolved inputs and outputs.
+    Each cbor may be a hex string or raw bytes.
+
+    Args:
+        tx_cbor (str | bytes): The transaction cbor.
+        input_cbor (str | bytes): The cbor of the inputs.
+        output_cbor (str | bytes): The cbor of the resolved outputs, in the same order as the inputs.
+        aiken_path (str, optional): The path to aiken. Defaults to 'aiken'.
+        debug (bool, optional): Debug prints to console. Defaults to False.
+        network (bool, optional): The network flag, mainnet (True) or preprod (False). Defaults to False.
+        in_memory (bool, optional): Hand the cbor to aiken without temp files on disk. Defaults to False.
+        result_cache (SimulationResultCache, optional): Returns stored results without running aiken. Defaults to None.
+        failure_cache (FailureCache, optional): Returns recent deterministic failures without running aiken. Defaults to None.
+
+    Returns:
+        list[dict]: Either a list with a SimulationFailure, which equals an empty dictionary, or a list of the cpu and mem units.
+    """
+    # this is calculated from the block after the hf
+    params = [] if network is True else [
+        '--zero-time', '1655769600000',
+        '--zero-slot', '86400',
+    ]
+
+    key, cached = lookup_simulation(tx_cbor, input_cbor, output_cbor, aiken_path, debug, params, result_cache, failure_cache)
+    if cached is not None:
+        return cached
+
+    # try to simulate the tx and return the results else return an empty dict
+    try:
+        # the files are removed on every exit path
+        with handoff_files([tx_cbor, input_cbor, output_cbor], in_memory) as (paths, fds):
+            # the default value assumes aiken to be on path
+            # or it uses the aiken path
+            func = [aiken_path, 'tx', 'simulate'] + paths + params
+            output = subprocess.run(
+                func,
+                check=True,
+                capture_output=False if debug is True else True,
+                text=True,
+                pass_fds=fds
+            )
 
-        # this should remove the temp files
-        os.remove(temp_tx_file_path)
-        os.remove(temp_input_file_path)
-        os.remove(temp_output_file_path)
         # if debug is on then dont json decode
         if debug is False:
-            return json.loads(output.stdout)
+            result = json.loads(output.stdout)
+            if key is not None and result_cache is not None:
+                result_cache.put(key, result)
+            return result
         else:
             return [{}]
-    except subprocess.CalledProcessError:
+    except subprocess.CalledProcessError as error:
         # the simulation failed in some way
+        failure = SimulationFailure('simulation', error.stderr, error.returncode)
+        if key is not None and failure_cache is not None:
+            failure_cache.put(key, failure)
+        return [failure]
+    except (FileNotFoundError, PermissionError) as error:
+        return [SimulationFailure('aiken_unavailable', detail=str(error))]
+    except json.JSONDecodeError:
+        return [SimulationFailure('invalid_output', output.stderr, output.returncode, output.stdout)]
+
+
+async def simulate_cbor_async(tx_cbor: str | bytes, input_cbor: str | bytes, output_cbor: str | bytes, aiken_path: str = 'aiken', debug: bool = False, network: bool = False, *, in_memory: bool = False, result_cache: SimulationResultCache | None = None, failure_cache: FailureCache | None = None, limiter: asyncio.Semaphore | None = None) -> list[dict]:
+    """The asyncio version of simulate_cbor, aiken runs without blocking the event loop.
+    A cancelled simulation kills its aiken process before the cbor is removed.
+
+    Args:
+        tx_cbor (str | bytes): The transaction cbor.
+        input_cbor (str | bytes): The cbor of the inputs.
+        output_cbor (str | bytes): The cbor of the resolved outputs, in the same order as the inputs.
+        aiken_path (str, optional): The path to aiken. Defaults to 'aiken'.
+        debug (bool, optional): Debug prints to console. Defaults to False.
+        network (bool, optional): The network flag, mainnet (True) or preprod (False). Defaults to False.
+        in_memory (bool, optional): Hand the cbor to aiken without temp files on disk. Defaults to False.
+        result_cache (SimulationResultCache, optional): Returns stored results without running aiken. Defaults to None.
+        failure_cache (FailureCache, optional): Returns recent deterministic failures without running aiken. Defaults to None.
+        limiter (asyncio.Semaphore, optional): Bounds the number of concurrent aiken processes. Defaults to None.
+
+    Returns:
+        list[dict]: Either a list with an empty dictionary or a list of the cpu and mem units.
+    """
+    if limiter is not None:
+        async with limiter:
+            return await simulate_cbor_async(tx_cbor, input_cbor, output_cbor, aiken_path, debug, network, in_memory=in_memory, result_cache=result_cache, failure_cache=failure_cache)
+
+    # this is calculated from the block after the hf
+    params = [] if network is True else [
+        '--zero-time', '1655769600000',
+        '--zero-slot', '86400',
+    ]
+    key, cached = await asyncio.to_thread(lookup_simulation, tx_cbor, input_cbor, output_cbor, aiken_path, debug, params, result_cache, failure_cache)
+    if cached is not None:
+        return cached
+
+    with handoff_files([tx_cbor, input_cbor, output_cbor], in_memory) as (paths, fds):
+        func = [aiken_path, 'tx', 'simulate'] + paths + params
+        pipe = None if debug is True else asyncio.subprocess.PIPE
+        try:
+            process = await asyncio.create_subprocess_exec(*func, stdout=pipe, stderr=pipe, pass_fds=fds)
+        except (FileNotFoundError, PermissionError) as error:
+            return [SimulationFailure('aiken_unavailable', detail=str(error))]
+        try:
+            stdout, stderr = await process.communicate()
+        except BaseException:
+            # a cancelled caller must not leave aiken reading removed files
+            process.kill()
+            await process.wait()
+            raise
+
+    # the simulation failed in some way
+    if process.returncode != 0:
+        failure = SimulationFailure('simulation', stderr.decode() if stderr is not None else None, process.returncode)
+        if key is not None and failure_cache is not None:
+            failure_cache.put(key, failure)
+        return [failure]
+    # if debug is on then dont json decode
+    if debug is False:
+        try:
+            result = json.loads(stdout)
+            if key is not None and result_cache is not None:
+                result_cache.put(key, result)
+            return result
+        except json.JSONDecodeError:
+            return [SimulationFailure('invalid_output', stderr.decode(), process.returncode, stdout.decode())]
+    else:
         return [{}]
 
 
-def from_cbor(tx_cbor: str, network: bool, debug: bool = False, aiken_path: str = 'aiken', plutus_version: int = 3) -> list[dict]:
+def check_tx_body(data: list) -> SimulationFailure | None:
+    """Check that a decoded tx has a body with its inputs, outputs and fee. This runs
+    before the inputs are read so a malformed tx fails without a lookup.
+
+    Args:
+        data (list): The decoded transaction.
+
+    Returns:
+        SimulationFailure | None: An invalid_tx failure, or None if the body is complete.
+    """
+    try:
+        txBody = data[0]
+        missing = [field for field in (0, 1, 2) if field not in txBody]
+    except (KeyError, TypeError, IndexError):
+        return SimulationFailure('invalid_tx', detail="the tx has no body")
+    if not isinstance(txBody, dict):
+        return SimulationFailure('invalid_tx', detail="the tx has no body")
+    if len(missing) > 0:
+        return SimulationFailure('invalid_tx', detail=f"the tx body is missing the fields {missing}")
+    return None
+
+
+def preflight(data: list, inputs: list[tuple[str, int]], utxos: dict[tuple[str, int], dict], check_balance: bool = False) -> SimulationFailure | None:
+    """Check a tx for failures that are certain before aiken is run, so a doomed tx
+    does not cost a process. The required body fields must exist and every input
+    must be resolved.
+
+    aiken does not check that value is preserved, so an unbalanced draft still gets
+    its execution units, like while estimating a fee. With check_balance the value
+    of the tx must balance too. It is only checked for valid txs without
+    certificates or proposals, since their deposits and refunds depend on the
+    protocol parameters.
+
+    Args:
+        data (list): The decoded transaction.
+        inputs (list[tuple[str, int]]): The utxo inputs of the tx.
+        utxos (dict[tuple[str, int], dict]): The resolved outputs.
+        check_balance (bool, optional): Fail txs that do not preserve value. Defaults to False.
+
+    Returns:
+        SimulationFailure | None: The failure, or None if the tx may pass.
+    """
+    failure = check_tx_body(data)
+    if failure is not None:
+        return failure
+    txBody = data[0]
+
+    missing = [txin for txin in inputs if txin not in utxos]
+    if len(missing) > 0:
+        return SimulationFailure('missing_inputs', detail=missing)
+
+    if check_balance is False:
+        return None
+
+    # a failing tx only spends its collateral
+    if len(data) > 2 and data[2] is False:
+        return None
+    if len(txBody.get(4, [])) > 0 or len(txBody.get(20, [])) > 0:
+        return None
+
+    spent = [utxos[(bytes(utxo[0]).hex(), int(utxo[1]))].get(1) for utxo in txBody[0]]
+    if any(value is None for value in spent):
+        # partially cached outputs can not be balanced
+        return None
+
+    # inputs + withdrawals + mint = outputs + fee + donation
+    consumed = Value.sum(spent) + sum(txBody.get(5, {}).values()) + Value.from_multiasset(0, txBody.get(9, {}))
+    produced = Value.sum(output[1] for output in txBody[1]) + txBody[2] + txBody.get(22, 0)
+    if consumed == produced:
+        return None
+
+    difference = consumed - produced
+    detail = {'lovelace': difference.coin, 'assets': {policy.hex(): {name.hex(): quantity for name, quantity in names} for policy, names in difference.assets}}
+    return SimulationFailure('unbalanced', detail=detail)
+
+
+def resolve_utxos(inputs: list[tuple[str, int]], network: bool, plutus_version: int = 3, cache: UtxoCache | None = None, client: KoiosClient | None = None, timer: StageTimer | None = None, provider: UtxoProvider | None = None) -> dict[tuple[str, int], dict]:
+    """Resolve the outputs for a list of utxo inputs. Cached outputs are used first
+    and only the remaining inputs are resolved with the provider.
+
+    Args:
+        inputs (list[tuple[str, int]]): The utxo inputs to resolve.
+        network (bool): The network flag, mainnet (True) or preprod (False).
+        plutus_version (int, optional): The plutus version of reference scripts. Defaults to 3.
+        cache (UtxoCache, optional): A resolved output cache. Defaults to None.
+        client (KoiosClient, optional): The Koios client. Defaults to the shared client.
+        timer (StageTimer, optional): Records the koios_query and build_resolved_output stages. Defaults to None.
+        provider (UtxoProvider, optional): The source of the outputs. Defaults to Koios with the client.
+
+    Returns:
+        dict[tuple[str, int], dict]: The resolved outputs keyed by input, unresolved inputs are missing.
+    """
+    utxos = {}
+    missing = []
+    for txin in inputs:
+        cached = cache.get(txin[0], txin[1], network, plutus_version) if cache is not None else None
+        if cached is not None:
+            utxos[txin] = cached
+        else:
+            missing.append(txin)
+
+    if len(missing) == 0:
+        return utxos
+
+    if provider is None:
+        provider = KoiosProvider(client)
+
+    for txin, resolved in provider.resolve(missing, network, plutus_version, timer).items():
+        utxos[txin] = resolved
+        if cache is not None:
+            cache.put(txin[0], txin[1], network, resolved, plutus_version)
+    return utxos
+
+
+def simulate_cbor_many(simulations: list[tuple[str | bytes, str | bytes, str | bytes]], aiken_path: str = 'aiken', debug: bool = False, network: bool = False, *, max_workers: int | None = None, in_memory: bool = False) -> list[list[dict]]:
+    """Simulate many prepared txs with a bounded pool of concurrent aiken processes.
+
+    Args:
+        simulations (list[tuple[str | bytes, str | bytes, str | bytes]]): The (tx_cbor, input_cbor, output_cbor) of each simulation, as hex or raw bytes.
+        aiken_path (str, optional): The path to aiken. Defaults to 'aiken'.
+        debug (bool, optional): Debug prints to console. Defaults to False.
+        network (bool, optional): The network flag, mainnet (True) or preprod (False). Defaults to False.
+        max_workers (int, optional): The number of concurrent aiken processes. Defaults to the cpu count.
+        in_memory (bool, optional): Hand the cbor to aiken without temp files on disk. Defaults to False.
+
+    Returns:
+        list[list[dict]]: The simulation results in the same order as the simulations.
+    """
+    if len(simulations) == 0:
+        return []
+
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        futures = [
+            executor.submit(simulate_cbor, tx_cbor, input_cbor, output_cbor, aiken_path, debug, network, in_memory=in_memory)
+            for tx_cbor, input_cbor, output_cbor in simulations
+        ]
+
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as error:
+                # a broken simulation only fails itself
+                results.append([SimulationFailure('error', detail=str(error))])
+    return results
+
+
+def from_cbor(tx_cbor: str, network: bool, debug: bool = False, aiken_path: str = 'aiken', plutus_version: int = 3, *, cache: UtxoCache | None = None, client: KoiosClient | None = None, in_memory: bool = False, timer: StageTimer | None = None, provider: UtxoProvider | None = None, result_cache: SimulationResultCache | None = None, failure_cache: FailureCache | None = None, check_balance: bool = False) -> list[dict]:
     """Simulate a tx from tx cbor for some network.
 
     Args:
@@ -357,52 +2561,329 @@ def from_cbor(tx_cbor: str, network: bool, debug: bool = False, aiken_path: str
         network (bool): The network flag, mainnet (True) or preprod (False).
         debug (bool, optional): Debug prints to console. Defaults to False.
         aiken_path (str, optional): The path to aiken. Defaults to 'aiken'.
+        cache (UtxoCache, optional): A resolved output cache checked before Koios. Defaults to None.
+        client (KoiosClient, optional): The Koios client. Defaults to the shared client.
+        in_memory (bool, optional): Hand the cbor to aiken without temp files on disk. Defaults to False.
+        timer (StageTimer, optional): Records the wall time of each stage. Defaults to None.
+        provider (UtxoProvider, optional): The source of the input outputs. Defaults to Koios with the client.
+        result_cache (SimulationResultCache, optional): Returns stored results without running aiken. Defaults to None.
+        failure_cache (FailureCache, optional): Returns recent deterministic failures without running aiken. Defaults to None.
+        check_balance (bool, optional): Fail txs that do not preserve value without running aiken. Defaults to False.
 
     Returns:
         dict: Either an empty dictionary or a dictionary of the cpu and mem units.
     """
-    # resolve the input and prepare the cbor
-    inputs = resolve_inputs(tx_cbor)
-    prepare_inputs = [(to_bytes(txin[0]), txin[1]) for txin in inputs]
-    # print(f"Prepared Inputs: {prepare_inputs}")
-    input_cbor = cbor2.dumps(prepare_inputs).hex()
-    # print(f"CBOR Input: {input_cbor}")
+    # the hex is only converted once, everything after works on the raw bytes
+    with timed(timer, 'decode'):
+        tx_bytes, data = decode_tx(tx_cbor)
+    return simulate_decoded(tx_bytes, data, network, debug, aiken_path, plutus_version, cache=cache, client=client, in_memory=in_memory, timer=timer, provider=provider, result_cache=result_cache, failure_cache=failure_cache, check_balance=check_balance)
 
-    # resolve the input's output using koios
-    tx_hashes = [txin[0] for txin in inputs]
-    resolved_inputs_outputs = query_tx_with_koios(tx_hashes, network)
 
-    # build out the list of outputs
-    outputs = []
+def from_cbor_bytes(tx_cbor: bytes | memoryview, network: bool, debug: bool = False, aiken_path: str = 'aiken', plutus_version: int = 3, *, cache: UtxoCache | None = None, client: KoiosClient | None = None, in_memory: bool = False, timer: StageTimer | None = None, provider: UtxoProvider | None = None, result_cache: SimulationResultCache | None = None, failure_cache: FailureCache | None = None, check_balance: bool = False) -> list[dict]:
+    """The bytes version of from_cbor. The tx is never converted to hex until it is
+    handed to aiken.
 
-    # the order of the resolved outputs matter so we match to the inputs
-    for txin in inputs:
-        in_txid = txin[0]
-        in_txidx = txin[1]
-
-        # now find the input output for that hash
-        for txin_out in resolved_inputs_outputs:
-            txin_out_txid = txin_out['tx_hash']
-            if in_txid != txin_out_txid:
-                # have to match the hashes so the we can resolve a specific tx input
-                continue
+    Args:
+        tx_cbor (bytes | memoryview): The raw transaction cbor.
+        network (bool): The network flag, mainnet (True) or preprod (False).
+        debug (bool, optional): Debug prints to console. Defaults to False.
+        aiken_path (str, optional): The path to aiken. Defaults to 'aiken'.
+        cache (UtxoCache, optional): A resolved output cache checked before Koios. Defaults to None.
+        client (KoiosClient, optional): The Koios client. Defaults to the shared client.
+        in_memory (bool, optional): Hand the cbor to aiken without temp files on disk. Defaults to False.
+        timer (StageTimer, optional): Records the wall time of each stage. Defaults to None.
+        provider (UtxoProvider, optional): The source of the input outputs. Defaults to Koios with the client.
+        result_cache (SimulationResultCache, optional): Returns stored results without running aiken. Defaults to None.
+        failure_cache (FailureCache, optional): Returns recent deterministic failures without running aiken. Defaults to None.
+        check_balance (bool, optional): Fail txs that do not preserve value without running aiken. Defaults to False.
+
+    Returns:
+        dict: Either an empty dictionary or a dictionary of the cpu and mem units.
+    """
+    with timed(timer, 'decode'):
+        data = cbor2.loads(tx_cbor)
+    return simulate_decoded(tx_cbor, data, network, debug, aiken_path, plutus_version, cache=cache, client=client, in_memory=in_memory, timer=timer, provider=provider, result_cache=result_cache, failure_cache=failure_cache, check_balance=check_balance)
+
+
+def prepare_simulation(data: list, network: bool, plutus_version: int = 3, cache: UtxoCache | None = None, client: KoiosClient | None = None, timer: StageTimer | None = None, provider: UtxoProvider | None = None, check_balance: bool = False) -> tuple[bytes, bytes] | SimulationFailure:
+    """Resolve the inputs of a decoded tx and encode them for aiken. This is the
+    shared step of the sync and async simulations.
+
+    Args:
+        data (list): The decoded transaction.
+        network (bool): The network flag, mainnet (True) or preprod (False).
+        plutus_version (int, optional): The plutus version of reference scripts. Defaults to 3.
+        cache (UtxoCache, optional): A resolved output cache checked before Koios. Defaults to None.
+        client (KoiosClient, optional): The Koios client. Defaults to the shared client.
+        timer (StageTimer, optional): Records the wall time of each stage. Defaults to None.
+        provider (UtxoProvider, optional): The source of the input outputs. Defaults to Koios with the client.
+        check_balance (bool, optional): Fail txs that do not preserve value. Defaults to False.
+
+    Returns:
+        tuple[bytes, bytes] | SimulationFailure: The input and output cbor, or the failure found before aiken.
+    """
+    # a malformed tx fails before any lookup
+    failure = check_tx_body(data)
+    if failure is not None:
+        return failure
+
+    # resolve the input and prepare the cbor
+    with timed(timer, 'resolve_inputs'):
+        try:
+            refs = decoded_input_refs(data)
+        except KeyError as error:
+            return SimulationFailure('invalid_tx', detail=str(error))
+        # hex keys are only needed for the providers and the cache
+        inputs = [(txid.hex(), idx) for txid, idx in refs]
+    with timed(timer, 'cbor_encode'):
+        input_cbor = cbor2.dumps(refs)
 
-            # now we have a tx input output for a given input
-            resolved = build_resolved_output(in_txid, in_txidx, txin_out, network, plutus_version)
-            # append it and go to the next one
-            outputs.append(resolved)
-            # we break here since we built out the resolve output for a specific input
-            break
-    # print(f"Prepared Outputs: {outputs}")
+    # the order of the resolved outputs matter so we match to the inputs
+    utxos = resolve_utxos(inputs, network, plutus_version, cache, client, timer, provider)
+    failure = preflight(data, inputs, utxos, check_balance)
+    if failure is not None:
+        return failure
+    outputs = [utxos[txin] for txin in inputs]
     # get the resolved output cbor
-    output_cbor = cbor2.dumps(outputs).hex()
-    # print(f"CBOR Output: {output_cbor}")
+    with timed(timer, 'cbor_encode'):
+        output_cbor = encode_cbor(outputs)
+    return input_cbor, output_cbor
 
-    # try to simulate the tx and return the results else return an empty dict
-    return simulate_cbor(tx_cbor, input_cbor, output_cbor, aiken_path, debug, network)
 
+def simulate_decoded(tx_cbor: bytes | memoryview, data: list, network: bool, debug: bool = False, aiken_path: str = 'aiken', plutus_version: int = 3, *, cache: UtxoCache | None = None, client: KoiosClient | None = None, in_memory: bool = False, timer: StageTimer | None = None, provider: UtxoProvider | None = None, result_cache: SimulationResultCache | None = None, failure_cache: FailureCache | None = None, check_balance: bool = False) -> list[dict]:
+    """Simulate a tx that is already decoded, see from_cbor_bytes.
+
+    Args:
+        tx_cbor (bytes | memoryview): The raw transaction cbor.
+        data (list): The decoded transaction.
+
+    Returns:
+        dict: Either an empty dictionary or a dictionary of the cpu and mem units.
+    """
+    prepared = prepare_simulation(data, network, plutus_version, cache, client, timer, provider, check_balance)
+    if isinstance(prepared, SimulationFailure):
+        return [prepared]
+    input_cbor, output_cbor = prepared
+
+    # try to simulate the tx and return the results else return a failure
+    with timed(timer, 'aiken'):
+        return simulate_cbor(tx_cbor, input_cbor, output_cbor, aiken_path, debug, network, in_memory=in_memory, result_cache=result_cache, failure_cache=failure_cache)
+
+
+async def simulate_decoded_async(tx_cbor: bytes | memoryview, data: list, network: bool, debug: bool = False, aiken_path: str = 'aiken', plutus_version: int = 3, *, cache: UtxoCache | None = None, client: KoiosClient | None = None, in_memory: bool = False, timer: StageTimer | None = None, provider: UtxoProvider | None = None, result_cache: SimulationResultCache | None = None, failure_cache: FailureCache | None = None, check_balance: bool = False, limiter: asyncio.Semaphore | None = None) -> list[dict]:
+    """The asyncio version of simulate_decoded, see from_cbor_async.
+
+    Args:
+        tx_cbor (bytes | memoryview): The raw transaction cbor.
+        data (list): The decoded transaction.
+
+    Returns:
+        dict: Either an empty dictionary or a dictionary of the cpu and mem units.
+    """
+    if limiter is not None:
+        # waiting here is the backpressure for the caller
+        async with limiter:
+            return await simulate_decoded_async(tx_cbor, data, network, debug, aiken_path, plutus_version, cache=cache, client=client, in_memory=in_memory, timer=timer, provider=provider, result_cache=result_cache, failure_cache=failure_cache, check_balance=check_balance)
+
+    # the lookup blocks so it runs in a worker thread
+    prepared = await asyncio.to_thread(prepare_simulation, data, network, plutus_version, cache, client, timer, provider, check_balance)
+    if isinstance(prepared, SimulationFailure):
+        return [prepared]
+    input_cbor, output_cbor = prepared
+
+    with timed(timer, 'aiken'):
+        return await simulate_cbor_async(tx_cbor, input_cbor, output_cbor, aiken_path, debug, network, in_memory=in_memory, result_cache=result_cache, failure_cache=failure_cache)
+
+
+async def from_cbor_async(tx_cbor: str, network: bool, debug: bool = False, aiken_path: str = 'aiken', plutus_version: int = 3, *, cache: UtxoCache | None = None, client: KoiosClient | None = None, in_memory: bool = False, timer: StageTimer | None = None, provider: UtxoProvider | None = None, result_cache: SimulationResultCache | None = None, failure_cache: FailureCache | None = None, check_balance: bool = False, limiter: asyncio.Semaphore | None = None) -> list[dict]:
+    """The asyncio version of from_cbor. The Koios lookup runs in a worker thread and
+    aiken runs as an asyncio subprocess so neither blocks the event loop.
+
+    Args:
+        tx_cbor (str): The transaction cbor.
+        network (bool): The network flag, mainnet (True) or preprod (False).
+        debug (bool, optional): Debug prints to console. Defaults to False.
+        aiken_path (str, optional): The path to aiken. Defaults to 'aiken'.
+        cache (UtxoCache, optional): A resolved output cache checked before Koios. Defaults to None.
+        client (KoiosClient, optional): The Koios client. Defaults to the shared client.
+        in_memory (bool, optional): Hand the cbor to aiken without temp files on disk. Defaults to False.
+        timer (StageTimer, optional): Records the wall time of each stage. Defaults to None.
+        provider (UtxoProvider, optional): The source of the input outputs. Defaults to Koios with the client.
+        result_cache (SimulationResultCache, optional): Returns stored results without running aiken. Defaults to None.
+        failure_cache (FailureCache, optional): Returns recent deterministic failures without running aiken. Defaults to None.
+        check_balance (bool, optional): Fail txs that do not preserve value without running aiken. Defaults to False.
+        limiter (asyncio.Semaphore, optional): Bounds the number of simulations in flight. Defaults to None.
+
+    Returns:
+        dict: Either an empty dictionary or a dictionary of the cpu and mem units.
+    """
+    with timed(timer, 'decode'):
+        tx_bytes, data = decode_tx(tx_cbor)
+    return await simulate_decoded_async(tx_bytes, data, network, debug, aiken_path, plutus_version, cache=cache, client=client, in_memory=in_memory, timer=timer, provider=provider, result_cache=result_cache, failure_cache=failure_cache, check_balance=check_balance, limiter=limiter)
+
+
+class SimulationContext:
+    """The resolved inputs of a tx, kept so that variants of the tx spending the same
+    utxos can be simulated again without resolving and encoding them each time. A
+    changed redeemer, fee, output or validity interval keeps the same utxo set.
+    """
+
+    def __init__(self, tx_cbor: str | bytes | memoryview, network: bool, debug: bool = False, aiken_path: str = 'aiken', plutus_version: int = 3, *, cache: UtxoCache | None = None, client: KoiosClient | None = None, in_memory: bool = False, timer: StageTimer | None = None, provider: UtxoProvider | None = None, check_balance: bool = False):
+        """
+        Args:
+            tx_cbor (str | bytes | memoryview): The transaction cbor, as hex or raw bytes.
+            network (bool): The network flag, mainnet (True) or preprod (False).
+            debug (bool, optional): Debug prints to console. Defaults to False.
+            aiken_path (str, optional): The path to aiken. Defaults to 'aiken'.
+            plutus_version (int, optional): The plutus version of reference scripts. Defaults to 3.
+            cache (UtxoCache, optional): A resolved output cache checked before Koios. Defaults to None.
+            client (KoiosClient, optional): The Koios client. Defaults to the shared client.
+            in_memory (bool, optional): Hand the cbor to aiken without temp files on disk. Defaults to False.
+            timer (StageTimer, optional): Records the wall time of resolving the inputs. Defaults to None.
+            provider (UtxoProvider, optional): The source of the input outputs. Defaults to Koios with the client.
+            check_balance (bool, optional): Fail txs that do not preserve value without running aiken. Defaults to False.
+
+        Raises:
+            KeyError: The inputs, collateral, and reference inputs must exist inside the tx.
+        """
+        self.network = network
+        self.debug = debug
+        self.aiken_path = aiken_path
+        self.in_memory = in_memory
+        self.check_balance = check_balance
+
+        with timed(timer, 'decode'):
+            self.tx_cbor = to_bytes(tx_cbor) if isinstance(tx_cbor, str) else tx_cbor
+            data = cbor2.loads(self.tx_cbor)
+        self.data = data
+        with timed(timer, 'resolve_inputs'):
+            self.refs = decoded_input_refs(data)
+            self.inputs = [(txid.hex(), idx) for txid, idx in self.refs]
+
+        self.utxos = resolve_utxos(self.inputs, network, plutus_version, cache, client, timer, provider)
+        self.input_cbor = self.output_cbor = None
+        # an unresolved input fails every variant in preflight, so there is nothing to encode
+        if all(txin in self.utxos for txin in self.inputs):
+            with timed(timer, 'cbor_encode'):
+                self.input_cbor, self.output_cbor = self.encode(self.refs)
+
+    def encode(self, refs: list[tuple[bytes, int]]) -> tuple[bytes, bytes]:
+        """Encode the inputs and the resolved outputs in the order of the refs.
+
+        Args:
+            refs (list[tuple[bytes, int]]): The utxo inputs.
+
+        Returns:
+            tuple[bytes, bytes]: The input cbor and the output cbor.
+        """
+        outputs = [self.utxos[(txid.hex(), idx)] for txid, idx in refs]
+        return cbor2.dumps(refs), encode_cbor(outputs)
+
+    def simulate(self, tx_cbor: str | bytes | memoryview | None = None, timer: StageTimer | None = None) -> list[dict]:
+        """Simulate the tx, or a variant of it that spends the same utxos.
+
+        Args:
+            tx_cbor (str | bytes | memoryview, optional): The variant cbor, as hex or raw bytes. Defaults to the original tx.
+            timer (StageTimer, optional): Records the wall time of each stage. Defaults to None.
+
+        Raises:
+            ValueError: The variant spends a different utxo set.
+
+        Returns:
+            list[dict]: Either a list with an empty dictionary or a list of the cpu and mem units.
+        """
+        if tx_cbor is None:
+            tx_cbor = self.tx_cbor
+            data = self.data
+            refs = self.refs
+        else:
+            with timed(timer, 'decode'):
+                if isinstance(tx_cbor, str):
+                    tx_cbor = to_bytes(tx_cbor)
+                data = cbor2.loads(tx_cbor)
+            with timed(timer, 'resolve_inputs'):
+                refs = decoded_input_refs(data)
+            if sorted(refs) != sorted(self.refs):
+                raise ValueError("the variant spends a different utxo set than the context")
+
+        # the same utxo set so the inputs of the context are the inputs of the variant
+        failure = preflight(data, self.inputs, self.utxos, self.check_balance)
+        if failure is not None:
+            return [failure]
+
+        if refs == self.refs:
+            input_cbor, output_cbor = self.input_cbor, self.output_cbor
+        else:
+            # same utxos in another order so the outputs must follow it
+            with timed(timer, 'cbor_encode'):
+                input_cbor, output_cbor = self.encode(refs)
+        with timed(timer, 'aiken'):
+            return simulate_cbor(tx_cbor, input_cbor, output_cbor, self.aiken_path, self.debug, self.network, in_memory=self.in_memory)
+
+
+def simulate_many(tx_cbors: list[str | bytes], network: bool, debug: bool = False, aiken_path: str = 'aiken', plutus_version: int = 3, *, cache: UtxoCache | None = None, max_workers: int | None = None, client: KoiosClient | None = None, in_memory: bool = False, provider: UtxoProvider | None = None, check_balance: bool = False) -> list[list[dict]]:
+    """Simulate many txs for some network. Every tx is decoded up front and the union
+    of their inputs is resolved together, so utxos shared between the txs, like
+    reference scripts and collateral, are only queried once.
+
+    Args:
+        tx_cbors (list[str | bytes]): The transaction cbors, as hex or raw bytes.
+        network (bool): The network flag, mainnet (True) or preprod (False).
+        debug (bool, optional): Debug prints to console. Defaults to False.
+        aiken_path (str, optional): The path to aiken. Defaults to 'aiken'.
+        cache (UtxoCache, optional): A resolved output cache checked before Koios. Defaults to None.
+        max_workers (int, optional): The number of concurrent aiken processes. Defaults to the cpu count.
+        client (KoiosClient, optional): The Koios client. Defaults to the shared client.
+        in_memory (bool, optional): Hand the cbor to aiken without temp files on disk. Defaults to False.
+        provider (UtxoProvider, optional): The source of the input outputs. Defaults to Koios with the client.
+        check_balance (bool, optional): Fail txs that do not preserve value without running aiken. Defaults to False.
 
-def from_file(tx_draft_path: str, network: bool, debug: bool = False, aiken_path: str = 'aiken', plutus_version: int = 3) -> list[dict]:
+    Returns:
+        list[list[dict]]: The simulation results in the same order as the txs.
+    """
+    # decode every tx up front, a tx that can not be decoded fails on its own
+    decoded = []
+    for tx_cbor in tx_cbors:
+        try:
+            tx_bytes, data = decode_tx(tx_cbor)
+        except (TypeError, ValueError) as error:
+            # not hex, like a None, or not cbor
+            decoded.append(SimulationFailure('decode', detail=str(error)))
+            continue
+        failure = check_tx_body(data)
+        if failure is None:
+            try:
+                refs = decoded_input_refs(data)
+            except KeyError as error:
+                failure = SimulationFailure('invalid_tx', detail=str(error))
+        if failure is not None:
+            decoded.append(failure)
+            continue
+        # hex keys are only needed for the providers and the cache
+        decoded.append((tx_bytes, data, refs, [(txid.hex(), idx) for txid, idx in refs]))
+
+    # the union of all the inputs in order of appearance
+    union = list(dict.fromkeys(txin for entry in decoded if not isinstance(entry, SimulationFailure) for txin in entry[3]))
+    utxos = resolve_utxos(union, network, plutus_version, cache, client, provider=provider)
+
+    # doomed txs fail here without an aiken process, the rest stay bytes until aiken
+    simulations = []
+    for i, entry in enumerate(decoded):
+        if isinstance(entry, SimulationFailure):
+            continue
+        tx_bytes, data, refs, inputs = entry
+        failure = preflight(data, inputs, utxos, check_balance)
+        if failure is not None:
+            decoded[i] = failure
+            continue
+        simulations.append((tx_bytes, cbor2.dumps(refs), encode_cbor([utxos[txin] for txin in inputs])))
+
+    # run the simulations in parallel then put the failures back in place
+    simulated = iter(simulate_cbor_many(simulations, aiken_path, debug, network, max_workers=max_workers, in_memory=in_memory))
+    return [[entry] if isinstance(entry, SimulationFailure) else next(simulated) for entry in decoded]
+
+
+def from_file(tx_draft_path: str, network: bool, debug: bool = False, aiken_path: str = 'aiken', plutus_version: int = 3, *, cache: UtxoCache | None = None, client: KoiosClient | None = None, in_memory: bool = False, timer: StageTimer | None = None, provider: UtxoProvider | None = None, result_cache: SimulationResultCache | None = None, failure_cache: FailureCache | None = None, check_balance: bool = False) -> list[dict]:
     """Simulate a tx from a tx draft file for some network.
 
     Args:
@@ -410,6 +2891,14 @@ def from_file(tx_draft_path: str, network: bool, debug: bool = False, aiken_path
         network (bool): The network flag, mainnet (True) or preprod (False).
         debug (bool, optional): Debug prints to console. Defaults to False.
         aiken_path (str, optional): The path to aiken. Defaults to 'aiken'.
+        cache (UtxoCache, optional): A resolved output cache checked before Koios. Defaults to None.
+        client (KoiosClient, optional): The Koios client. Defaults to the shared client.
+        in_memory (bool, optional): Hand the cbor to aiken without temp files on disk. Defaults to False.
+        timer (StageTimer, optional): Records the wall time of each stage. Defaults to None.
+        provider (UtxoProvider, optional): The source of the input outputs. Defaults to Koios with the client.
+        result_cache (SimulationResultCache, optional): Returns stored results without running aiken. Defaults to None.
+        failure_cache (FailureCache, optional): Returns recent deterministic failures without running aiken. Defaults to None.
+        check_balance (bool, optional): Fail txs that do not preserve value without running aiken. Defaults to False.
 
     Returns:
         dict: Either an empty dictionary or a dictionary of the cpu and mem units.
@@ -421,9 +2910,96 @@ def from_file(tx_draft_path: str, network: bool, debug: bool = False, aiken_path
     try:
         # get cbor hex from the file and proceed
         cborHex = data['cborHex']
-        return from_cbor(cborHex, network, debug, aiken_path, plutus_version)
     except KeyError:
-        return [{}]
+        return [SimulationFailure('invalid_draft', detail="the tx draft has no cborHex")]
+    try:
+        with timed(timer, 'decode'):
+            tx_bytes, data = decode_tx(cborHex)
+    except (TypeError, ValueError) as error:
+        # only the decode is caught, a failed lookup is not a broken tx
+        return [SimulationFailure('decode', detail=str(error))]
+    return simulate_decoded(tx_bytes, data, network, debug, aiken_path, plutus_version, cache=cache, client=client, in_memory=in_memory, timer=timer, provider=provider, result_cache=result_cache, failure_cache=failure_cache, check_balance=check_balance)
+
+
+async def from_file_async(tx_draft_path: str, network: bool, debug: bool = False, aiken_path: str = 'aiken', plutus_version: int = 3, *, cache: UtxoCache | None = None, client: KoiosClient | None = None, in_memory: bool = False, timer: StageTimer | None = None, provider: UtxoProvider | None = None, result_cache: SimulationResultCache | None = None, failure_cache: FailureCache | None = None, check_balance: bool = False, limiter: asyncio.Semaphore | None = None) -> list[dict]:
+    """The asyncio version of from_file.
+
+    Args:
+        tx_draft_path (str): The path to the tx.draft file.
+        network (bool): The network flag, mainnet (True) or preprod (False).
+        debug (bool, optional): Debug prints to console. Defaults to False.
+        aiken_path (str, optional): The path to aiken. Defaults to 'aiken'.
+        cache (UtxoCache, optional): A resolved output cache checked before Koios. Defaults to None.
+        client (KoiosClient, optional): The Koios client. Defaults to the shared client.
+        in_memory (bool, optional): Hand the cbor to aiken without temp files on disk. Defaults to False.
+        timer (StageTimer, optional): Records the wall time of each stage. Defaults to None.
+        provider (UtxoProvider, optional): The source of the input outputs. Defaults to Koios with the client.
+        result_cache (SimulationResultCache, optional): Returns stored results without running aiken. Defaults to None.
+        failure_cache (FailureCache, optional): Returns recent deterministic failures without running aiken. Defaults to None.
+        check_balance (bool, optional): Fail txs that do not preserve value without running aiken. Defaults to False.
+        limiter (asyncio.Semaphore, optional): Bounds the number of simulations in flight. Defaults to None.
+
+    Returns:
+        dict: Either an empty dictionary or a dictionary of the cpu and mem units.
+    """
+    # get cborHex from tx draft
+    def read_draft():
+        with open(tx_draft_path, 'r') as file:
+            return json.load(file)
+    data = await asyncio.to_thread(read_draft)
+
+    try:
+        # get cbor hex from the file and proceed
+        cborHex = data['cborHex']
+    except KeyError:
+        return [SimulationFailure('invalid_draft', detail="the tx draft has no cborHex")]
+    try:
+        with timed(timer, 'decode'):
+            tx_bytes, data = decode_tx(cborHex)
+    except (TypeError, ValueError) as error:
+        return [SimulationFailure('decode', detail=str(error))]
+    return await simulate_decoded_async(tx_bytes, data, network, debug, aiken_path, plutus_version, cache=cache, client=client, in_memory=in_memory, timer=timer, provider=provider, result_cache=result_cache, failure_cache=failure_cache, check_balance=check_balance, limiter=limiter)
+
+
+def from_directory(path: str, network: bool, pattern: str = '*.draft', debug: bool = False, aiken_path: str = 'aiken', plutus_version: int = 3, *, cache: UtxoCache | None = None, max_workers: int | None = None, client: KoiosClient | None = None, in_memory: bool = False, provider: UtxoProvider | None = None, check_balance: bool = False) -> dict[str, list[dict]]:
+    """Simulate every tx draft file in a directory for some network. The drafts are
+    read in parallel and simulated together with simulate_many, so utxos shared
+    between them, like reference scripts, are only resolved once.
+
+    Args:
+        path (str): The directory of tx.draft files.
+        network (bool): The network flag, mainnet (True) or preprod (False).
+        pattern (str, optional): The glob pattern of the draft files. Defaults to '*.draft'.
+        debug (bool, optional): Debug prints to console. Defaults to False.
+        aiken_path (str, optional): The path to aiken. Defaults to 'aiken'.
+        cache (UtxoCache, optional): A resolved output cache checked before Koios. Defaults to None.
+        max_workers (int, optional): The number of concurrent file reads and aiken processes. Defaults to the cpu count.
+        client (KoiosClient, optional): The Koios client. Defaults to the shared client.
+        in_memory (bool, optional): Hand the cbor to aiken without temp files on disk. Defaults to False.
+        provider (UtxoProvider, optional): The source of the input outputs. Defaults to Koios with the client.
+        check_balance (bool, optional): Fail txs that do not preserve value without running aiken. Defaults to False.
+
+    Returns:
+        dict[str, list[dict]]: The simulation results keyed by draft path, in path order.
+    """
+    paths = sorted(p for p in glob.glob(os.path.join(path, pattern)) if os.path.isfile(p))
+
+    def read_draft(draft_path):
+        try:
+            with open(draft_path, 'r') as file:
+                cborHex = json.load(file)['cborHex']
+        except (KeyError, TypeError, ValueError):
+            # not a tx draft so it fails on its own
+            return None
+        return cborHex if isinstance(cborHex, str) else None
+
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        cbors = list(executor.map(read_draft, paths))
+
+    drafts = [(draft_path, cbor) for draft_path, cbor in zip(paths, cbors) if cbor is not None]
+    results = simulate_many([cbor for _, cbor in drafts], network, debug, aiken_path, plutus_version, cache=cache, max_workers=max_workers, client=client, in_memory=in_memory, provider=provider, check_balance=check_balance)
+    simulated = {draft_path: result for (draft_path, _), result in zip(drafts, results)}
+    return {draft_path: simulated.get(draft_path, [SimulationFailure('invalid_draft', detail="not a tx draft")]) for draft_path in paths}
 
 
 def inputs_from_file(tx_draft_path: str, debug: bool = False) -> tuple[str, str] | None:
@@ -460,7 +3036,9 @@ def inputs_from_file(tx_draft_path: str, debug: bool = False) -> tuple[str, str]
 
 def sort_lexicographically(*args):
     """
-    Sorts the function inputs in lexicographical order.
+    Sorts the function inputs in lexicographical order. The strings are compared
+    as text, so 'txid#10' sorts before 'txid#2', use redeemer_indices for the
+    ledger ordering.
 
     Args:
     *args: Strings to be sorted.
@@ -486,3 +3064,195 @@ def get_index_in_order(ordered_list, item):
         return ordered_list.index(item)
     except ValueError:
         return -1  # Return -1 if the item is not found
+
+
+def spend_key(txin: str | tuple) -> tuple[bytes, int]:
+    # a 'txid#idx' string, a (txid, idx) pair or a TxIn as (txid bytes, idx)
+    if isinstance(txin, str):
+        txid, idx = txin.split('#')
+    else:
+        txid, idx = txin
+    return (to_bytes(txid) if isinstance(txid, str) else bytes(txid)), int(idx)
+
+
+def withdrawal_key(withdrawal: str | bytes | tuple) -> tuple[bool, bytes]:
+    # a (credential, is_script) pair or a reward address as bech32, hex or bytes
+    if isinstance(withdrawal, tuple):
+        credential, is_script = withdrawal
+        return not is_script, (to_bytes(credential) if isinstance(credential, str) else bytes(credential))
+    if isinstance(withdrawal, str):
+        if withdrawal.startswith('stake'):
+            _, data5 = bech32_decode(withdrawal)
+            withdrawal = bytes(convertbits(data5, 5, 8, False))
+        else:
+            withdrawal = to_bytes(withdrawal)
+    # the header of a reward address has the script bit set for script credentials
+    return not withdrawal[0] & 0x10, bytes(withdrawal[1:])
+
+
+def redeemer_indices(spend: list = (), mint: list = (), withdrawals: list = ()) -> dict[str, dict]:
+    """Compute every redeemer index of a tx at once in the ledger ordering. Spend
+    inputs are ordered by tx id bytes then output index, so #10 comes after #2,
+    mint policies by their bytes, and withdrawals by credential with script
+    credentials before key credentials.
+
+    Args:
+        spend (list, optional): The spent inputs as 'txid#idx' strings, (txid, idx) pairs or TxIns. Defaults to ().
+        mint (list, optional): The minted policy ids as hex or bytes. Defaults to ().
+        withdrawals (list, optional): The reward addresses as bech32, hex or bytes, or (credential, is_script) pairs. Defaults to ().
+
+    Returns:
+        dict[str, dict]: The spend, mint and withdraw indices, each keyed by the items as given.
+    """
+    def indices(items, key):
+        ordered = sorted(items, key=key)
+        return {item: index for index, item in enumerate(ordered)}
+
+    return {
+        'spend': indices(spend, spend_key),
+        'mint': indices(mint, lambda policy: to_bytes(policy) if isinstance(policy, str) else bytes(policy)),
+        'withdraw': indices(withdrawals, withdrawal_key),
+    }
+
+
+def simulate_line(line: str, network: bool, aiken_path: str = 'aiken', plutus_version: int = 3, *, cache: UtxoCache | None = None, in_memory: bool = False, provider: UtxoProvider | None = None, result_cache: SimulationResultCache | None = None, failure_cache: FailureCache | None = None, check_balance: bool = False) -> list[dict]:
+    """Simulate one input line, either tx cbor hex or the path to a tx.draft file.
+
+    Args:
+        line (str): The stripped input line.
+        network (bool): The network flag, mainnet (True) or preprod (False).
+
+    Returns:
+        list[dict]: Either a list with an empty dictionary or a list of the cpu and mem units.
+    """
+    if os.path.isfile(line):
+        return from_file(line, network, False, aiken_path, plutus_version, cache=cache, in_memory=in_memory, provider=provider, result_cache=result_cache, failure_cache=failure_cache, check_balance=check_balance)
+    # a hex line fails the same way as the same tx in a draft
+    try:
+        tx_bytes, data = decode_tx(line)
+    except (TypeError, ValueError) as error:
+        return [SimulationFailure('decode', detail=str(error))]
+    return simulate_decoded(tx_bytes, data, network, False, aiken_path, plutus_version, cache=cache, in_memory=in_memory, provider=provider, result_cache=result_cache, failure_cache=failure_cache, check_balance=check_balance)
+
+
+def stream_simulations(lines, out, network: bool, aiken_path: str = 'aiken', plutus_version: int = 3, *, cache: UtxoCache | None = None, max_workers: int | None = None, in_memory: bool = False, provider: UtxoProvider | None = None, result_cache: SimulationResultCache | None = None, failure_cache: FailureCache | None = None, check_balance: bool = False) -> int:
+    """Simulate each line concurrently and write one json result per line as each
+    finishes. Only a bounded number of lines are read ahead so memory does not grow
+    with the input.
+
+    Args:
+        lines (Iterable[str]): Tx cbor hex or tx.draft paths, blank lines are skipped.
+        out (TextIO): Where the json lines are written.
+        network (bool): The network flag, mainnet (True) or preprod (False).
+        max_workers (int, optional): The number of concurrent simulations. Defaults to the cpu count.
+
+    Returns:
+        int: The number of simulated lines.
+    """
+    max_workers = max_workers or os.cpu_count()
+    pending = {}
+    count = 0
+
+    def write_done(futures):
+        for future in futures:
+            number = pending.pop(future)
+            record = {'line': number}
+            try:
+                record['result'] = future.result()
+            except Exception as error:
+                # a broken line only fails itself, whatever it raised
+                record['result'] = [SimulationFailure('error', detail=str(error))]
+                record['error'] = str(error)
+            failure = failure_of(record['result'])
+            if failure is not None:
+                record['failure'] = failure.to_dict()
+            out.write(json.dumps(record) + '\n')
+            out.flush()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for number, line in enumerate(lines, start=1):
+            line = line.strip()
+            if line == '':
+                continue
+            # wait for a slot before reading further ahead
+            if len(pending) >= 2 * max_workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                write_done(done)
+            future = executor.submit(simulate_line, line, network, aiken_path, plutus_version, cache=cache, in_memory=in_memory, provider=provider, result_cache=result_cache, failure_cache=failure_cache, check_balance=check_balance)
+            pending[future] = number
+            count += 1
+        while len(pending) > 0:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            write_done(done)
+    return count
+
+
+def read_lines(paths: list[str]):
+    """Yield the lines of each file in turn, '-' reads stdin.
+
+    Args:
+        paths (list[str]): The files to read, stdin when empty.
+
+    Yields:
+        str: Each line.
+    """
+    for path in paths or ['-']:
+        if path == '-':
+            yield from sys.stdin
+        else:
+            with open(path, 'r') as file:
+                yield from file
+
+
+def main(argv: list[str] | None = None) -> int:
+    """The command line entry point.
+
+    Args:
+        argv (list[str], optional): The arguments. Defaults to sys.argv.
+
+    Returns:
+        int: The exit code.
+    """
+    parser = argparse.ArgumentParser(prog='tx_simulation', description="Cardano tx simulation with aiken and Koios.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build_index = commands.add_parser('build-index', help="build a utxo index file from Koios or cardano-cli dumps")
+    build_index.add_argument('output', help="the index file to write")
+    build_index.add_argument('dumps', nargs='+', help="Koios tx_info or utxo_info json, or cardano-cli query utxo json")
+    build_index.add_argument('--mainnet', action='store_true', help="the dumps are from mainnet, defaults to preprod")
+    build_index.add_argument('--plutus-version', type=int, default=3)
+
+    simulate = commands.add_parser('simulate', help="simulate tx cbor hex or tx.draft paths, one per line, writing json lines")
+    simulate.add_argument('inputs', nargs='*', help="files of input lines, defaults to stdin, '-' also reads stdin")
+    simulate.add_argument('--mainnet', action='store_true', help="simulate against mainnet, defaults to preprod")
+    simulate.add_argument('--aiken-path', default='aiken')
+    simulate.add_argument('--plutus-version', type=int, default=3)
+    simulate.add_argument('--workers', type=int, default=None, help="concurrent simulations, defaults to the cpu count")
+    simulate.add_argument('--utxo-cache', help="a UtxoCache SQLite file")
+    simulate.add_argument('--result-cache', help="a SimulationResultCache SQLite file")
+    simulate.add_argument('--index', help="resolve inputs from a build-index file instead of Koios")
+    simulate.add_argument('--in-memory', action='store_true', help="hand the cbor to aiken without temp files on disk")
+    simulate.add_argument('--failure-ttl', type=float, default=None, help="seconds to remember txs that aiken rejects")
+    simulate.add_argument('--check-balance', action='store_true', help="fail txs that do not preserve value without running aiken")
+
+    args = parser.parse_args(argv)
+    if args.command == 'build-index':
+        outputs = (output for dump in args.dumps for output in iter_dump_outputs(dump, args.mainnet, args.plutus_version))
+        count = build_utxo_index(args.output, outputs, args.mainnet)
+        print(f"indexed {count} utxos into {args.output}")
+    elif args.command == 'simulate':
+        cache = UtxoCache(args.utxo_cache) if args.utxo_cache is not None else None
+        result_cache = SimulationResultCache(args.result_cache) if args.result_cache is not None else None
+        provider = UtxoIndexProvider(args.index) if args.index is not None else None
+        failure_cache = FailureCache(args.failure_ttl) if args.failure_ttl is not None else None
+        try:
+            stream_simulations(read_lines(args.inputs), sys.stdout, args.mainnet, args.aiken_path, args.plutus_version, cache=cache, max_workers=args.workers, in_memory=args.in_memory, provider=provider, result_cache=result_cache, failure_cache=failure_cache, check_balance=args.check_balance)
+        finally:
+            for closable in (cache, result_cache, provider.index if provider is not None else None):
+                if closable is not None:
+                    closable.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())